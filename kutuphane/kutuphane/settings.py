@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'kutuphane_app',
@@ -90,6 +92,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Ödünç politikası sürüm damgası gibi küçük paylaşılan değerler için;
+# dosya tabanlı önbellek aynı sunucudaki tüm gunicorn worker'ları arasında ortaktır.
+# Dizin kaynak ağacının dışındadır; KUTUPHANE_CACHE_DIR ile değiştirilebilir.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('KUTUPHANE_CACHE_DIR', '/var/tmp/kutuphane_cache'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -131,11 +146,16 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-import os
-
 MEDIA_URL = "/media/"
 MEDIA_ROOT =  BASE_DIR / "media"
 
+# `manage.py run_task_worker` servis olarak çalışıyorsa True yapın: masaüstü
+# girişindeki gecikme taraması web sürecindeki thread yerine görev kuyruğuna verilir
+BACKGROUND_TASK_WORKER = os.environ.get("KUTUPHANE_TASK_WORKER") == "1"
+
+# SMS ağ geçidine aynı anda açık en fazla istek (ve keep-alive bağlantı) sayısı
+SMS_CONCURRENCY = int(os.environ.get("KUTUPHANE_SMS_CONCURRENCY", "8"))
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
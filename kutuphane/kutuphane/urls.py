@@ -12,6 +12,7 @@ from kutuphane_app.views import (
     KategoriViewSet,
     KitapViewSet,
     KitapNushaViewSet,
+    BarcodeAllocationView,
     OduncKaydiViewSet,
     PersonelViewSet,
     FastQueryView,
@@ -27,7 +28,9 @@ from kutuphane_app.views import (
     PenaltyPaymentView,
     UpdateOverdueLoansView,
     AuditLogView,
+    AuditLogBulkView,
     InventorySessionViewSet,
+    BackgroundTaskViewSet,
 )
 
 from rest_framework_simplejwt.views import TokenRefreshView as BaseTokenRefreshView
@@ -54,11 +57,13 @@ router.register(r'oduncler', OduncKaydiViewSet)
 router.register(r'personel', PersonelViewSet)
 router.register(r'istatistik', IstatistikViewSet, basename="istatistik")
 router.register(r'inventory-sessions', InventorySessionViewSet, basename="inventory-session")
+router.register(r'tasks', BackgroundTaskViewSet, basename="background-task")
 
 urlpatterns = [
     #path('admin/', admin.site.urls),
     path('admin/', admin_site.urls),
     path('api/', include(router.urls)),
+    path('api/barcodes/next/', BarcodeAllocationView.as_view(), name="barcode-next"),
     path('api/fast-query/', FastQueryView.as_view(), name="fast-query"),
     path('api/book-history/<str:barkod>/', BookHistoryView.as_view(), name="book-history"),
     path('api/student-history/<str:ogrenci_no>/', StudentHistoryView.as_view(), name="student-history"),
@@ -72,6 +77,7 @@ urlpatterns = [
     path('api/penalties/<int:pk>/pay/', PenaltyPaymentView.as_view(), name="penalty-pay"),
     path('api/jobs/update-overdue/', UpdateOverdueLoansView.as_view(), name="update-overdue-loans"),
     path('api/logs/', AuditLogView.as_view(), name="audit-log"),
+    path('api/logs/bulk/', AuditLogBulkView.as_view(), name="audit-log-bulk"),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     
@@ -1,16 +1,12 @@
 from django.utils.crypto import get_random_string
 from django.core.files.storage import default_storage
 from django.conf import settings
-import os, json, io, datetime
+import os, io, datetime, logging
 
 from django.contrib import admin, messages
-from django.urls import path
+from django.urls import path, reverse
 from django.shortcuts import render, redirect
-from django.utils.timezone import now
-from django.db import transaction
-from django.core.files.base import ContentFile
-from django.db.models import Q
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.core import management
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.admin import UserAdmin, GroupAdmin
@@ -19,15 +15,27 @@ from django.contrib.auth.hashers import make_password
 
 from import_export.admin import ImportExportModelAdmin
 
-from .resources import OgrenciResource
+from .archive import archive_candidates, archive_students
+from .backup import BACKUP_SUFFIX, MANIFEST_SUFFIX, RestoreError, restore_backup, stream_backup
+from .resources import OgrenciResource, bulk_import_ogrenciler
+from .tasks import enqueue_task
 from .models import (
     Rol, Sinif, Ogrenci, Yazar, Kategori, Kitap, KitapNusha,
     OduncKaydi, Personel, AuditLog,
     ArsivBatch, ArsivOgrenci, ArsivOdunc,
     LoanPolicy, RoleLoanPolicy, NotificationSettings,
-    InventorySession, InventoryItem
+    InventorySession, InventoryItem, InventoryUnknownScan, BarcodeSequence,
+    ScheduledJobRun, BackgroundTask, NotificationOutbox,
 )
 
+logger = logging.getLogger(__name__)
+
+# Bu sınırların üstündeki işler istek içinde değil görev kuyruğunda yürür
+# (`run_task_worker`); küçük işler beklemeden sonuç gösterir.
+SYNC_RESTORE_MAX_BYTES = 2 * 1024 * 1024
+SYNC_IMPORT_MAX_ROWS = 500
+SYNC_ARCHIVE_MAX_STUDENTS = 100
+
 # --- Custom Admin Site ---
 class CustomAdminSite(admin.AdminSite):
     site_header = "Kütüphane Yönetim Sistemi"
@@ -41,7 +49,13 @@ class CustomAdminSite(admin.AdminSite):
         backups_dir.mkdir(exist_ok=True)
 
         if request.method == "GET":
-            backup_files = sorted(os.listdir(backups_dir), reverse=True)
+            backup_files = sorted(
+                (
+                    name for name in os.listdir(backups_dir)
+                    if not name.endswith((MANIFEST_SUFFIX, ".partial"))
+                ),
+                reverse=True,
+            )
             self.restore_code = get_random_string(6).upper()
             return render(request, "admin/system_restore_form.html", {
                 "code": self.restore_code,
@@ -60,18 +74,49 @@ class CustomAdminSite(admin.AdminSite):
                 return HttpResponse("Hata: Güvenlik kodu yanlış.", status=400)
 
             if file:
-                path = default_storage.save("restore.json", file)
+                # Uzantı korunur; biçim (jsonl.gz / json) ondan anlaşılır
+                name = os.path.basename(file.name)
+                suffix = next(
+                    (ext for ext in (BACKUP_SUFFIX, ".jsonl", ".json.gz", ".json") if name.endswith(ext)),
+                    ".json",
+                )
+                saved = default_storage.save(f"restore{suffix}", file)
+                full_path = default_storage.path(saved)
             elif selected_file:
-                path = backups_dir / selected_file
-                if not path.exists():
+                full_path = backups_dir / os.path.basename(selected_file)
+                if not full_path.exists():
                     return HttpResponse("Hata: Seçilen yedek bulunamadı.", status=400)
             else:
                 return HttpResponse("Hata: Dosya seçilmedi.", status=400)
 
-            management.call_command("flush", "--noinput")
-            full_path = os.path.join(settings.MEDIA_ROOT, path)  # gerçek tam yol
-            management.call_command("loaddata", full_path)
-            return HttpResponse("✅ Restore işlemi tamamlandı.")
+            if os.path.getsize(full_path) > SYNC_RESTORE_MAX_BYTES:
+                # Doğrulama ve yükleme worker'da; istek zaman aşımına takılmaz
+                task = enqueue_task(
+                    "restore",
+                    {"path": str(full_path), "dry_run": bool(request.POST.get("dry_run"))},
+                    user=request.user,
+                )
+                return redirect(task_admin_url(task))
+
+            def log_progress(state):
+                logger.info(
+                    "Geri yükleme: %s (%s/%s)",
+                    state["model"], state["loaded"], state["total"] or "?",
+                )
+
+            # Önce doğrulama: bozuk dosya mevcut veriye dokunmadan reddedilir
+            try:
+                check = restore_backup(full_path, dry_run=True)
+                if check["checksum_ok"] is False:
+                    return HttpResponse("Hata: Yedek manifest ile uyuşmuyor (sağlama toplamı).", status=400)
+                if request.POST.get("dry_run"):
+                    return HttpResponse(
+                        f"✅ Doğrulama başarılı: {check['total']} kayıt, {len(check['models'])} model."
+                    )
+                result = restore_backup(full_path, progress=log_progress)
+            except RestoreError as exc:
+                return HttpResponse(f"Hata: {exc}", status=400)
+            return HttpResponse(f"✅ Restore işlemi tamamlandı ({result['total']} kayıt).")
 
     def get_urls(self):
         urls = super().get_urls()
@@ -79,9 +124,21 @@ class CustomAdminSite(admin.AdminSite):
             path("system/ayarlar/", self.admin_view(self.system_settings_view), name="system-settings"),
             path("system/backup/", self.admin_view(self.system_backup_view), name="system-backup"),
             path("system/restore/", self.admin_view(self.system_restore_view), name="system-restore"),
+            path("system/tasks/<int:task_id>/", self.admin_view(self.system_task_view), name="system-task"),
         ]
         return custom_urls + urls
 
+    def system_task_view(self, request, task_id):
+        task = BackgroundTask.objects.filter(pk=task_id).first()
+        if task is None:
+            messages.warning(request, "Görev bulunamadı.")
+            return redirect("admin:system-settings")
+        return render(request, "admin/background_task.html", {
+            "task": task,
+            "progress": sorted(task.progress.items()),
+            "result": sorted(task.result.items()),
+        })
+
     def system_settings_view(self, request):
         return render(request, "admin/system_settings.html")
 
@@ -89,7 +146,23 @@ class CustomAdminSite(admin.AdminSite):
         backups_dir = settings.BASE_DIR / "backups"
         backups_dir.mkdir(exist_ok=True)
 
+        if request.method == "POST":
+            # Yalnızca sunucuya yazılır (backups/); indirme yok
+            return redirect(task_admin_url(enqueue_task("backup", user=request.user)))
+
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        # Varsayılan: akışlı, sıkıştırılmış NDJSON (bellekte tam kopya tutulmaz)
+        if request.GET.get("format") != "json":
+            filename = f"backup_{timestamp}{BACKUP_SUFFIX}"
+            response = StreamingHttpResponse(
+                stream_backup(backups_dir / filename),
+                content_type="application/gzip",
+            )
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return response
+
+        # Eski biçim: tek parça JSON
         filename = f"backup_{timestamp}.json"
         filepath = backups_dir / filename
 
@@ -106,6 +179,17 @@ class CustomAdminSite(admin.AdminSite):
 
 admin_site = CustomAdminSite(name="custom_admin")
 
+
+def _count_lines(upload):
+    """Yüklenen dosyanın satır sayısı; dosya okunduktan sonra başa sarılır."""
+    lines = sum(chunk.count(b"\n") for chunk in upload.chunks())
+    upload.seek(0)
+    return lines
+
+
+def task_admin_url(task):
+    return reverse("admin:system-task", args=[task.pk], current_app=admin_site.name)
+
 # --- Inline ---
 class KitapNushaInline(admin.TabularInline):
     model = KitapNusha
@@ -169,6 +253,40 @@ class KitapNushaAdmin(admin.ModelAdmin):
     list_filter = ("durum",)
 admin_site.register(KitapNusha, KitapNushaAdmin)
 
+class BarcodeSequenceAdmin(admin.ModelAdmin):
+    list_display = ("prefix", "last_value", "updated_at")
+    search_fields = ("prefix",)
+admin_site.register(BarcodeSequence, BarcodeSequenceAdmin)
+
+class ScheduledJobRunAdmin(admin.ModelAdmin):
+    list_display = ("job", "started_at", "duration_ms", "rows", "status")
+    list_filter = ("job", "status")
+    readonly_fields = ("job", "started_at", "heartbeat_at", "finished_at", "duration_ms", "rows", "status", "result", "error")
+admin_site.register(ScheduledJobRun, ScheduledJobRunAdmin)
+
+class BackgroundTaskAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "created_by", "created_at", "started_at", "finished_at", "worker")
+    list_filter = ("kind", "status")
+    readonly_fields = (
+        "kind", "status", "params", "progress", "result", "error", "worker",
+        "created_by", "created_at", "started_at", "finished_at", "updated_at",
+    )
+admin_site.register(BackgroundTask, BackgroundTaskAdmin)
+
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "channel", "message_type", "recipient", "due_date", "status", "attempts", "sent_at")
+    list_filter = ("channel", "message_type", "status")
+    search_fields = ("recipient", "subject")
+    raw_id_fields = ("odunc",)
+    readonly_fields = ("created_at", "claimed_at", "sent_at")
+    actions = ["yeniden_dene"]
+
+    @admin.action(description="Seçilenleri yeniden gönderim kuyruğuna al")
+    def yeniden_dene(self, request, queryset):
+        count = queryset.exclude(status="sent").update(status="pending", attempts=0, last_error="")
+        messages.success(request, f"{count} bildirim yeniden kuyruğa alındı.")
+admin_site.register(NotificationOutbox, NotificationOutboxAdmin)
+
 class OduncKaydiAdmin(admin.ModelAdmin):
     list_display = ("ogrenci", "kitap_nusha", "odunc_tarihi", "iade_tarihi", "teslim_tarihi", "durum", "gecikme_cezasi")
     list_filter = ("durum", "ogrenci__sinif", "ogrenci__rol")
@@ -253,12 +371,20 @@ class InventoryItemInline(admin.TabularInline):
     ordering = ("-seen", "raf_kodu", "barkod")
 
 
+class InventoryUnknownScanInline(admin.TabularInline):
+    model = InventoryUnknownScan
+    extra = 0
+    can_delete = False
+    fields = ("barkod", "scanned_at", "scanned_by")
+    readonly_fields = fields
+
+
 class InventorySessionAdmin(admin.ModelAdmin):
     list_display = ("name", "status", "total_items", "seen_items", "created_at", "created_by")
     list_filter = ("status", "created_at")
     search_fields = ("name", "description")
     readonly_fields = ("created_at", "updated_at", "started_at", "completed_at", "total_items", "seen_items", "filters", "created_by")
-    inlines = [InventoryItemInline]
+    inlines = [InventoryItemInline, InventoryUnknownScanInline]
 
 
 admin_site.register(InventorySession, InventorySessionAdmin)
@@ -266,9 +392,12 @@ admin_site.register(InventorySession, InventorySessionAdmin)
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
-    list_display = ("olusturma_zamani", "kullanici", "islem", "ip_adresi")
+    list_display = ("olusturma_zamani", "kullanici", "istemci_kullanici", "islem", "ip_adresi")
     list_filter = ("islem", "kullanici")
-    search_fields = ("islem", "detay", "kullanici__username", "kullanici__first_name", "kullanici__last_name")
+    search_fields = (
+        "islem", "detay", "istemci_kullanici",
+        "kullanici__username", "kullanici__first_name", "kullanici__last_name",
+    )
 
 # --- Ogrenci + import-export + ARŞİV Özel URL + İşlem ---
 class OgrenciAdmin(ImportExportModelAdmin):
@@ -295,141 +424,69 @@ class OgrenciAdmin(ImportExportModelAdmin):
                 self.admin_site.admin_view(self.arsiv_onayla),
                 name="ogrenci-arsiv-onayla",
             ),
+            path(
+                "toplu_ice_aktar/",
+                self.admin_site.admin_view(self.toplu_ice_aktar),
+                name="ogrenci-toplu-ice-aktar",
+            ),
         ]
         return custom_urls + urls
 
+    # Büyük listeler (dönem başı) için hızlı CSV içe aktarma
+    def toplu_ice_aktar(self, request):
+        context = {"sonuc": None}
+        if request.method == "POST":
+            upload = request.FILES.get("csv_file")
+            if not upload:
+                messages.error(request, "CSV dosyası seçilmedi.")
+            elif _count_lines(upload) - 1 > SYNC_IMPORT_MAX_ROWS:
+                saved = default_storage.save("imports/ogrenciler.csv", upload)
+                task = enqueue_task(
+                    "import",
+                    {
+                        "path": default_storage.path(saved),
+                        "deactivate_missing": bool(request.POST.get("pasifle")),
+                        "dry_run": bool(request.POST.get("dry_run")),
+                        "cleanup": True,
+                    },
+                    user=request.user,
+                )
+                return redirect(task_admin_url(task))
+            else:
+                sonuc = bulk_import_ogrenciler(
+                    upload.file,
+                    deactivate_missing=bool(request.POST.get("pasifle")),
+                    dry_run=bool(request.POST.get("dry_run")),
+                )
+                context["sonuc"] = sonuc
+                context["sureler"] = sorted(sonuc.timings.items(), key=lambda item: item[0] != "total")
+        return render(request, "admin/ogrenci_toplu_ice_aktar.html", context)
+
     # 3+ yıl pasif (veya pasif_tarihi boş ama 3+ yıl önce kaydedilmiş) adayları göster
     def arsiv_onizleme(self, request):
-        uc_yil_once = now().replace(year=now().year - 3)
-        adaylar = Ogrenci.objects.filter(
-            Q(aktif=False) &
-            (Q(pasif_tarihi__lt=uc_yil_once) |
-             (Q(pasif_tarihi__isnull=True) & Q(kayit_tarihi__lt=uc_yil_once)))
-        )
+        adaylar = archive_candidates()
         return render(request, "admin/ogrenci_arsiv_onizleme.html", {
             "adaylar": adaylar,
             "toplam": adaylar.count(),
         })
 
-    # Adayları arşive taşı + JSON paket üret + canlı DB’den temizle
+    # Adayları arşive taşı + NDJSON paket üret + canlı DB’den temizle
     def arsiv_onayla(self, request):
-        uc_yil_once = now().replace(year=now().year - 3)
-        hedef = Ogrenci.objects.filter(
-            Q(aktif=False) &
-            (Q(pasif_tarihi__lt=uc_yil_once) |
-             (Q(pasif_tarihi__isnull=True) & Q(kayit_tarihi__lt=uc_yil_once)))
-        )
-
-        if not hedef.exists():
+        if request.method != "POST":
+            return redirect("admin:ogrenci-arsiv-onizleme")
+
+        hedef = archive_candidates()
+        ids = list(hedef.values_list("id", flat=True))
+        if not ids:
             messages.warning(request, "Arşivlenecek uygun öğrenci yok.")
             return redirect("..")
 
-        with transaction.atomic():
-            batch = ArsivBatch.objects.create(aciklama="3+ yıl pasif öğrenciler")
-
-            json_ogrenciler: list[dict] = []
-            json_oduncler: list[dict] = []
-            nusha_ids, kitap_ids = set(), set()
-
-            # Öğrencileri arşive yaz + JSON’a ekle
-            for o in hedef.select_related("sinif", "rol"):
-                ArsivOgrenci.objects.create(
-                    batch=batch,
-                    ogrenci_no=o.ogrenci_no,
-                    ad=o.ad,
-                    soyad=o.soyad,
-                    sinif_ad=o.sinif.ad if o.sinif else None,
-                    rol_ad=o.rol.ad if o.rol else None,
-                    telefon=o.telefon,
-                    eposta=o.eposta,
-                    kayit_tarihi=o.kayit_tarihi,
-                    pasif_tarihi=o.pasif_tarihi,
-                )
-                json_ogrenciler.append({
-                    "ogrenci_no": o.ogrenci_no,
-                    "ad": o.ad,
-                    "soyad": o.soyad,
-                    "sinif": o.sinif.ad if o.sinif else None,
-                    "rol": o.rol.ad if o.rol else None,
-                    "telefon": o.telefon,
-                    "eposta": o.eposta,
-                    "kayit_tarihi": o.kayit_tarihi.isoformat() if o.kayit_tarihi else None,
-                    "pasif_tarihi": o.pasif_tarihi.isoformat() if o.pasif_tarihi else None,
-                })
-
-            # Öğrencilerin ödünç kayıtlarını topla → arşive yaz + JSON
-            oduncler = (OduncKaydi.objects
-                        .select_related("kitap_nusha", "kitap_nusha__kitap", "ogrenci")
-                        .filter(ogrenci__in=hedef))
-            for k in oduncler:
-                nusha = k.kitap_nusha
-                kitap = nusha.kitap if nusha else None
-
-                ArsivOdunc.objects.create(
-                    batch=batch,
-                    ogrenci_no=k.ogrenci.ogrenci_no if k.ogrenci else "",
-                    kitap_baslik=kitap.baslik if kitap else "",
-                    barkod=nusha.barkod if nusha else "",
-                    odunc_tarihi=k.odunc_tarihi,
-                    iade_tarihi=k.iade_tarihi,
-                    teslim_tarihi=k.teslim_tarihi,
-                    durum=k.durum,
-                    gecikme_cezasi=k.gecikme_cezasi,
-                )
-                json_oduncler.append({
-                    "ogrenci_no": k.ogrenci.ogrenci_no if k.ogrenci else "",
-                    "kitap_baslik": kitap.baslik if kitap else "",
-                    "barkod": nusha.barkod if nusha else "",
-                    "odunc_tarihi": k.odunc_tarihi.isoformat(),
-                    "iade_tarihi": k.iade_tarihi.isoformat(),
-                    "teslim_tarihi": k.teslim_tarihi.isoformat() if k.teslim_tarihi else None,
-                    "durum": k.durum,
-                    "gecikme_cezasi": float(k.gecikme_cezasi) if k.gecikme_cezasi is not None else None,
-                })
-
-                if nusha: nusha_ids.add(nusha.id)
-                if kitap: kitap_ids.add(kitap.id)
-
-            # İlişkili nüsha + kitap snapshot’larını da JSON’a ekleyelim
-            nushalar_qs = KitapNusha.objects.select_related("kitap").filter(id__in=nusha_ids)
-            json_nushalar = [{
-                "barkod": n.barkod,
-                "raf_kodu": n.raf_kodu,
-                "durum": n.durum,
-                "kitap_id": n.kitap_id,
-                "kitap_baslik": n.kitap.baslik if n.kitap else None
-            } for n in nushalar_qs]
-
-            kitaplar_qs = Kitap.objects.select_related("yazar", "kategori").filter(id__in=kitap_ids)
-            json_kitaplar = [{
-                "id": k.id,
-                "baslik": k.baslik,
-                "yazar": k.yazar.ad_soyad if k.yazar else None,
-                "kategori": k.kategori.ad if k.kategori else None,
-                "yayin_yili": k.yayin_yili,
-                "isbn": k.isbn
-            } for k in kitaplar_qs]
-
-            # JSON paketi oluştur ve batch’e dosya olarak kaydet
-            paket = {
-                "batch": {
-                    "id": batch.id,
-                    "aciklama": batch.aciklama,
-                    "olusturma_tarihi": now().isoformat()
-                },
-                "ogrenciler": json_ogrenciler,
-                "oduncler": json_oduncler,
-                "nushalar": json_nushalar,
-                "kitaplar": json_kitaplar,
-            }
-            json_bytes = json.dumps(paket, ensure_ascii=False, indent=2).encode("utf-8")
-            batch.json_dosya.save(f"arsiv_{batch.id}.json", ContentFile(json_bytes), save=True)
-
-            # Temizlik: önce ödünçler, sonra öğrenciler
-            oduncler.delete()
-            hedef.delete()
-
-        messages.success(request, f"{len(json_ogrenciler)} öğrenci arşive taşındı.")
+        if len(ids) > SYNC_ARCHIVE_MAX_STUDENTS:
+            task = enqueue_task("archive", {"student_ids": ids}, user=request.user)
+            return redirect(task_admin_url(task))
+
+        result = archive_students(hedef)
+        messages.success(request, f"{result['students']} öğrenci arşive taşındı.")
         return redirect("..")
 
 # kayıt
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class KutuphaneAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'kutuphane_app'
+
+    def ready(self):
+        # Politika önbelleğini geçersiz kılan sinyalleri bağla
+        from . import loan_policy  # noqa: F401
@@ -0,0 +1,201 @@
+"""
+Pasif öğrencilerin arşive taşınması.
+
+Öğrenciler parça parça işlenir: her parça kendi transaction'ında arşiv
+tablolarına `bulk_create` ile yazılır, gzip'li NDJSON pakete eklenir ve canlı
+tablolardan silinir. Böylece binlerce öğrencilik bir dönem uzun süren tek bir
+transaction açmadan taşınır; yarıda kalan bir işte taşınmış her kayıt pakette
+bulunur.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import tempfile
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArsivBatch, ArsivOdunc, ArsivOgrenci, Kitap, KitapNusha, Ogrenci, OduncKaydi
+
+ARCHIVE_CHUNK_SIZE = 500
+ARCHIVE_PACKAGE_SUFFIX = ".jsonl.gz"
+
+
+def archive_candidates(reference=None):
+    """3+ yıl pasif (veya pasif_tarihi boş ama 3+ yıl önce kaydedilmiş) öğrenciler."""
+    reference = reference or timezone.now()
+    uc_yil_once = reference.replace(year=reference.year - 3)
+    return Ogrenci.objects.filter(
+        Q(aktif=False) &
+        (Q(pasif_tarihi__lt=uc_yil_once) |
+         (Q(pasif_tarihi__isnull=True) & Q(kayit_tarihi__lt=uc_yil_once)))
+    )
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _line(kind, data):
+    return (json.dumps({"type": kind, **data}, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _archive_chunk(batch, student_ids, lines, nusha_ids, kitap_ids):
+    """
+    Bir parça öğrenciyi ve ödünçlerini arşive taşır; paket satırlarını `lines`e
+    ekler. (öğrenci, ödünç) sayısını döndürür.
+    """
+    arsiv_ogrenciler = []
+    for o in Ogrenci.objects.filter(id__in=student_ids).select_related("sinif", "rol").iterator():
+        sinif_ad = o.sinif.ad if o.sinif else None
+        rol_ad = o.rol.ad if o.rol else None
+        arsiv_ogrenciler.append(ArsivOgrenci(
+            batch=batch,
+            ogrenci_no=o.ogrenci_no,
+            ad=o.ad,
+            soyad=o.soyad,
+            sinif_ad=sinif_ad,
+            rol_ad=rol_ad,
+            telefon=o.telefon,
+            eposta=o.eposta,
+            kayit_tarihi=o.kayit_tarihi,
+            pasif_tarihi=o.pasif_tarihi,
+        ))
+        lines.append(_line("ogrenci", {
+            "ogrenci_no": o.ogrenci_no,
+            "ad": o.ad,
+            "soyad": o.soyad,
+            "sinif": sinif_ad,
+            "rol": rol_ad,
+            "telefon": o.telefon,
+            "eposta": o.eposta,
+            "kayit_tarihi": _iso(o.kayit_tarihi),
+            "pasif_tarihi": _iso(o.pasif_tarihi),
+        }))
+    ArsivOgrenci.objects.bulk_create(arsiv_ogrenciler, batch_size=ARCHIVE_CHUNK_SIZE)
+
+    oduncler = (
+        OduncKaydi.objects
+        .filter(ogrenci_id__in=student_ids)
+        .select_related("kitap_nusha", "kitap_nusha__kitap", "ogrenci")
+        .order_by("id")
+    )
+    arsiv_oduncler = []
+    for k in oduncler.iterator(chunk_size=ARCHIVE_CHUNK_SIZE):
+        nusha = k.kitap_nusha
+        kitap = nusha.kitap if nusha else None
+        row = {
+            "ogrenci_no": k.ogrenci.ogrenci_no if k.ogrenci else "",
+            "kitap_baslik": kitap.baslik if kitap else "",
+            "barkod": nusha.barkod if nusha else "",
+        }
+        arsiv_oduncler.append(ArsivOdunc(
+            batch=batch,
+            odunc_tarihi=k.odunc_tarihi,
+            iade_tarihi=k.iade_tarihi,
+            teslim_tarihi=k.teslim_tarihi,
+            durum=k.durum,
+            gecikme_cezasi=k.gecikme_cezasi,
+            **row,
+        ))
+        lines.append(_line("odunc", {
+            **row,
+            "odunc_tarihi": _iso(k.odunc_tarihi),
+            "iade_tarihi": _iso(k.iade_tarihi),
+            "teslim_tarihi": _iso(k.teslim_tarihi),
+            "durum": k.durum,
+            "gecikme_cezasi": float(k.gecikme_cezasi) if k.gecikme_cezasi is not None else None,
+        }))
+        if nusha:
+            nusha_ids.add(nusha.id)
+        if kitap:
+            kitap_ids.add(kitap.id)
+    ArsivOdunc.objects.bulk_create(arsiv_oduncler, batch_size=ARCHIVE_CHUNK_SIZE)
+
+    # Temizlik: önce ödünçler, sonra öğrenciler
+    OduncKaydi.objects.filter(ogrenci_id__in=student_ids).delete()
+    Ogrenci.objects.filter(id__in=student_ids).delete()
+    return len(arsiv_ogrenciler), len(arsiv_oduncler)
+
+
+def _write_snapshots(gz, nusha_ids, kitap_ids, chunk_size):
+    """İlişkili nüsha + kitap snapshot'larını pakete ekler."""
+    for ids in _chunks(sorted(nusha_ids), chunk_size):
+        for n in KitapNusha.objects.filter(id__in=ids).select_related("kitap").iterator():
+            gz.write(_line("nusha", {
+                "barkod": n.barkod,
+                "raf_kodu": n.raf_kodu,
+                "durum": n.durum,
+                "kitap_id": n.kitap_id,
+                "kitap_baslik": n.kitap.baslik if n.kitap else None,
+            }))
+    for ids in _chunks(sorted(kitap_ids), chunk_size):
+        for k in Kitap.objects.filter(id__in=ids).select_related("yazar", "kategori").iterator():
+            gz.write(_line("kitap", {
+                "id": k.id,
+                "baslik": k.baslik,
+                "yazar": k.yazar.ad_soyad if k.yazar else None,
+                "kategori": k.kategori.ad if k.kategori else None,
+                "yayin_yili": k.yayin_yili,
+                "isbn": k.isbn,
+            }))
+
+
+def archive_students(queryset=None, *, aciklama="3+ yıl pasif öğrenciler", chunk_size=ARCHIVE_CHUNK_SIZE, progress=None):
+    """
+    Verilen öğrencileri (varsayılan: arşiv adayları) arşive taşır.
+
+    Paket `ArsivBatch.json_dosya` alanına `arsiv_<id>.jsonl.gz` olarak kaydedilir;
+    her satır `type` alanı (batch/ogrenci/odunc/nusha/kitap) taşıyan bir JSON
+    nesnesidir. `progress(dict)` her parçadan sonra {"done", "total", "loans"}
+    ile çağrılır. Dönüş: {"batch_id", "students", "loans"}
+    """
+    if queryset is None:
+        queryset = archive_candidates()
+    student_ids = list(queryset.order_by("id").values_list("id", flat=True))
+    total = len(student_ids)
+    batch = ArsivBatch.objects.create(aciklama=aciklama)
+
+    done = 0
+    loans = 0
+    nusha_ids, kitap_ids = set(), set()
+    with tempfile.TemporaryFile() as tmp:
+        try:
+            with gzip.GzipFile(filename=f"arsiv_{batch.id}.jsonl", mode="wb", fileobj=tmp) as gz:
+                gz.write(_line("batch", {
+                    "id": batch.id,
+                    "aciklama": batch.aciklama,
+                    "olusturma_tarihi": timezone.now().isoformat(),
+                    "ogrenci_sayisi": total,
+                }))
+                try:
+                    for ids in _chunks(student_ids, chunk_size):
+                        lines, chunk_nushalar, chunk_kitaplar = [], set(), set()
+                        with transaction.atomic():
+                            moved, moved_loans = _archive_chunk(batch, ids, lines, chunk_nushalar, chunk_kitaplar)
+                        # Yalnızca commit edilen parçalar pakete girer
+                        gz.writelines(lines)
+                        nusha_ids |= chunk_nushalar
+                        kitap_ids |= chunk_kitaplar
+                        done += moved
+                        loans += moved_loans
+                        if progress:
+                            progress({"done": done, "total": total, "loans": loans})
+                finally:
+                    # Hata olsa bile taşınmış kayıtların snapshot'ı pakette kalsın
+                    _write_snapshots(gz, nusha_ids, kitap_ids, chunk_size)
+        finally:
+            tmp.seek(0)
+            batch.json_dosya.save(f"arsiv_{batch.id}{ARCHIVE_PACKAGE_SUFFIX}", File(tmp), save=True)
+
+    return {"batch_id": batch.id, "students": done, "loans": loans}
+
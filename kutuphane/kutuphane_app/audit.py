@@ -0,0 +1,112 @@
+"""
+Denetim logu toplu alımı.
+
+İstemciler kayıtları biriktirip tek istekte gönderir. Her kaydın istemcide
+üretilmiş bir `client_id` (UUID) değeri vardır; aynı kayıt yeniden
+gönderildiğinde benzersiz indeks sayesinde ikinci kez yazılmaz. Böylece
+istemci, yanıtı alamadığı bir partiyi güvenle tekrar gönderebilir.
+
+Kaydın yazarı her zaman isteği yapan kullanıcıdır. Kuyrukta bekleyen kayıtlar
+sonraki bir oturumda gönderilebildiği için istemci, kaydı oluşturan oturumun
+kullanıcı adını (`kullanici`) da bildirir; bu ad doğrulanmamış bilgi olarak
+`istemci_kullanici` alanında saklanır. Boş ya da bilinmeyen ad içeren kayıt
+reddedilir.
+"""
+
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+
+from .models import AuditLog
+from .serializers import AuditLogEntrySerializer
+
+User = get_user_model()
+AUDIT_BULK_MAX = 500
+
+
+def _insert_logs(logs):
+    """
+    Kayıtları tek `bulk_create` ile ekler ve eklenen sayıyı döndürür. Eşzamanlı
+    bir yeniden gönderim aynı `client_id` değerini araya girip yazdıysa kayıtlar
+    tek tek eklenir; çakışanlar atlanır ve oluşturulmuş sayılmaz.
+    """
+    try:
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(logs)
+        return len(logs)
+    except IntegrityError:
+        pass
+    created = 0
+    for log in logs:
+        log.pk = None
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create([log])
+        except IntegrityError:
+            continue
+        created += 1
+    return created
+
+
+def ingest_audit_entries(entries, *, user=None, default_ip=None):
+    """
+    Kayıtları doğrular ve tek `bulk_create` ile yazar.
+
+    Geçersiz kayıtlar atlanır ve `rejected` listesinde döner; tekrar
+    gönderilmeleri bir şey değiştirmeyeceği için istemci onları kuyruktan
+    silebilir. Tüm kayıtlar `user` adına yazılır.
+    Dönüş: {"created", "duplicates", "accepted", "rejected"}
+    """
+    parsed = []
+    rejected = []
+    for index, entry in enumerate(entries):
+        serializer = AuditLogEntrySerializer(data=entry if isinstance(entry, dict) else {})
+        if not serializer.is_valid():
+            client_id = entry.get("client_id") if isinstance(entry, dict) else None
+            rejected.append({"index": index, "client_id": client_id, "errors": serializer.errors})
+            continue
+        parsed.append((index, serializer.validated_data))
+
+    claimed = {data["kullanici"] for _, data in parsed if data["kullanici"]}
+    known = set(User.objects.filter(username__in=claimed).values_list("username", flat=True)) if claimed else set()
+    valid = {}
+    for index, data in parsed:
+        if data["kullanici"] and data["kullanici"] not in known:
+            rejected.append({
+                "index": index,
+                "client_id": str(data["client_id"]),
+                "errors": {"kullanici": ["Bilinmeyen kullanıcı."]},
+            })
+            continue
+        # Aynı partide tekrarlanan kimlik tek kayıt sayılır
+        valid.setdefault(data["client_id"], data)
+    rejected.sort(key=lambda row: row["index"])
+
+    created = 0
+    if valid:
+        with transaction.atomic():
+            existing = set(
+                AuditLog.objects.filter(client_id__in=list(valid)).values_list("client_id", flat=True)
+            )
+            new_logs = [
+                AuditLog(
+                    client_id=client_id,
+                    kullanici=user,
+                    istemci_kullanici=data["kullanici"] or "",
+                    islem=data["islem"],
+                    detay=data["detay"],
+                    ip_adresi=data["ip_adresi"] or default_ip,
+                    istemci_zamani=data["zaman"],
+                )
+                for client_id, data in valid.items()
+                if client_id not in existing
+            ]
+            created = _insert_logs(new_logs)
+
+    return {
+        "created": created,
+        "duplicates": len(valid) - created,
+        "accepted": [str(client_id) for client_id in valid],
+        "rejected": rejected,
+    }
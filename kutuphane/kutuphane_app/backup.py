@@ -0,0 +1,397 @@
+"""
+Sistem yedeği ve geri yükleme.
+
+Yedek: model model, sıkıştırılmış NDJSON (jsonl.gz) akışı.
+Geri yükleme: yedeği (veya eski tek parça JSON'u) parça parça okuyup tek bir
+transaction içinde `bulk_create` ile yükler; hata olursa mevcut veri korunur.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import os
+from itertools import islice
+from pathlib import Path
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.core.serializers.base import DeserializationError
+from django.db import connections, router, transaction, DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+BACKUP_FORMAT = "kutuphane-ndjson"
+BACKUP_FORMAT_VERSION = 1
+BACKUP_CHUNK_SIZE = 2000
+RESTORE_BATCH_SIZE = 1000
+BACKUP_SUFFIX = ".jsonl.gz"
+MANIFEST_SUFFIX = ".manifest.json"
+# Yedeğe girmeyen ve geri yüklemede boşaltılmayan işletim tabloları: geri
+# yükleme görevi kendi durumunu bu tabloya yazar
+EXCLUDED_MODELS = {"kutuphane_app.backgroundtask"}
+
+
+def backup_models(using=DEFAULT_DB_ALIAS):
+    """`dumpdata` ile aynı model kümesini bağımlılık sırasıyla döndürür."""
+    app_list = [
+        (app_config, None)
+        for app_config in apps.get_app_configs()
+        if app_config.models_module is not None
+    ]
+    models = serializers.sort_dependencies(app_list, allow_cycles=True)
+    return [
+        model for model in models
+        if not model._meta.proxy
+        and model._meta.label_lower not in EXCLUDED_MODELS
+        and router.allow_migrate_model(using, model)
+    ]
+
+
+def _flush_tables(models):
+    """Yedekteki modellerin ve otomatik m2m ara tablolarının adları."""
+    tables = []
+    for model in models:
+        tables.append(model._meta.db_table)
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                tables.append(through._meta.db_table)
+    return tables
+
+
+def manifest_path_for(backup_path) -> Path:
+    backup_path = Path(backup_path)
+    name = backup_path.name
+    if name.endswith(BACKUP_SUFFIX):
+        name = name[: -len(BACKUP_SUFFIX)]
+    return backup_path.with_name(name + MANIFEST_SUFFIX)
+
+
+class _TeeSink(io.RawIOBase):
+    """Sıkıştırılmış baytları diske yazar ve akışa verilmek üzere biriktirir."""
+
+    def __init__(self, fileobj):
+        self._file = fileobj
+        self._pending = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._file.write(data)
+        self._pending.extend(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._pending)
+        self._pending.clear()
+        return data
+
+
+def _iter_chunks(model, chunk_size, using):
+    # iterator() PostgreSQL'de sunucu taraflı cursor kullanır; tablo belleğe alınmaz
+    qs = model._default_manager.using(using).order_by(model._meta.pk.name)
+    iterator = qs.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_backup(path, *, chunk_size=BACKUP_CHUNK_SIZE, using=DEFAULT_DB_ALIAS):
+    """
+    Veritabanını model model `path` dosyasına gzip'li NDJSON olarak yazar ve aynı
+    sıkıştırılmış baytları parça parça `yield` eder (StreamingHttpResponse için).
+
+    Satırlar `dumpdata --format jsonl` çıktısıyla aynıdır. Tamamlandığında model
+    başına satır sayısı ve SHA-256 özetini içeren bir manifest dosyası yazılır.
+    Akış yarıda kesilirse yarım dosya silinir.
+    """
+    path = Path(path)
+    partial_path = path.with_name(path.name + ".partial")
+    serializer = serializers.get_serializer("jsonl")()
+    overall = hashlib.sha256()
+    manifest_models = []
+    total = 0
+    completed = False
+
+    raw = open(partial_path, "wb")
+    try:
+        sink = _TeeSink(raw)
+        with gzip.GzipFile(filename=path.name, mode="wb", fileobj=sink) as gz:
+            for model in backup_models(using):
+                digest = hashlib.sha256()
+                count = 0
+                for chunk in _iter_chunks(model, chunk_size, using):
+                    buffer = io.StringIO()
+                    serializer.serialize(chunk, stream=buffer)
+                    data = buffer.getvalue().encode("utf-8")
+                    digest.update(data)
+                    overall.update(data)
+                    count += len(chunk)
+                    gz.write(data)
+                    pending = sink.drain()
+                    if pending:
+                        yield pending
+                manifest_models.append({
+                    "model": model._meta.label_lower,
+                    "count": count,
+                    "sha256": digest.hexdigest(),
+                })
+                total += count
+        tail = sink.drain()
+        if tail:
+            yield tail
+        completed = True
+    finally:
+        raw.close()
+        if completed:
+            os.replace(partial_path, path)
+        elif partial_path.exists():
+            partial_path.unlink()
+
+    manifest = {
+        "format": BACKUP_FORMAT,
+        "version": BACKUP_FORMAT_VERSION,
+        "created_at": timezone.now().isoformat(),
+        "file": path.name,
+        "total": total,
+        "sha256": overall.hexdigest(),
+        "models": manifest_models,
+    }
+    with open(manifest_path_for(path), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=2)
+
+
+def write_backup(path, **kwargs) -> dict:
+    """Akışı tüketerek yedeği yalnızca diske yazar ve manifesti döndürür."""
+    for _ in stream_backup(path, **kwargs):
+        pass
+    with open(manifest_path_for(path), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+# --- Geri yükleme ---
+
+
+class RestoreError(Exception):
+    """Yedek dosyası okunamadı veya doğrulanamadı."""
+
+
+def read_manifest(backup_path):
+    path = manifest_path_for(backup_path)
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _open_text(path):
+    path = Path(path)
+    if path.name.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def _iter_jsonl(fh):
+    for line in fh:
+        if not line.strip():
+            continue
+        yield json.loads(line), line.encode("utf-8")
+
+
+def _iter_json_array(fh, bufsize=1 << 16):
+    """Tek parça JSON dizisini (dumpdata çıktısı) belleğe almadan nesne nesne okur."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    started = False
+    while True:
+        chunk = fh.read(bufsize)
+        eof = not chunk
+        buf += chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if not started:
+                if buf[pos] != "[":
+                    raise RestoreError("JSON yedeği bir liste ile başlamalı.")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise RestoreError("JSON yedeği eksik veya bozuk.")
+                break
+            yield obj, None
+            pos = end
+        buf = buf[pos:]
+        if eof:
+            if buf.strip():
+                raise RestoreError("JSON yedeği eksik veya bozuk.")
+            return
+
+
+def iter_backup_records(path):
+    """(kayıt, ham_satır) çiftlerini döndürür; ham satır yalnızca NDJSON'da vardır."""
+    name = Path(path).name
+    with _open_text(path) as fh:
+        if name.endswith((".jsonl", ".jsonl.gz")):
+            yield from _iter_jsonl(fh)
+        else:
+            yield from _iter_json_array(fh)
+
+
+def _iter_model_batches(path, batch_size):
+    """Kayıtları aynı modele ait partiler halinde gruplar."""
+    current_label = None
+    batch = []
+    raw_lines = []
+    for record, raw in iter_backup_records(path):
+        label = str(record.get("model", "")).lower()
+        if batch and (label != current_label or len(batch) >= batch_size):
+            yield current_label, batch, raw_lines
+            batch, raw_lines = [], []
+        current_label = label
+        batch.append(record)
+        if raw is not None:
+            raw_lines.append(raw)
+    if batch:
+        yield current_label, batch, raw_lines
+
+
+def _deserialize(records, using):
+    try:
+        return list(serializers.deserialize("python", records, using=using, ignorenonexistent=True))
+    except DeserializationError as exc:
+        raise RestoreError(str(exc)) from exc
+
+
+def _m2m_rows(deserialized):
+    """Otomatik ara tabloların satırlarını (through_model, [nesne]) olarak üretir."""
+    rows = {}
+    for item in deserialized:
+        if not item.m2m_data:
+            continue
+        model = type(item.object)
+        for field_name, values in item.m2m_data.items():
+            field = model._meta.get_field(field_name)
+            through = field.remote_field.through
+            if not through._meta.auto_created:
+                continue
+            source = f"{field.m2m_field_name()}_id"
+            target = f"{field.m2m_reverse_field_name()}_id"
+            rows.setdefault(through, []).extend(
+                through(**{source: item.object.pk, target: value}) for value in values
+            )
+    return rows
+
+
+def restore_backup(path, *, dry_run=False, batch_size=RESTORE_BATCH_SIZE, progress=None, using=DEFAULT_DB_ALIAS):
+    """
+    Yedeği parça parça okuyup geri yükler.
+
+    - `dry_run=True`: veritabanına dokunmadan tüm kayıtları ayrıştırır, model
+      sayılarını ve (varsa) manifestteki sağlama toplamlarını doğrular.
+    - Aksi halde mevcut tablolar tek transaction içinde boşaltılır, kayıtlar
+      dosyadaki sırayla `bulk_create` partileriyle eklenir. Yedekler bağımlılık
+      sırasıyla yazılır, ancak eski/elle düzenlenmiş dosyalarda sıra farklı
+      olabileceğinden kısıtlar yükleme sırasında kapalıdır ve sonunda toplu
+      denetlenir. `save()` çağrılmadığından türetilmiş alanlar (`Kitap.arama_metni`)
+      yükleme sonunda yeniden hesaplanır, sequence'lar sıfırlanır. Hata olursa
+      transaction geri alınır; veritabanı boş kalmaz.
+
+    `progress(dict)` her partiden sonra {"model", "loaded", "total"} ile çağrılır.
+    Dönüş: {"models": {etiket: adet}, "total": n, "dry_run": bool, "checksum_ok": bool|None}
+    """
+    path = Path(path)
+    if not path.exists():
+        raise RestoreError(f"Yedek bulunamadı: {path.name}")
+
+    manifest = read_manifest(path)
+    expected_total = manifest.get("total") if manifest else None
+    connection = connections[using]
+
+    counts = {}
+    digests = {}
+    loaded = 0
+    m2m_pending = {}
+
+    def consume(write):
+        nonlocal loaded
+        for label, records, raw_lines in _iter_model_batches(path, batch_size):
+            deserialized = _deserialize(records, using)
+            if raw_lines:
+                digest = digests.setdefault(label, hashlib.sha256())
+                for raw in raw_lines:
+                    digest.update(raw)
+            if write and deserialized:
+                model = type(deserialized[0].object)
+                model._default_manager.using(using).bulk_create(
+                    [item.object for item in deserialized], batch_size=batch_size
+                )
+                for through, rows in _m2m_rows(deserialized).items():
+                    m2m_pending.setdefault(through, []).extend(rows)
+            counts[label] = counts.get(label, 0) + len(records)
+            loaded += len(records)
+            if progress:
+                progress({"model": label, "loaded": loaded, "total": expected_total})
+
+    if dry_run:
+        consume(write=False)
+    else:
+        models = backup_models(using)
+        with transaction.atomic(using=using):
+            with connection.constraint_checks_disabled():
+                flush = connection.ops.sql_flush(no_style(), _flush_tables(models), reset_sequences=False)
+                for statement in flush:
+                    with connection.cursor() as cursor:
+                        cursor.execute(statement)
+                consume(write=True)
+                for through, rows in m2m_pending.items():
+                    through._default_manager.using(using).bulk_create(rows, batch_size=batch_size)
+            # Eski yedeklerde arama metni yok ya da güncel değil; yazar adıyla birlikte yeniden üret
+            from .search import refresh_search_text
+
+            refresh_search_text(batch_size=batch_size, using=using)
+            table_names = [model._meta.db_table for model in models]
+            table_names += [through._meta.db_table for through in m2m_pending]
+            connection.check_constraints(table_names=table_names)
+            sequence_sql = connection.ops.sequence_reset_sql(
+                no_style(), models + list(m2m_pending)
+            )
+            with connection.cursor() as cursor:
+                for statement in sequence_sql:
+                    cursor.execute(statement)
+        # Politika tabloları değişti; süreç önbelleklerini geçersiz kıl
+        from .loan_policy import bump_policy_version
+        bump_policy_version()
+
+    checksum_ok = None
+    if manifest and digests:
+        expected = {entry["model"]: entry for entry in manifest.get("models", [])}
+        checksum_ok = all(
+            expected.get(label, {}).get("count", 0) == counts.get(label, 0)
+            and (
+                counts.get(label, 0) == 0
+                or expected.get(label, {}).get("sha256") == (digests[label].hexdigest() if label in digests else None)
+            )
+            for label in set(expected) | set(counts)
+        )
+
+    return {
+        "models": counts,
+        "total": loaded,
+        "dry_run": dry_run,
+        "checksum_ok": checksum_ok,
+    }
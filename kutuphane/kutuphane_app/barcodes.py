@@ -0,0 +1,88 @@
+"""
+Barkod numarası dağıtımı.
+
+Her önek için son verilen numara `BarcodeSequence` satırında tutulur ve
+`select_for_update` ile kilitlenerek artırılır; eşzamanlı iki istek aynı kodu
+alamaz. Sayaç ilk kullanımda mevcut nüshalardaki en büyük numaradan başlatılır.
+"""
+
+from __future__ import annotations
+
+import re
+
+from django.db import IntegrityError, transaction
+
+from .models import BarcodeSequence, KitapNusha
+
+DEFAULT_BARCODE_PREFIX = "KIT"
+DEFAULT_BARCODE_WIDTH = 6
+MAX_BARCODE_BLOCK = 1000
+PREFIX_PATTERN = re.compile(r"^[A-Za-z0-9-]{1,20}$")
+
+
+def format_barcode(prefix, number, width=DEFAULT_BARCODE_WIDTH):
+    return f"{prefix}{number:0{width}d}"
+
+
+def _highest_existing(prefix):
+    """Önek + rakamlardan oluşan mevcut barkodlar içindeki en büyük numara (tek seferlik)."""
+    pattern = re.compile(rf"^{re.escape(prefix)}(\d+)$")
+    highest = 0
+    codes = KitapNusha.objects.filter(barkod__startswith=prefix).values_list("barkod", flat=True)
+    for code in codes.iterator():
+        match = pattern.match(code or "")
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def _locked_sequence(prefix):
+    try:
+        return BarcodeSequence.objects.select_for_update().get(prefix=prefix)
+    except BarcodeSequence.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            BarcodeSequence.objects.create(prefix=prefix, last_value=_highest_existing(prefix))
+    except IntegrityError:
+        # Başka bir istek aynı anda oluşturdu; onun satırını kilitle
+        pass
+    return BarcodeSequence.objects.select_for_update().get(prefix=prefix)
+
+
+def validate_prefix(prefix):
+    if not PREFIX_PATTERN.match(prefix or ""):
+        raise ValueError("Önek yalnızca harf, rakam ve '-' içerebilir (en fazla 20 karakter).")
+    return prefix
+
+
+def allocate_barcodes(prefix=DEFAULT_BARCODE_PREFIX, count=1, width=DEFAULT_BARCODE_WIDTH):
+    """
+    `count` adet ardışık ve kullanılmamış barkodu ayırır ve döndürür.
+    Elle girilmiş (sayaçtan ileri) barkodlarla çakışan numaralar atlanır.
+    """
+    validate_prefix(prefix)
+    if not 1 <= count <= MAX_BARCODE_BLOCK:
+        raise ValueError(f"Adet 1 ile {MAX_BARCODE_BLOCK} arasında olmalıdır.")
+
+    with transaction.atomic():
+        sequence = _locked_sequence(prefix)
+        codes = []
+        next_value = sequence.last_value
+        while len(codes) < count:
+            needed = count - len(codes)
+            candidates = [format_barcode(prefix, next_value + i, width) for i in range(1, needed + 1)]
+            next_value += needed
+            taken = set(KitapNusha.objects.filter(barkod__in=candidates).values_list("barkod", flat=True))
+            codes.extend(code for code in candidates if code not in taken)
+        sequence.last_value = next_value
+        sequence.save(update_fields=["last_value", "updated_at"])
+    return codes
+
+
+def peek_next_barcode(prefix=DEFAULT_BARCODE_PREFIX, width=DEFAULT_BARCODE_WIDTH):
+    """Ayırmadan sıradaki numarayı gösterir (yalnızca bilgi amaçlı)."""
+    validate_prefix(prefix)
+    sequence = BarcodeSequence.objects.filter(prefix=prefix).only("last_value").first()
+    last_value = sequence.last_value if sequence else _highest_existing(prefix)
+    return format_barcode(prefix, last_value + 1, width)
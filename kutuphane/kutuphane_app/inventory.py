@@ -0,0 +1,352 @@
+"""
+Sayım (envanter) oturumu işlemleri.
+
+`InventorySession.seen_items` sayacı her okutmada yeniden sayılmaz; kalemin
+durumu koşullu bir UPDATE ile değiştirilir (`seen=False` → `True`) ve yalnızca
+gerçekten değişen satır sayısı kadar `F()` ile artırılır/azaltılır. Aynı barkod
+iki istemciden aynı anda okutulsa bile sayaç bir kez artar.
+
+Oturum açılırken nüshalar Python'a çekilmez: kalemler filtrelenmiş
+`KitapNusha` sorgusundan tek bir `INSERT INTO … SELECT` ile kopyalanır.
+
+Kalem listesi (seen, raf_kodu, barkod, id) üzerinden keyset ile sayfalanır;
+sayfa ne kadar derin olursa olsun sorgu indeksten ilk `limit` satırı okur.
+
+Mutabakat raporu kalemleri satır satır kontrol etmez: her kategori ödünç ve
+nüsha tablolarıyla `EXISTS` kuran tek bir sorgudur.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, CharField, Count, Exists, F, IntegerField, OuterRef, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import InventoryItem, InventorySession, InventoryUnknownScan, KitapNusha, OduncKaydi
+
+MARK_BULK_MAX = 1000
+ITEMS_DEFAULT_LIMIT = 250
+ITEMS_MAX_LIMIT = 1000
+
+RESULT_SEEN = "seen"
+RESULT_ALREADY_SEEN = "already_seen"
+RESULT_UNKNOWN = "unknown"
+
+ACTIVE_LOAN_STATES = ["oduncte", "gecikmis"]
+PROBLEM_COPY_STATES = ["kayip", "hasarli"]
+
+RECON_MISSING = "missing"
+RECON_ON_LOAN = "seen_on_loan"
+RECON_LOST_DAMAGED = "seen_lost_damaged"
+RECON_OUT_OF_SCOPE = "out_of_scope"
+RECON_UNKNOWN = "unknown_barcode"
+RECON_CATEGORIES = [RECON_MISSING, RECON_ON_LOAN, RECON_LOST_DAMAGED, RECON_OUT_OF_SCOPE, RECON_UNKNOWN]
+
+
+def snapshot_copies(session, copies):
+    """
+    `copies` (KitapNusha sorgusu) içindeki nüshaları oturumun kalemleri olarak
+    veritabanı içinde kopyalar; eklenen satır sayısını döndürür.
+    Çağıran transaction içinde olmalıdır.
+    """
+    columns = ["session_id", "kitap_nusha_id", "barkod", "kitap_baslik", "raf_kodu", "durum", "seen", "note"]
+    select = copies.select_related(None).order_by().values_list(
+        Value(session.pk, output_field=IntegerField()),
+        "id",
+        "barkod",
+        Coalesce("kitap__baslik", Value(""), output_field=CharField()),
+        Coalesce("raf_kodu", Value(""), output_field=CharField()),
+        Coalesce("durum", Value(""), output_field=CharField()),
+        Value(False, output_field=BooleanField()),
+        Value("", output_field=CharField()),
+    )
+    sql, params = select.query.sql_with_params()
+    qn = connection.ops.quote_name
+    insert = "INSERT INTO {table} ({columns}) {select}".format(
+        table=qn(InventoryItem._meta.db_table),
+        columns=", ".join(qn(column) for column in columns),
+        select=sql,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(insert, params)
+        return cursor.rowcount
+
+
+def record_unknown_scans(session, barcodes, user=None):
+    """Oturumda karşılığı olmayan okutmaları mutabakat raporu için saklar."""
+    if barcodes:
+        InventoryUnknownScan.objects.bulk_create(
+            [InventoryUnknownScan(session=session, barkod=code, scanned_by=user) for code in set(barcodes)],
+            ignore_conflicts=True,
+        )
+
+
+def _adjust_seen_counter(session, delta):
+    if delta:
+        InventorySession.objects.filter(pk=session.pk).update(
+            seen_items=F("seen_items") + delta,
+            updated_at=timezone.now(),
+        )
+
+
+def set_item_seen(session, item, seen, user=None):
+    """
+    Tek kalemi görüldü/görülmedi yapar. Durum gerçekten değiştiyse True döner;
+    `item` nesnesi yeni değerlerle güncellenir.
+    """
+    items = InventoryItem.objects.filter(pk=item.pk, session=session)
+    if seen:
+        values = {"seen": True, "seen_at": timezone.now(), "seen_by": user}
+        changed = items.filter(seen=False).update(**values)
+    else:
+        values = {"seen": False, "seen_at": None, "seen_by": None}
+        changed = items.filter(seen=True).update(**values)
+    if changed:
+        _adjust_seen_counter(session, 1 if seen else -1)
+        for field, value in values.items():
+            setattr(item, field, value)
+    return bool(changed)
+
+
+def mark_barcodes(session, barcodes, user=None):
+    """
+    Barkod listesini tek seferde görüldü olarak işaretler.
+
+    Barkodlar tek sorguda çözülür, görülmemiş kalemler tek UPDATE ile
+    işaretlenir ve sayaç değişen satır sayısı kadar artırılır.
+    Dönüş: ([{"barkod", "result", "item_id"}], yeni işaretlenen adet)
+    """
+    codes = [str(code).strip() for code in barcodes if str(code or "").strip()]
+    with transaction.atomic():
+        rows = {
+            barkod: (item_id, seen)
+            for item_id, barkod, seen in (
+                session.items
+                .select_for_update()
+                .filter(barkod__in=set(codes))
+                .values_list("id", "barkod", "seen")
+            )
+        }
+        to_mark = [item_id for item_id, seen in rows.values() if not seen]
+        record_unknown_scans(session, [code for code in codes if code not in rows], user)
+        marked = 0
+        if to_mark:
+            marked = InventoryItem.objects.filter(id__in=to_mark, seen=False).update(
+                seen=True, seen_at=timezone.now(), seen_by=user,
+            )
+            _adjust_seen_counter(session, marked)
+
+    results = []
+    newly_seen = set(to_mark)
+    for code in codes:
+        if code not in rows:
+            results.append({"barkod": code, "result": RESULT_UNKNOWN, "item_id": None})
+            continue
+        item_id = rows[code][0]
+        if item_id in newly_seen:
+            newly_seen.discard(item_id)  # aynı istekte tekrar okutulursa "already_seen"
+            results.append({"barkod": code, "result": RESULT_SEEN, "item_id": item_id})
+        else:
+            results.append({"barkod": code, "result": RESULT_ALREADY_SEEN, "item_id": item_id})
+    return results, marked
+
+
+# --- Kalem listesi ---
+
+
+def encode_items_cursor(item):
+    raw = json.dumps([item.seen, item.raf_kodu or "", item.barkod, item.id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_items_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        seen, raf_kodu, barkod, pk = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return bool(seen), str(raf_kodu), str(barkod), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+def _after_cursor(cursor):
+    # Sıralama: -seen, raf_kodu, barkod, id
+    seen, raf_kodu, barkod, pk = cursor
+    same_shelf = Q(raf_kodu=raf_kodu) & (Q(barkod__gt=barkod) | Q(barkod=barkod, id__gt=pk))
+    same_seen = Q(seen=seen) & (Q(raf_kodu__gt=raf_kodu) | same_shelf)
+    if seen:
+        return Q(seen=False) | same_seen
+    return same_seen
+
+
+def filter_items(session, status_filter="unseen", search=None):
+    qs = session.items.all()
+    if status_filter == "unseen":
+        qs = qs.filter(seen=False)
+    elif status_filter == "seen":
+        qs = qs.filter(seen=True)
+    search = (search or "").strip()
+    if search:
+        # Önek araması: (session, barkod) ve (session, raf_kodu) indekslerinden
+        variants = {search, search.upper()}
+        condition = Q()
+        for variant in variants:
+            condition |= Q(barkod__startswith=variant) | Q(raf_kodu__startswith=variant)
+        qs = qs.filter(condition)
+    return qs
+
+
+def items_page_queryset(qs, limit, cursor=None):
+    """Sayfa sorgusu: cursor sonrası `limit + 1` kalem (fazlası sonraki sayfa var demektir)."""
+    after = decode_items_cursor(cursor)
+    if after:
+        qs = qs.filter(_after_cursor(after))
+    return qs.order_by("-seen", "raf_kodu", "barkod", "id")[: limit + 1]
+
+
+def items_page(qs, limit, cursor=None):
+    """Bir sayfa kalem ve (varsa) sonraki sayfanın cursor'ı."""
+    rows = list(items_page_queryset(qs, limit, cursor))
+    if len(rows) > limit:
+        return rows[:limit], encode_items_cursor(rows[limit - 1])
+    return rows, None
+
+
+def estimated_count(qs):
+    """PostgreSQL planlayıcısının satır tahmini; diğer veritabanlarında None."""
+    if connection.vendor != "postgresql":
+        return None
+    try:
+        plan = json.loads(qs.order_by().explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def items_count(session, qs, status_filter, search, mode):
+    """
+    (adet, kesin_mi). Arama yoksa sayaçlardan hesaplanır (sorgu yok);
+    aramada `mode="exact"` ise COUNT, aksi halde planlayıcı tahmini.
+    """
+    if not (search or "").strip():
+        if status_filter == "seen":
+            return session.seen_items, True
+        if status_filter == "unseen":
+            return max(0, session.total_items - session.seen_items), True
+        return session.total_items, True
+    if mode == "exact":
+        return qs.count(), True
+    if mode == "none":
+        return None, False
+    return estimated_count(qs), False
+
+
+# --- Mutabakat ---
+
+
+def _active_loan_exists():
+    return Exists(OduncKaydi.objects.filter(kitap_nusha_id=OuterRef("kitap_nusha_id"), durum__in=ACTIVE_LOAN_STATES))
+
+
+def _copy_exists():
+    return Exists(KitapNusha.objects.filter(barkod=OuterRef("barkod")))
+
+
+def reconciliation_queryset(session, category):
+    """
+    Kategorinin tamamını tek sorgu olarak döndürür. Kalem kategorileri
+    InventoryItem, okutma kategorileri InventoryUnknownScan sorgusudur.
+    """
+    if category == RECON_MISSING:
+        return session.items.filter(seen=False)
+    if category == RECON_ON_LOAN:
+        return session.items.filter(seen=True).filter(_active_loan_exists())
+    if category == RECON_LOST_DAMAGED:
+        return session.items.filter(seen=True, kitap_nusha__durum__in=PROBLEM_COPY_STATES)
+    if category == RECON_OUT_OF_SCOPE:
+        return session.unknown_scans.filter(_copy_exists())
+    if category == RECON_UNKNOWN:
+        return session.unknown_scans.exclude(_copy_exists())
+    raise ValueError(f"Bilinmeyen kategori: {category}")
+
+
+def reconciliation_summary(session):
+    """Kategori başına adet; sayaçlar + iki toplama sorgusu."""
+    seen_items = session.items.filter(seen=True).aggregate(
+        on_loan=Count("id", filter=Q(_active_loan_exists())),
+        lost_damaged=Count("id", filter=Q(kitap_nusha__durum__in=PROBLEM_COPY_STATES)),
+    )
+    scans = session.unknown_scans.annotate(has_copy=_copy_exists()).aggregate(
+        out_of_scope=Count("id", filter=Q(has_copy=True)),
+        unknown=Count("id", filter=Q(has_copy=False)),
+    )
+    return {
+        RECON_MISSING: max(0, session.total_items - session.seen_items),
+        RECON_ON_LOAN: seen_items["on_loan"],
+        RECON_LOST_DAMAGED: seen_items["lost_damaged"],
+        RECON_OUT_OF_SCOPE: scans["out_of_scope"],
+        RECON_UNKNOWN: scans["unknown"],
+    }
+
+
+def _item_row(category, item):
+    return {
+        "kategori": category,
+        "barkod": item["barkod"],
+        "kitap_baslik": item["kitap_baslik"],
+        "raf_kodu": item["raf_kodu"],
+        "katalog_durumu": item["kitap_nusha__durum"],
+        "seen_at": item["seen_at"],
+    }
+
+
+def _scan_row(category, scan):
+    return {
+        "kategori": category,
+        "barkod": scan["barkod"],
+        "kitap_baslik": "",
+        "raf_kodu": "",
+        "katalog_durumu": "",
+        "seen_at": scan["scanned_at"],
+    }
+
+
+_ITEM_FIELDS = ("id", "barkod", "kitap_baslik", "raf_kodu", "kitap_nusha__durum", "seen_at")
+_SCAN_FIELDS = ("id", "barkod", "scanned_at")
+
+
+def _is_scan_category(category):
+    return category in (RECON_OUT_OF_SCOPE, RECON_UNKNOWN)
+
+
+def reconciliation_page(session, category, limit, after_id=None):
+    """
+    Kategorinin bir sayfası, id üzerinden keyset. (satırlar, sonraki_id) döndürür.
+    """
+    qs = reconciliation_queryset(session, category)
+    if after_id:
+        qs = qs.filter(id__gt=after_id)
+    is_scan = _is_scan_category(category)
+    rows = list(qs.order_by("id").values(*(_SCAN_FIELDS if is_scan else _ITEM_FIELDS))[: limit + 1])
+    build = _scan_row if is_scan else _item_row
+    page = [build(category, row) for row in rows[:limit]]
+    next_id = rows[limit - 1]["id"] if len(rows) > limit else None
+    return page, next_id
+
+
+def iter_reconciliation_rows(session, categories=None, chunk_size=2000):
+    """CSV için tüm kategorilerin satırları; sunucu tarafı imleçle akıtılır."""
+    for category in categories or RECON_CATEGORIES:
+        qs = reconciliation_queryset(session, category)
+        if _is_scan_category(category):
+            for scan in qs.order_by("barkod").values(*_SCAN_FIELDS).iterator(chunk_size=chunk_size):
+                yield _scan_row(category, scan)
+        else:
+            rows = qs.order_by("raf_kodu", "barkod").values(*_ITEM_FIELDS)
+            for item in rows.iterator(chunk_size=chunk_size):
+                yield _item_row(category, item)
@@ -2,12 +2,19 @@
 
 from __future__ import annotations
 
-from datetime import timedelta
+import json
+import logging
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
 from decimal import Decimal
 from zoneinfo import ZoneInfo
 
-from django.db import transaction
-from django.db.models import Sum
+from django.conf import settings as django_settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import Q
 from django.utils import timezone
 
 from .loan_policy import (
@@ -18,8 +25,32 @@ from .loan_policy import (
     daily_penalty_rate_for_role,
     get_snapshot,
     penalty_delay_for_role,
+    penalty_totals_by_student,
 )
-from .models import OduncKaydi, NotificationSettings
+from . import notifications
+from .models import OduncKaydi, NotificationSettings, ScheduledJobRun
+from .stats import refresh_loan_rollups, rollup_state
+
+
+logger = logging.getLogger(__name__)
+
+OVERDUE_CHUNK_SIZE = 500
+OVERDUE_JOB = "overdue"
+STATS_JOB = "stats"
+SCHEDULER_LOCK_NAME = "kutuphane.run_scheduled_tasks"
+# Süreci ölen (ör. yeniden başlatılan worker) "running" kayıtları son yaşam
+# sinyalinden (`heartbeat_at`) bu süre sonra düşer; süren tarama her parçada sinyal verir
+JOB_RUN_STALE_AFTER = timedelta(minutes=30)
+# Yalnızca durum değişen kayıtlar "durum" alanıyla yazılır; ödeme alanlarına dokunulmaz
+OVERDUE_STATUS_FIELDS = ("durum",)
+OVERDUE_UPDATE_FIELDS = (
+    "durum",
+    "gecikme_cezasi",
+    "gecikme_cezasi_odendi",
+    "gecikme_odeme_tarihi",
+    "gecikme_odeme_tutari",
+)
+
 
 def iter_open_loans(lock=False):
     qs = (
@@ -29,107 +60,150 @@ def iter_open_loans(lock=False):
         .prefetch_related("ogrenci__rol")
     )
     if lock:
-        qs = qs.select_for_update()
+        qs = qs.select_for_update(of=("self",))
     return qs
 
 
-def update_overdue_loans(now=None, *, use_lock=False):
-    """Açık ödünç kayıtlarını tarayıp gecikenleri günceller."""
+def open_loans_chunk(last_pk, chunk_size=OVERDUE_CHUNK_SIZE):
+    """Gecikme taramasının bir parçası: `last_pk` sonrasındaki açık kayıtlar, kilitli."""
+    return iter_open_loans(lock=True).filter(pk__gt=last_pk).order_by("pk")[:chunk_size]
+
+
+def _recalculate_loan(loan, snapshot: LoanPolicySnapshot, now, outstanding: dict):
+    """
+    Tek bir kaydın gecikme durumunu ve cezasını bellekte günceller.
+    `outstanding` öğrenci bazlı ödenmemiş ceza toplamlarıdır; kayıt değiştikçe
+    yerinde güncellenir, böylece aynı çalıştırmadaki sonraki kayıtlar güncel toplamı görür.
+    Dönüş: (değişti_mi, gecikmise_gecti, geri_alindi, ceza_yeniden_hesaplandi, ceza)
+    """
+    due = loan.iade_tarihi
+    role = getattr(loan.ogrenci, "rol", None)
+    effective_due = compute_effective_due(due, snapshot, role)
+    if not effective_due:
+        return False, False, False, False, None
+
+    is_overdue = effective_due < now
+    overdue_days = 0
+    if is_overdue:
+        overdue_days = compute_overdue_days(due, snapshot, role, now=now)
+
+    changed = False
+    became_overdue = False
+    reverted = False
+    penalty_value = None
+    own_unpaid = (
+        Decimal(loan.gecikme_cezasi)
+        if loan.gecikme_cezasi and loan.gecikme_cezasi > 0 and not loan.gecikme_cezasi_odendi
+        else Decimal("0")
+    )
+
+    if is_overdue:
+        rate = daily_penalty_rate_for_role(snapshot, role)
+        if rate and rate > 0:
+            penalty_delay = penalty_delay_for_role(snapshot, role)
+            other_total = outstanding.get(loan.ogrenci_id, Decimal("0")) - own_unpaid
+            penalty_value = calculate_penalty(
+                snapshot,
+                role,
+                overdue_days,
+                penalty_delay,
+                other_active_penalties=other_total,
+                rate=rate,
+            )
+            if penalty_value is not None and penalty_value <= 0:
+                penalty_value = None
+
+        if loan.durum != "gecikmis":
+            loan.durum = "gecikmis"
+            changed = True
+            became_overdue = True
+    else:
+        if loan.durum == "gecikmis":
+            loan.durum = "oduncte"
+            changed = True
+            reverted = True
+
+    # Ceza güncellemesi
+    recalculated = False
+    if penalty_value is None and loan.gecikme_cezasi:
+        loan.gecikme_cezasi = None
+        recalculated = True
+    elif penalty_value is not None and loan.gecikme_cezasi != penalty_value:
+        loan.gecikme_cezasi = penalty_value
+        recalculated = True
+
+    if recalculated:
+        changed = True
+        loan.gecikme_cezasi_odendi = False
+        loan.gecikme_odeme_tarihi = None
+        loan.gecikme_odeme_tutari = None
+        new_unpaid = penalty_value if penalty_value is not None else Decimal("0")
+        outstanding[loan.ogrenci_id] = (
+            outstanding.get(loan.ogrenci_id, Decimal("0")) - own_unpaid + new_unpaid
+        )
+
+    return changed, became_overdue, reverted, recalculated, penalty_value
+
+
+def update_overdue_loans(now=None, *, chunk_size=OVERDUE_CHUNK_SIZE, heartbeat=None):
+    """
+    Açık ödünç kayıtlarını tarayıp gecikenleri günceller.
+
+    Öğrencilerin ödenmemiş ceza toplamları tek bir gruplanmış sorguda önceden
+    hesaplanır; kayıtlar `chunk_size` büyüklüğünde parçalar halinde işlenir ve her
+    parça kendi kısa transaction'ı içinde satır kilidiyle okunup `bulk_update` ile
+    yazılır. Kilit, tarama sırasında masaüstünden kaydedilen bir ceza ödemesinin
+    eski değerle ezilmesini önler; parçalar kısa olduğundan masaüstü işlemleri
+    uzun beklemez. Yalnızca durumu değişen kayıtlarda ödeme alanları yazılmaz.
+    `heartbeat` verilirse her parçadan sonra çağrılır (iş kaydının canlı kalması için).
+    """
 
     if now is None:
         now = timezone.now()
 
     snapshot = get_snapshot()
+    outstanding = {
+        student_id: totals.unpaid_total
+        for student_id, totals in penalty_totals_by_student(None).items()
+    }
 
     updated_overdue = 0
     reverted = 0
     recalculated = 0
     total_penalty = Decimal("0")
 
-    with transaction.atomic():
-        for loan in iter_open_loans(lock=use_lock):
-            due = loan.iade_tarihi
-            role = getattr(loan.ogrenci, "rol", None)
-            effective_due = compute_effective_due(due, snapshot, role)
-            if not effective_due:
-                continue
-
-            is_overdue = effective_due < now
-            overdue_days = 0
-            if is_overdue:
-                overdue_days = compute_overdue_days(due, snapshot, role, now=now)
-
-            fields = []
-            penalty_value = None
-
-            if is_overdue:
-                rate = daily_penalty_rate_for_role(snapshot, role)
-                if rate and rate > 0:
-                    penalty_delay = penalty_delay_for_role(snapshot, role)
-                    other_total = (
-                        OduncKaydi.objects
-                        .filter(
-                            ogrenci=loan.ogrenci,
-                            gecikme_cezasi__gt=0,
-                            gecikme_cezasi_odendi=False,
-                        )
-                        .exclude(pk=loan.pk)
-                        .aggregate(total=Sum("gecikme_cezasi"))
-                        .get("total")
-                        or Decimal("0")
-                    )
-                    penalty_value = calculate_penalty(
-                        snapshot,
-                        role,
-                        overdue_days,
-                        penalty_delay,
-                        other_active_penalties=other_total,
-                        rate=rate,
-                    )
-                    if penalty_value is not None and penalty_value <= 0:
-                        penalty_value = None
-                else:
-                    penalty_value = None
-
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            # Birincil anahtar üzerinden keyset ile parça al; kilit yalnızca bu parça için tutulur.
+            chunk = list(open_loans_chunk(last_pk, chunk_size))
+            if not chunk:
+                break
+
+            status_only = []
+            recalculated_rows = []
+            for loan in chunk:
+                changed, became_overdue, was_reverted, was_recalculated, penalty_value = _recalculate_loan(
+                    loan, snapshot, now, outstanding
+                )
                 if penalty_value is not None:
                     total_penalty += penalty_value
-
-                if loan.durum != "gecikmis":
-                    loan.durum = "gecikmis"
-                    fields.append("durum")
-                    updated_overdue += 1
-            else:
-                if loan.durum == "gecikmis":
-                    loan.durum = "oduncte"
-                    fields.append("durum")
-                    reverted += 1
-
-            # Ceza güncellemesi
-            reset_paid_fields = False
-            if penalty_value is None and loan.gecikme_cezasi:
-                loan.gecikme_cezasi = None
-                fields.append("gecikme_cezasi")
-                recalculated += 1
-                reset_paid_fields = True
-            elif penalty_value is not None and loan.gecikme_cezasi != penalty_value:
-                loan.gecikme_cezasi = penalty_value
-                fields.append("gecikme_cezasi")
-                recalculated += 1
-                reset_paid_fields = True
-
-            if reset_paid_fields:
-                if loan.gecikme_cezasi_odendi:
-                    loan.gecikme_cezasi_odendi = False
-                    fields.append("gecikme_cezasi_odendi")
-                if loan.gecikme_odeme_tarihi is not None:
-                    loan.gecikme_odeme_tarihi = None
-                    fields.append("gecikme_odeme_tarihi")
-                if loan.gecikme_odeme_tutari is not None:
-                    loan.gecikme_odeme_tutari = None
-                    fields.append("gecikme_odeme_tutari")
-
-            if fields:
-                loan.save(update_fields=fields)
+                updated_overdue += int(became_overdue)
+                reverted += int(was_reverted)
+                recalculated += int(was_recalculated)
+                if was_recalculated:
+                    recalculated_rows.append(loan)
+                elif changed:
+                    status_only.append(loan)
+
+            if status_only:
+                OduncKaydi.objects.bulk_update(status_only, OVERDUE_STATUS_FIELDS)
+            if recalculated_rows:
+                OduncKaydi.objects.bulk_update(recalculated_rows, OVERDUE_UPDATE_FIELDS)
+
+        last_pk = chunk[-1].pk
+        if heartbeat is not None:
+            heartbeat()
 
     return {
         "updated_overdue": updated_overdue,
@@ -215,8 +289,8 @@ def _schedule_windows(schedule: dict | None, reference=None):
         last_target = target
 
     return (
-        last_target.astimezone(timezone.utc),
-        next_target.astimezone(timezone.utc),
+        last_target.astimezone(dt_timezone.utc),
+        next_target.astimezone(dt_timezone.utc),
     )
 
 
@@ -276,31 +350,204 @@ def _channel_message_types(settings: NotificationSettings, channel: str):
 
 
 def dispatch_notifications(channel: str, types: list[str], when=None):
-    """Seçilen kanal için bildirimi tetikleyin. Şimdilik gerçek gönderim değil, yer tutucu."""
-    # TODO: E-posta/SMS/mobil gönderimleri burada uygulanacak.
-    # Şimdilik sadece loglama yapılabilir.
-    return {
-        "channel": channel,
-        "types": types,
-        "timestamp": when.isoformat() if when else timezone.now().isoformat(),
-    }
+    """Seçilen kanal için bildirimleri kuyruğa ekler ve gönderir (bkz. notifications.py)."""
+    return notifications.dispatch_notifications(channel, types, now=when)
+
+
+@contextmanager
+def advisory_lock(name=SCHEDULER_LOCK_NAME, using=DEFAULT_DB_ALIAS):
+    """
+    PostgreSQL oturum düzeyinde advisory lock; kilit alınamazsa False verir.
+    Birden çok sunucu/cron aynı anda tetiklense de işleri yalnızca biri yürütür.
+    Diğer veritabanlarında (tek düğümlü SQLite) kilit her zaman alınmış sayılır.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        yield True
+        return
+    key = zlib.crc32(name.encode("utf-8"))
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+        acquired = bool(cursor.fetchone()[0])
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+
+
+def _json_safe(value):
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def overdue_rows(result):
+    return result.get("updated_overdue", 0) + result.get("reverted", 0) + result.get("recalculated", 0)
+
+
+class JobAlreadyRunning(Exception):
+    def __init__(self, run):
+        super().__init__(f"{run.job} işi zaten çalışıyor (#{run.pk}).")
+        self.run = run
+
+
+def _expire_stale_runs(job):
+    now = timezone.now()
+    cutoff = now - JOB_RUN_STALE_AFTER
+    ScheduledJobRun.objects.filter(job=job, status="running").filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    ).update(status="error", finished_at=now, error="Zaman aşımı: iş tamamlanmadan sonlandı.")
+
+
+def touch_job_run(run):
+    """Çalışan kaydın yaşam sinyalini yeniler; süren iş zaman aşımına düşmez."""
+    ScheduledJobRun.objects.filter(pk=run.pk, status="running").update(heartbeat_at=timezone.now())
+
+
+def claim_job_run(job):
+    """
+    İş için "running" kaydı açar ve (kayıt, yeni_mi) döndürür. İş zaten
+    çalışıyorsa o kayıt döner: kısmi tekil kısıt (`jobrun_single_running`)
+    süreçler ve sunucular arasında tek uçuşu garanti eder.
+    """
+    _expire_stale_runs(job)
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                started_at = timezone.now()
+                run = ScheduledJobRun.objects.create(
+                    job=job, started_at=started_at, heartbeat_at=started_at, status="running"
+                )
+                return run, True
+        except IntegrityError:
+            running = ScheduledJobRun.objects.filter(job=job, status="running").first()
+            if running is not None:
+                return running, False
+            # Çalışan iş arada bitti; bir kez daha dene
+    raise JobAlreadyRunning(ScheduledJobRun(job=job))
+
+
+def run_recorded(job, func, rows=None, run=None):
+    """
+    `func()` çalıştırır ve süresini, etkilenen satır sayısını (`rows(sonuç)`)
+    ve sonucunu `ScheduledJobRun` kaydına yazar. `run` verilmezse kayıt burada
+    açılır; iş zaten çalışıyorsa `JobAlreadyRunning` fırlatılır. Hata kaydedilip
+    yeniden fırlatılır.
+    """
+    if run is None:
+        run, claimed = claim_job_run(job)
+        if not claimed:
+            raise JobAlreadyRunning(run)
+    try:
+        result = func()
+    except Exception as exc:
+        _finish_run(run, status="error", error=f"{exc.__class__.__name__}: {exc}")
+        raise
+    _finish_run(
+        run,
+        status="ok",
+        rows=max(0, int(rows(result) if rows else 0)),
+        result=_json_safe(result) if isinstance(result, dict) else {},
+    )
+    return result
+
+
+def _finish_run(run, **fields):
+    run.finished_at = timezone.now()
+    run.duration_ms = max(0, int((run.finished_at - run.started_at).total_seconds() * 1000))
+    for name, value in fields.items():
+        setattr(run, name, value)
+    run.save(update_fields=["finished_at", "duration_ms", *fields])
+
+
+def last_job_run(job):
+    """İşin son tamamlanan (başarılı ya da hatalı) çalıştırması."""
+    return ScheduledJobRun.objects.filter(job=job).exclude(status="running").order_by("-started_at").first()
+
+
+def start_in_background(func, *args):
+    """
+    `func(*args)` çağrısını istek dışında ayrı bir thread'de yürütür. Hata
+    loglanır (iş kaydında da durur); thread'in veritabanı bağlantıları iş bitince kapatılır.
+    """
+    def target():
+        try:
+            func(*args)
+        except Exception:
+            logger.exception("Arka plan işi başarısız: %s", getattr(func, "__name__", func))
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=target, name=f"job-{getattr(func, '__name__', 'task')}", daemon=True)
+    thread.start()
+    return thread
+
+
+def execute_overdue_run(run, now=None):
+    """Açılmış gecikme kaydını yürütür ve günün çalıştırmasını işaretler."""
+    now = now or timezone.now()
+    result = run_recorded(
+        OVERDUE_JOB,
+        lambda: update_overdue_loans(now=now, heartbeat=lambda: touch_job_run(run)),
+        rows=overdue_rows,
+        run=run,
+    )
+    settings = NotificationSettings.get_solo()
+    mark_overdue_ran(settings, now)
+    settings.save(update_fields=["overdue_last_run"])
+    return result
+
+
+def execute_stats_run(run, now=None):
+    """Açılmış istatistik kaydını yürütür: yeni ödünçler günlük toplamlara eklenir."""
+    return run_recorded(
+        STATS_JOB, lambda: refresh_loan_rollups(now=now), rows=lambda r: r.get("processed", 0), run=run
+    )
+
+
+def request_rollup_refresh(now=None):
+    """
+    İstatistik isteğinde toplamlar bayatsa yenilemeyi arka planda başlatır;
+    beklemeden (durum, rollup_state) döner. Durum `request_overdue_run` ile aynıdır:
+    "recent", "running" ya da "started".
+    """
+    state = rollup_state()
+    if not state["stale"]:
+        return "recent", state
+    run, claimed = claim_job_run(STATS_JOB)
+    if not claimed:
+        return "running", state
+    if getattr(django_settings, "BACKGROUND_TASK_WORKER", False):
+        from .tasks import enqueue_task
+
+        enqueue_task("stats", {"run_id": run.pk})
+    else:
+        transaction.on_commit(lambda: start_in_background(execute_stats_run, run, now))
+    return "started", state
 
 
 def run_scheduled_jobs(now=None):
     """
     Gecikmiş kayıt güncellemesi ve bildirim planlamalarını tek noktadan yürütür.
-    Bu fonksiyon belirli aralıklarla (örn. her 15 dakikada bir) çağrılmalıdır.
+    `manage.py run_scheduled_tasks` tarafından çağrılır; her iş `ScheduledJobRun`
+    olarak kaydedilir.
     """
     now = now or timezone.now()
     settings = NotificationSettings.get_solo()
     summary = {}
     fields_to_update = set()
 
+    # İstatistik toplamları her çağrıda yalnızca yeni ödünçlerle güncellenir;
+    # bir istatistik isteği yenilemeyi zaten başlattıysa ona bırakılır
+    run, claimed = claim_job_run(STATS_JOB)
+    if claimed:
+        summary["stats"] = execute_stats_run(run, now)
+
     if should_run_overdue(settings, now):
-        result = update_overdue_loans(now=now)
-        summary["overdue"] = result
-        mark_overdue_ran(settings, now)
-        fields_to_update.add("overdue_last_run")
+        # Masaüstünden başlatılmış bir tarama sürüyorsa ona bırakılır
+        run, claimed = claim_job_run(OVERDUE_JOB)
+        if claimed:
+            summary["overdue"] = execute_overdue_run(run, now)
 
     schedules = get_notification_schedule()
     for channel, schedule in schedules.items():
@@ -309,7 +556,11 @@ def run_scheduled_jobs(now=None):
             types = _channel_message_types(settings, channel)
             if not types:
                 continue
-            dispatch_result = dispatch_notifications(channel, types, when=now)
+            dispatch_result = run_recorded(
+                f"{channel}_notifications",
+                lambda: dispatch_notifications(channel, types, when=now),
+                rows=lambda r: r.get("queued", 0) + r.get("sent", 0),
+            )
             summary[f"{channel}_notifications"] = dispatch_result
             mark_channel_run(settings, channel, now)
             fields_to_update.add(f"{channel}_schedule_last_run")
@@ -318,3 +569,45 @@ def run_scheduled_jobs(now=None):
         settings.save(update_fields=list(fields_to_update))
 
     return summary
+
+
+def request_overdue_run(now=None):
+    """
+    Masaüstü girişindeki gecikme güncellemesi isteği; beklemeden (kayıt, durum) döner:
+        "recent"   bugünkü tarama yapılmış, kayıt son tamamlanan çalıştırmadır (yoksa None)
+        "running"  başka bir istek ya da zamanlayıcı taramayı sürdürüyor, ona katılınır
+        "started"  yeni tarama açıldı; işlem tamamlanınca arka planda başlar
+    Aynı anda gelen istekler böylece tek bir taramada birleşir.
+    """
+    now = now or timezone.now()
+    settings = NotificationSettings.get_solo()
+    if not should_run_overdue(settings, now):
+        return last_job_run(OVERDUE_JOB), "recent"
+    run, claimed = claim_job_run(OVERDUE_JOB)
+    if not claimed:
+        return run, "running"
+    if getattr(django_settings, "BACKGROUND_TASK_WORKER", False):
+        # Görev worker'ı (`run_task_worker`) çalışıyorsa tarama onun süreç havuzunda yürür
+        from .tasks import enqueue_task
+
+        enqueue_task("overdue", {"run_id": run.pk})
+    else:
+        transaction.on_commit(lambda: start_in_background(execute_overdue_run, run))
+    return run, "started"
+
+
+def next_scheduled_wakeup(now=None):
+    """
+    Bir sonraki iş zamanı: bildirim kanallarının en yakın tetiklenme anı ya da
+    (günde bir çalışan) gecikme güncellemesi için bir sonraki yerel gün başı.
+    """
+    now = now or timezone.now()
+    tz = timezone.get_current_timezone()
+    local_now = now.astimezone(tz)
+    next_midnight = (local_now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    candidates = [next_midnight.astimezone(dt_timezone.utc)]
+    for schedule in get_notification_schedule().values():
+        next_run = compute_next_schedule_run(schedule, now)
+        if next_run:
+            candidates.append(next_run)
+    return min(candidates)
@@ -2,14 +2,21 @@
 
 from __future__ import annotations
 
+import threading
+import uuid
 from dataclasses import dataclass
 from datetime import timedelta
 from decimal import Decimal
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterable
 
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import LoanPolicy, RoleLoanPolicy
+from .models import LoanPolicy, RoleLoanPolicy, OduncKaydi
 
 
 @dataclass(frozen=True)
@@ -62,9 +69,70 @@ class LoanPolicySnapshot:
         )
 
 
-def get_snapshot() -> LoanPolicySnapshot:
+# --- Süreç içi politika önbelleği ---
+#
+# Snapshot ve serileştirilmiş politika her süreçte bir kez kurulur ve paylaşılan
+# önbellekteki (CACHES) sürüm damgasıyla birlikte saklanır. LoanPolicy veya
+# RoleLoanPolicy değiştiğinde sinyaller damgayı yeniler; diğer worker'lar bir
+# sonraki istekte damganın değiştiğini görüp snapshot'ı yeniden kurar.
+
+POLICY_VERSION_CACHE_KEY = "kutuphane:loan_policy_version"
+
+_policy_cache_lock = threading.Lock()
+_policy_cache: Dict[str, object] = {"version": None, "snapshot": None, "payload": None}
+
+
+def get_policy_version() -> str:
+    version = cache.get(POLICY_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(POLICY_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(POLICY_VERSION_CACHE_KEY)
+    return version
+
+
+def bump_policy_version() -> str:
+    """Politika değiştiğinde tüm süreçlerdeki önbelleği geçersiz kılar."""
+    version = uuid.uuid4().hex
+    cache.set(POLICY_VERSION_CACHE_KEY, version, timeout=None)
+    with _policy_cache_lock:
+        _policy_cache.update(version=None, snapshot=None, payload=None)
+    return version
+
+
+def _cached_policy_state():
+    # Sürüm, veriler okunmadan önce alınır; arada gelen bir değişiklik bir
+    # sonraki istekte yeniden kurulumu tetikler.
+    version = get_policy_version()
+    with _policy_cache_lock:
+        if _policy_cache["version"] == version and _policy_cache["snapshot"] is not None:
+            return _policy_cache["snapshot"], _policy_cache["payload"]
+
+    from .serializers import LoanPolicySerializer  # döngüsel import'u önlemek için
+
     policy = LoanPolicy.get_solo()
-    return LoanPolicySnapshot.from_policy(policy)
+    snapshot = LoanPolicySnapshot.from_policy(policy)
+    payload = dict(LoanPolicySerializer(policy).data)
+    with _policy_cache_lock:
+        _policy_cache.update(version=version, snapshot=snapshot, payload=payload)
+    return snapshot, payload
+
+
+def get_snapshot() -> LoanPolicySnapshot:
+    snapshot, _ = _cached_policy_state()
+    return snapshot
+
+
+def get_policy_payload() -> dict:
+    """LoanPolicySerializer çıktısının önbellekteki kopyası (çağıran değiştirebilir)."""
+    _, payload = _cached_policy_state()
+    return dict(payload)
+
+
+@receiver([post_save, post_delete], sender=LoanPolicy)
+@receiver([post_save, post_delete], sender=RoleLoanPolicy)
+def _invalidate_policy_cache(sender, **kwargs):
+    # Diğer worker'lar commit edilmemiş veriyi yeni sürümle önbelleğe almasın
+    transaction.on_commit(bump_policy_version)
 
 
 @dataclass(frozen=True)
@@ -79,6 +147,65 @@ class RolePolicyOverride:
     daily_penalty_rate: Optional[Decimal] = None
 
 
+@dataclass(frozen=True)
+class StudentPenaltyTotals:
+    """Bir öğrencinin ödenmemiş cezalarının tek sorguda hesaplanan özeti."""
+
+    unpaid_total: Decimal = Decimal("0")
+    returned_total: Decimal = Decimal("0")
+    returned_count: int = 0
+
+    def other_than(self, loan) -> Decimal:
+        """Verilen kayıt dışındaki ödenmemiş ceza toplamı."""
+        own = getattr(loan, "gecikme_cezasi", None)
+        if own and own > 0 and not getattr(loan, "gecikme_cezasi_odendi", False):
+            return self.unpaid_total - Decimal(own)
+        return self.unpaid_total
+
+
+EMPTY_PENALTY_TOTALS = StudentPenaltyTotals()
+
+
+def penalty_totals_queryset(student_ids: Optional[Iterable[int]]):
+    """`penalty_totals_by_student` sorgusu; boş kimlik listesinde None."""
+    qs = OduncKaydi.objects.filter(gecikme_cezasi__gt=0, gecikme_cezasi_odendi=False)
+    if student_ids is not None:
+        ids = {sid for sid in student_ids if sid is not None}
+        if not ids:
+            return None
+        qs = qs.filter(ogrenci_id__in=ids)
+    returned = Q(teslim_tarihi__isnull=False)
+    return (
+        qs
+        .values("ogrenci_id")
+        .annotate(
+            unpaid_total=Sum("gecikme_cezasi"),
+            returned_total=Sum("gecikme_cezasi", filter=returned),
+            returned_count=Count("id", filter=returned),
+        )
+        .order_by()
+    )
+
+
+def penalty_totals_by_student(student_ids: Optional[Iterable[int]]) -> Dict[int, StudentPenaltyTotals]:
+    """
+    Öğrencilerin ödenmemiş ceza toplamlarını tek bir gruplanmış sorguda getirir.
+    `student_ids` None ise cezası olan tüm öğrenciler döner.
+    `returned_*` alanları yalnızca teslim edilmiş kayıtları kapsar (tahsil edilebilir cezalar).
+    """
+    rows = penalty_totals_queryset(student_ids)
+    if rows is None:
+        return {}
+    return {
+        row["ogrenci_id"]: StudentPenaltyTotals(
+            unpaid_total=Decimal(row["unpaid_total"] or 0),
+            returned_total=Decimal(row["returned_total"] or 0),
+            returned_count=row["returned_count"] or 0,
+        )
+        for row in rows
+    }
+
+
 def ensure_aware(dt):
     if dt is None:
         return None
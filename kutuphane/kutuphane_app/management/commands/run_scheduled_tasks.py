@@ -0,0 +1,65 @@
+import signal
+import threading
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from kutuphane_app.jobs import advisory_lock, next_scheduled_wakeup, run_scheduled_jobs
+
+DEFAULT_MAX_SLEEP = 60 * 60
+# Sınırın hemen ardından uyan; is_schedule_due aynı anı "henüz değil" saymasın
+WAKE_SLACK = timedelta(seconds=5)
+
+
+class Command(BaseCommand):
+    help = (
+        "Zamanlanmış işleri (istatistik, gecikme güncellemesi, bildirimler) çalıştırır. "
+        "Varsayılan tek seferliktir (cron); --loop ile bir sonraki program zamanına "
+        "kadar uyuyarak sürekli çalışır."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Sürekli çalış (systemd servisi için).")
+        parser.add_argument(
+            "--max-sleep",
+            type=int,
+            default=DEFAULT_MAX_SLEEP,
+            help="Döngüde en uzun bekleme (sn); ayar değişikliklerinin fark edilme süresi.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            if not self._run_once():
+                raise CommandError("Zamanlanmış işler başarısız oldu.")
+            return
+
+        stop = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: stop.set())
+
+        while not stop.is_set():
+            close_old_connections()
+            self._run_once()
+            now = timezone.now()
+            wake = next_scheduled_wakeup(now) + WAKE_SLACK
+            delay = max(1.0, min((wake - now).total_seconds(), options["max_sleep"]))
+            self.stdout.write(f"Sonraki çalıştırma: {timezone.localtime(now + timedelta(seconds=delay)):%Y-%m-%d %H:%M:%S}")
+            stop.wait(delay)
+
+    def _run_once(self):
+        """İşleri kilit altında bir kez çalıştırır; hata olursa False döner."""
+        with advisory_lock() as acquired:
+            if not acquired:
+                self.stdout.write("Başka bir düğüm zamanlanmış işleri yürütüyor; atlandı.")
+                return True
+            try:
+                summary = run_scheduled_jobs()
+            except Exception as exc:
+                # Döngü bir hatada durmasın; hata ScheduledJobRun kaydında da var
+                self.stderr.write(f"Zamanlanmış işler başarısız: {exc}")
+                return False
+        for job, result in summary.items():
+            self.stdout.write(f"{job}: {result}")
+        return True
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from kutuphane_app.task_pool import init_pool_process, run_pooled_task
+from kutuphane_app.tasks import claim_tasks, fail_task, run_task
+
+DEFAULT_PROCESSES = 2
+DEFAULT_POLL = 2.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Arka plan görevlerini (yedek, geri yükleme, arşiv, içe aktarma, gecikme "
+        "güncellemesi) kuyruktan alıp süreç havuzunda çalıştırır. Birden çok worker "
+        "aynı anda çalışabilir; kilitli görevler atlanır."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=DEFAULT_PROCESSES,
+            help="Havuzdaki süreç sayısı; 0 görevleri bu süreçte sırayla çalıştırır.",
+        )
+        parser.add_argument("--poll", type=float, default=DEFAULT_POLL, help="Kuyruk yoklama aralığı (sn).")
+        parser.add_argument("--once", action="store_true", help="Sıradaki görevleri bitirip çık (cron/test).")
+
+    def handle(self, *args, **options):
+        processes = max(0, options["processes"])
+        poll = max(0.1, options["poll"])
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+
+        stop = threading.Event()
+        if not options["once"]:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, lambda *_: stop.set())
+
+        executor = self._executor(processes)
+        inflight = {}
+        try:
+            while True:
+                claimed = []
+                if not stop.is_set():
+                    close_old_connections()
+                    claimed = claim_tasks(max(1, processes) - len(inflight), worker)
+                for task_id in claimed:
+                    if executor is None:
+                        self._report(task_id, run_task(task_id))
+                    else:
+                        inflight[executor.submit(run_pooled_task, task_id)] = task_id
+
+                if inflight:
+                    done, _ = wait(inflight, timeout=poll, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        task_id = inflight.pop(future)
+                        try:
+                            self._report(task_id, future.result())
+                        except BrokenProcessPool as exc:
+                            # Süreç çöktü (ör. bellek); görev başarısız sayılır, havuz yenilenir
+                            fail_task(task_id, f"Görev süreci beklenmedik şekilde sonlandı: {exc}")
+                            self._report(task_id, "failed")
+                    if executor is not None and getattr(executor, "_broken", False) and not inflight:
+                        executor.shutdown(wait=False)
+                        executor = self._executor(processes)
+                    continue
+
+                if claimed:
+                    continue
+                if stop.is_set() or options["once"]:
+                    break
+                stop.wait(poll)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    def _executor(self, processes):
+        if processes == 0:
+            return None
+        # spawn: çatallanan süreç ebeveynin veritabanı bağlantılarını paylaşmasın
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_pool_process,
+            initargs=(settings.SETTINGS_MODULE,),
+        )
+
+    def _report(self, task_id, status):
+        self.stdout.write(f"Görev #{task_id}: {status}")
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from kutuphane_app.sms import SMS_CONCURRENCY, SmsGatewayClient
+from kutuphane_app.sms_mock import MockSmsGateway
+
+
+class Command(BaseCommand):
+    help = (
+        "Ağsız deneme için yerel SMS ağ geçidini çalıştırır. Adresi bildirim "
+        "ayarlarındaki SMS API adresine yazın. --benchmark N ile geçidi arka planda "
+        "açıp N iletiyi SMS istemcisiyle göndererek gönderim hızını ölçer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8025)
+        parser.add_argument("--api-key", default="", help="Beklenen API anahtarı (boş: denetlenmez).")
+        parser.add_argument("--latency", type=float, default=0.0, help="Her isteğe eklenecek gecikme (sn).")
+        parser.add_argument("--benchmark", type=int, default=0, help="Gönderilecek deneme iletisi sayısı.")
+        parser.add_argument("--concurrency", type=int, default=SMS_CONCURRENCY)
+
+    def handle(self, *args, **options):
+        gateway = MockSmsGateway(
+            options["host"], options["port"], api_key=options["api_key"], latency=options["latency"]
+        )
+        if not options["benchmark"]:
+            self.stdout.write(f"SMS deneme ağ geçidi: {gateway.url} (durdurmak için Ctrl+C)")
+            try:
+                gateway.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                gateway.server_close()
+                self.stdout.write(f"Alınan ileti: {len(gateway.messages)}")
+            return
+
+        count = options["benchmark"]
+        with gateway:
+            client = SmsGatewayClient(gateway.url, options["api_key"], concurrency=options["concurrency"])
+            started = time.perf_counter()
+            results = client.send_all(
+                (i, f"555{i:07d}", f"Deneme iletisi {i}") for i in range(count)
+            )
+            elapsed = time.perf_counter() - started
+        sent = sum(1 for result in results if result.ok)
+        self.stdout.write(
+            f"{sent}/{count} ileti {elapsed:.2f} sn ({sent / elapsed if elapsed else 0:.0f} ileti/sn), "
+            f"{len(gateway.connections)} bağlantı, eşzamanlılık {client.concurrency}"
+        )
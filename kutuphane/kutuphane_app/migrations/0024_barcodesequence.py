@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0023_inventorysession_inventoryitem"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BarcodeSequence",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("prefix", models.CharField(max_length=20, unique=True)),
+                ("last_value", models.PositiveBigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Barkod Sayacı",
+                "verbose_name_plural": "Barkod Sayaçları",
+            },
+        ),
+    ]
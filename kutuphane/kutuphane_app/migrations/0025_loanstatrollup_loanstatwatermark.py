@@ -0,0 +1,52 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0024_barcodesequence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoanStatRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "dimension",
+                    models.CharField(
+                        choices=[
+                            ("total", "Toplam"),
+                            ("student", "Öğrenci"),
+                            ("class", "Sınıf"),
+                            ("book", "Kitap"),
+                            ("category", "Kategori"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("key", models.PositiveBigIntegerField(default=0)),
+                ("day", models.DateField()),
+                ("loan_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Ödünç İstatistiği (Günlük)",
+                "verbose_name_plural": "Ödünç İstatistikleri (Günlük)",
+                "unique_together": {("dimension", "key", "day")},
+                "indexes": [models.Index(fields=["dimension", "day"], name="loanstat_dimension_day_idx")],
+            },
+        ),
+        migrations.CreateModel(
+            name="LoanStatWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("singleton_key", models.CharField(default="default", max_length=50, unique=True)),
+                ("last_loan_id", models.PositiveBigIntegerField(default=0)),
+                ("refreshed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "İstatistik Durumu",
+                "verbose_name_plural": "İstatistik Durumu",
+            },
+        ),
+    ]
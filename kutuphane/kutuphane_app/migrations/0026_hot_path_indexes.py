@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0025_loanstatrollup_loanstatwatermark"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="odunckaydi",
+            index=models.Index(fields=["durum", "iade_tarihi", "id"], name="odunc_durum_iade_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="odunckaydi",
+            index=models.Index(
+                condition=models.Q(("teslim_tarihi__isnull", True)),
+                fields=["id"],
+                name="odunc_acik_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="odunckaydi",
+            index=models.Index(fields=["ogrenci", "durum"], name="odunc_ogrenci_durum_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="odunckaydi",
+            index=models.Index(fields=["kitap_nusha", "-odunc_tarihi", "-id"], name="odunc_nusha_gecmis_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="odunckaydi",
+            index=models.Index(
+                condition=models.Q(("gecikme_cezasi__gt", 0), ("gecikme_cezasi_odendi", False)),
+                fields=["ogrenci"],
+                name="odunc_odenmemis_ceza_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(fields=["-olusturma_zamani"], name="auditlog_zaman_idx"),
+        ),
+    ]
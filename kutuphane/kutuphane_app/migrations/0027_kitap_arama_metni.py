@@ -0,0 +1,65 @@
+import re
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+_TURKISH_FOLD = str.maketrans({"I": "ı", "İ": "i"})
+_ASCII_FOLD = str.maketrans({
+    "ı": "i", "ş": "s", "ğ": "g", "ü": "u", "ö": "o", "ç": "c",
+    "â": "a", "î": "i", "û": "u",
+})
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def _normalize(*parts):
+    # search.normalize_search_text ile aynı; migration uygulama koduna bağlı kalmasın
+    text = " ".join(str(part) for part in parts if part)
+    text = text.translate(_TURKISH_FOLD).lower().translate(_ASCII_FOLD)
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def fill_search_text(apps, schema_editor):
+    Kitap = apps.get_model("kutuphane_app", "Kitap")
+    batch = []
+    for kitap in Kitap.objects.select_related("yazar").only("id", "baslik", "isbn", "yazar__ad_soyad").iterator(chunk_size=2000):
+        isbn = re.sub(r"[^0-9Xx]", "", kitap.isbn or "")
+        kitap.arama_metni = _normalize(kitap.baslik, kitap.yazar.ad_soyad if kitap.yazar else "", isbn)
+        batch.append(kitap)
+        if len(batch) >= 2000:
+            Kitap.objects.bulk_update(batch, ["arama_metni"])
+            batch = []
+    if batch:
+        Kitap.objects.bulk_update(batch, ["arama_metni"])
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS kitap_arama_trgm_idx "
+        "ON kutuphane_app_kitap USING gin (arama_metni gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS kitap_arama_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0026_hot_path_indexes"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="kitap",
+            name="arama_metni",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
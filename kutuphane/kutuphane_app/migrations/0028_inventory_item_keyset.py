@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+
+def blank_null_shelves(apps, schema_editor):
+    InventoryItem = apps.get_model("kutuphane_app", "InventoryItem")
+    InventoryItem.objects.filter(raf_kodu__isnull=True).update(raf_kodu="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0027_kitap_arama_metni"),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_null_shelves, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="inventoryitem",
+            name="raf_kodu",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+        migrations.AlterModelOptions(
+            name="inventoryitem",
+            options={
+                "ordering": ("-seen", "raf_kodu", "barkod", "id"),
+                "verbose_name": "Sayım Kalemi",
+                "verbose_name_plural": "Sayım Kalemleri",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="inventoryitem",
+            index=models.Index(fields=["session", "-seen", "raf_kodu", "barkod", "id"], name="inv_item_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="inventoryitem",
+            index=models.Index(
+                fields=["session", "barkod"],
+                name="inv_item_barkod_prefix_idx",
+                opclasses=["int8_ops", "varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inventoryitem",
+            index=models.Index(
+                fields=["session", "raf_kodu"],
+                name="inv_item_raf_prefix_idx",
+                opclasses=["int8_ops", "varchar_pattern_ops"],
+            ),
+        ),
+    ]
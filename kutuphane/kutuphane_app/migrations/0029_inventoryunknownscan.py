@@ -0,0 +1,46 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0028_inventory_item_keyset"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryUnknownScan",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("barkod", models.CharField(max_length=50)),
+                ("scanned_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "scanned_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="unknown_scans",
+                        to="kutuphane_app.inventorysession",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tanımsız Okutma",
+                "verbose_name_plural": "Tanımsız Okutmalar",
+                "ordering": ("barkod", "id"),
+                "unique_together": {("session", "barkod")},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0029_inventoryunknownscan"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auditlog",
+            name="client_id",
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="auditlog",
+            name="istemci_zamani",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0030_auditlog_client_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduledJobRun",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("job", models.CharField(max_length=50)),
+                ("started_at", models.DateTimeField()),
+                ("finished_at", models.DateTimeField()),
+                ("duration_ms", models.PositiveIntegerField(default=0)),
+                ("rows", models.PositiveIntegerField(default=0)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("ok", "Başarılı"), ("error", "Hata")], default="ok", max_length=10
+                    ),
+                ),
+                ("result", models.JSONField(blank=True, default=dict)),
+                ("error", models.TextField(blank=True)),
+            ],
+            options={
+                "verbose_name": "Zamanlanmış İş Kaydı",
+                "verbose_name_plural": "Zamanlanmış İş Kayıtları",
+                "ordering": ("-started_at",),
+                "indexes": [models.Index(fields=["job", "-started_at"], name="jobrun_job_started_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0031_scheduledjobrun"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="scheduledjobrun",
+            name="finished_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="scheduledjobrun",
+            name="status",
+            field=models.CharField(
+                choices=[("running", "Çalışıyor"), ("ok", "Başarılı"), ("error", "Hata")],
+                default="ok",
+                max_length=10,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="scheduledjobrun",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "running")),
+                fields=("job",),
+                name="jobrun_single_running",
+            ),
+        ),
+    ]
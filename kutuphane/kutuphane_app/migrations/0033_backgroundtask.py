@@ -0,0 +1,59 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0032_scheduledjobrun_running"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BackgroundTask",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("backup", "Yedek alma"),
+                            ("restore", "Geri yükleme"),
+                            ("archive", "Arşivleme"),
+                            ("import", "Öğrenci içe aktarma"),
+                            ("overdue", "Gecikme güncellemesi"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Sırada"),
+                            ("running", "Çalışıyor"),
+                            ("done", "Tamamlandı"),
+                            ("failed", "Başarısız"),
+                        ],
+                        default="queued",
+                        max_length=10,
+                    ),
+                ),
+                ("params", models.JSONField(blank=True, default=dict)),
+                ("progress", models.JSONField(blank=True, default=dict)),
+                ("result", models.JSONField(blank=True, default=dict)),
+                ("error", models.TextField(blank=True)),
+                ("worker", models.CharField(blank=True, max_length=100)),
+                ("created_by", models.CharField(blank=True, max_length=150)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Arka Plan Görevi",
+                "verbose_name_plural": "Arka Plan Görevleri",
+                "ordering": ("-created_at", "-id"),
+                "indexes": [models.Index(fields=["status", "created_at"], name="task_status_created_idx")],
+            },
+        ),
+    ]
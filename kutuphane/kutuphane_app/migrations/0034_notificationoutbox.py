@@ -0,0 +1,79 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0033_backgroundtask"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationsettings",
+            name="email_rate_per_minute",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="NotificationOutbox",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "channel",
+                    models.CharField(
+                        choices=[("email", "E-posta"), ("sms", "SMS"), ("mobile", "Mobil")], max_length=10
+                    ),
+                ),
+                (
+                    "message_type",
+                    models.CharField(
+                        choices=[("due_reminder", "İade hatırlatması"), ("overdue", "Gecikme bildirimi")],
+                        max_length=20,
+                    ),
+                ),
+                ("due_date", models.DateField()),
+                ("recipient", models.CharField(max_length=254)),
+                ("subject", models.CharField(blank=True, max_length=200)),
+                ("body", models.TextField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Bekliyor"),
+                            ("sending", "Gönderiliyor"),
+                            ("sent", "Gönderildi"),
+                            ("failed", "Başarısız"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "odunc",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="bildirimler",
+                        to="kutuphane_app.odunckaydi",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Bildirim Kuyruğu",
+                "verbose_name_plural": "Bildirim Kuyruğu",
+                "ordering": ("id",),
+                "indexes": [
+                    models.Index(fields=["channel", "status", "id"], name="outbox_channel_status_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("odunc", "channel", "message_type", "due_date"), name="outbox_dedupe"
+                    )
+                ],
+            },
+        ),
+    ]
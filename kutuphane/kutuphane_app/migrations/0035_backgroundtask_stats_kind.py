@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0034_notificationoutbox"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="backgroundtask",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("backup", "Yedek alma"),
+                    ("restore", "Geri yükleme"),
+                    ("archive", "Arşivleme"),
+                    ("import", "Öğrenci içe aktarma"),
+                    ("overdue", "Gecikme güncellemesi"),
+                    ("stats", "İstatistik yenileme"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0035_backgroundtask_stats_kind"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scheduledjobrun",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kutuphane_app", "0036_scheduledjobrun_heartbeat_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auditlog",
+            name="istemci_kullanici",
+            field=models.CharField(blank=True, max_length=150),
+        ),
+    ]
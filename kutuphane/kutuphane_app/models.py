@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from datetime import time
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -135,11 +136,35 @@ class Kitap(models.Model):
     resim3 = models.ImageField(upload_to="kitap_resimleri/", blank=True, null=True)
     resim4 = models.ImageField(upload_to="kitap_resimleri/", blank=True, null=True)
     resim5 = models.ImageField(upload_to="kitap_resimleri/", blank=True, null=True)
+    # Başlık + yazar + ISBN; Türkçe küçültülmüş ve aksansız (bkz. search.py)
+    arama_metni = models.TextField(blank=True, default="", editable=False)
+
+    def save(self, *args, **kwargs):
+        from .search import book_search_text
+
+        self.arama_metni = book_search_text(self)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "arama_metni" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "arama_metni"]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.baslik
 
 
+@receiver(post_save, sender=Yazar)
+def refresh_author_search_text(sender, instance, created, **kwargs):
+    if created:
+        return
+    from .search import book_search_text
+
+    kitaplar = list(Kitap.objects.filter(yazar=instance).only("id", "baslik", "isbn", "yazar"))
+    for kitap in kitaplar:
+        kitap.yazar = instance
+        kitap.arama_metni = book_search_text(kitap)
+    Kitap.objects.bulk_update(kitaplar, ["arama_metni"], batch_size=1000)
+
+
 # --- Kitap Nüshaları (Fiziksel Kopya) ---
 class KitapNusha(models.Model):
     kitap = models.ForeignKey(Kitap, on_delete=models.CASCADE, related_name="nushalar")
@@ -157,6 +182,20 @@ class KitapNusha(models.Model):
         return f"{self.kitap.baslik} - {self.barkod}"
 
 
+# --- Barkod sayaçları (önek başına son verilen numara) ---
+class BarcodeSequence(models.Model):
+    prefix = models.CharField(max_length=20, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Barkod Sayacı"
+        verbose_name_plural = "Barkod Sayaçları"
+
+    def __str__(self):
+        return f"{self.prefix} → {self.last_value}"
+
+
 # --- Ödünç Kayıtları ---
 class OduncKaydi(models.Model):
     ogrenci = models.ForeignKey(Ogrenci, on_delete=models.CASCADE)
@@ -178,6 +217,20 @@ class OduncKaydi(models.Model):
     gecikme_odeme_tarihi = models.DateTimeField(blank=True, null=True)
     gecikme_odeme_tutari = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
 
+    class Meta:
+        # Sıcak sorgular için; bkz. query_plans.HOT_QUERIES
+        indexes = [
+            models.Index(fields=["durum", "iade_tarihi", "id"], name="odunc_durum_iade_idx"),
+            models.Index(fields=["id"], name="odunc_acik_idx", condition=Q(teslim_tarihi__isnull=True)),
+            models.Index(fields=["ogrenci", "durum"], name="odunc_ogrenci_durum_idx"),
+            models.Index(fields=["kitap_nusha", "-odunc_tarihi", "-id"], name="odunc_nusha_gecmis_idx"),
+            models.Index(
+                fields=["ogrenci"],
+                name="odunc_odenmemis_ceza_idx",
+                condition=Q(gecikme_cezasi_odendi=False, gecikme_cezasi__gt=0),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.ogrenci} - {self.kitap_nusha}"
 
@@ -263,7 +316,8 @@ class InventoryItem(models.Model):
     kitap_nusha = models.ForeignKey(KitapNusha, on_delete=models.CASCADE, related_name="inventory_items")
     barkod = models.CharField(max_length=50)
     kitap_baslik = models.CharField(max_length=200)
-    raf_kodu = models.CharField(max_length=20, blank=True, null=True)
+    # Keyset sıralamasında NULL karşılaştırması olmasın diye boş raf "" tutulur
+    raf_kodu = models.CharField(max_length=20, blank=True, default="")
     durum = models.CharField(max_length=20, blank=True)
     seen = models.BooleanField(default=False)
     seen_at = models.DateTimeField(blank=True, null=True)
@@ -278,7 +332,22 @@ class InventoryItem(models.Model):
 
     class Meta:
         unique_together = ("session", "kitap_nusha")
-        ordering = ("-seen", "raf_kodu", "barkod")
+        ordering = ("-seen", "raf_kodu", "barkod", "id")
+        indexes = [
+            # list_items keyset sayfalaması: (seen, raf_kodu, barkod, id)
+            models.Index(fields=["session", "-seen", "raf_kodu", "barkod", "id"], name="inv_item_keyset_idx"),
+            # Barkod / raf öneki araması (PostgreSQL'de LIKE 'x%' için pattern_ops)
+            models.Index(
+                fields=["session", "barkod"],
+                name="inv_item_barkod_prefix_idx",
+                opclasses=["int8_ops", "varchar_pattern_ops"],
+            ),
+            models.Index(
+                fields=["session", "raf_kodu"],
+                name="inv_item_raf_prefix_idx",
+                opclasses=["int8_ops", "varchar_pattern_ops"],
+            ),
+        ]
         verbose_name = "Sayım Kalemi"
         verbose_name_plural = "Sayım Kalemleri"
 
@@ -286,6 +355,30 @@ class InventoryItem(models.Model):
         return f"{self.barkod} @ {self.session_id}"
 
 
+class InventoryUnknownScan(models.Model):
+    """Sayımda okutulan ama oturumun kalemlerinde bulunmayan barkod."""
+
+    session = models.ForeignKey(InventorySession, on_delete=models.CASCADE, related_name="unknown_scans")
+    barkod = models.CharField(max_length=50)
+    scanned_at = models.DateTimeField(auto_now_add=True)
+    scanned_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        unique_together = ("session", "barkod")
+        ordering = ("barkod", "id")
+        verbose_name = "Tanımsız Okutma"
+        verbose_name_plural = "Tanımsız Okutmalar"
+
+    def __str__(self):
+        return f"{self.barkod} @ {self.session_id}"
+
+
 class AuditLog(models.Model):
     kullanici = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -298,9 +391,15 @@ class AuditLog(models.Model):
     detay = models.TextField(blank=True)
     ip_adresi = models.GenericIPAddressField(blank=True, null=True)
     olusturma_zamani = models.DateTimeField(auto_now_add=True)
+    # İstemcinin ürettiği kimlik: aynı kayıt yeniden gönderilirse tekrar yazılmaz
+    client_id = models.UUIDField(blank=True, null=True, unique=True, editable=False)
+    istemci_zamani = models.DateTimeField(blank=True, null=True)
+    # İstemcinin bildirdiği kullanıcı adı; güvenilmez, yazar her zaman `kullanici`
+    istemci_kullanici = models.CharField(max_length=150, blank=True)
 
     class Meta:
         ordering = ["-olusturma_zamani"]
+        indexes = [models.Index(fields=["-olusturma_zamani"], name="auditlog_zaman_idx")]
         verbose_name = "Log Kaydı"
         verbose_name_plural = "Log Kayıtları"
 
@@ -381,6 +480,8 @@ class NotificationSettings(models.Model):
     email_schedule_hour = models.PositiveSmallIntegerField(default=9)
     email_schedule_minute = models.PositiveSmallIntegerField(default=0)
     email_schedule_timezone = models.CharField(max_length=64, blank=True)
+    # Sunucunun gönderim sınırı için dakikada en fazla e-posta; 0 = sınırsız
+    email_rate_per_minute = models.PositiveIntegerField(default=0)
 
     sms_enabled = models.BooleanField(default=False)
     sms_provider = models.CharField(max_length=120, blank=True)
@@ -422,3 +523,190 @@ class NotificationSettings(models.Model):
     def get_solo(cls):
         settings, _ = cls.objects.get_or_create(singleton_key="default")
         return settings
+
+
+class NotificationOutbox(models.Model):
+    """
+    Gönderim kuyruğundaki tek bildirim. Aynı ödünç, kanal, tür ve iade tarihi
+    için tek satır oluşur; zamanlayıcı her gün yeniden kuyruğa eklese de
+    öğrenciye ikinci kez gitmez.
+    """
+
+    CHANNEL_CHOICES = [
+        ("email", "E-posta"),
+        ("sms", "SMS"),
+        ("mobile", "Mobil"),
+    ]
+    TYPE_CHOICES = [
+        ("due_reminder", "İade hatırlatması"),
+        ("overdue", "Gecikme bildirimi"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Bekliyor"),
+        ("sending", "Gönderiliyor"),
+        ("sent", "Gönderildi"),
+        ("failed", "Başarısız"),
+    ]
+
+    odunc = models.ForeignKey(OduncKaydi, on_delete=models.CASCADE, related_name="bildirimler")
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    message_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    due_date = models.DateField()
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ("id",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["odunc", "channel", "message_type", "due_date"], name="outbox_dedupe",
+            ),
+        ]
+        indexes = [models.Index(fields=["channel", "status", "id"], name="outbox_channel_status_idx")]
+        verbose_name = "Bildirim Kuyruğu"
+        verbose_name_plural = "Bildirim Kuyruğu"
+
+    def __str__(self):
+        return f"{self.get_channel_display()} {self.get_message_type_display()} → {self.recipient} ({self.status})"
+
+
+class LoanStatRollup(models.Model):
+    """
+    Ödünç sayılarının gün bazında önceden toplanmış hali.
+    `key`, boyuta göre öğrenci/sınıf/kitap/kategori id'sidir; "total" boyutunda 0'dır.
+    """
+
+    DIMENSION_TOTAL = "total"
+    DIMENSION_STUDENT = "student"
+    DIMENSION_CLASS = "class"
+    DIMENSION_BOOK = "book"
+    DIMENSION_CATEGORY = "category"
+    DIMENSION_CHOICES = [
+        (DIMENSION_TOTAL, "Toplam"),
+        (DIMENSION_STUDENT, "Öğrenci"),
+        (DIMENSION_CLASS, "Sınıf"),
+        (DIMENSION_BOOK, "Kitap"),
+        (DIMENSION_CATEGORY, "Kategori"),
+    ]
+
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    key = models.PositiveBigIntegerField(default=0)
+    day = models.DateField()
+    loan_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("dimension", "key", "day")
+        indexes = [models.Index(fields=["dimension", "day"], name="loanstat_dimension_day_idx")]
+        verbose_name = "Ödünç İstatistiği (Günlük)"
+        verbose_name_plural = "Ödünç İstatistikleri (Günlük)"
+
+    def __str__(self):
+        return f"{self.dimension}:{self.key} {self.day} = {self.loan_count}"
+
+
+class LoanStatWatermark(models.Model):
+    """Günlük istatistiklere en son işlenen ödünç kaydının id'si."""
+
+    singleton_key = models.CharField(max_length=50, unique=True, default="default")
+    last_loan_id = models.PositiveBigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "İstatistik Durumu"
+        verbose_name_plural = "İstatistik Durumu"
+
+    def __str__(self):
+        return f"Son işlenen ödünç #{self.last_loan_id}"
+
+    @classmethod
+    def get_solo(cls):
+        state, _ = cls.objects.get_or_create(singleton_key="default")
+        return state
+
+
+class ScheduledJobRun(models.Model):
+    """Zamanlanmış bir işin tek çalıştırması: süre, etkilenen satır ve sonuç."""
+
+    STATUS_CHOICES = [
+        ("running", "Çalışıyor"),
+        ("ok", "Başarılı"),
+        ("error", "Hata"),
+    ]
+
+    job = models.CharField(max_length=50)
+    started_at = models.DateTimeField()
+    # Uzun işler çalışırken düzenli olarak güncellenir; süresi dolmuş sayılma buna bakar
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(default=0)
+    rows = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="ok")
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ("-started_at",)
+        indexes = [models.Index(fields=["job", "-started_at"], name="jobrun_job_started_idx")]
+        constraints = [
+            # Aynı iş için aynı anda tek çalışan kayıt (tek uçuş)
+            models.UniqueConstraint(
+                fields=["job"], condition=models.Q(status="running"), name="jobrun_single_running",
+            ),
+        ]
+        verbose_name = "Zamanlanmış İş Kaydı"
+        verbose_name_plural = "Zamanlanmış İş Kayıtları"
+
+    def __str__(self):
+        return f"{self.job} {self.started_at:%Y-%m-%d %H:%M} ({self.status}, {self.duration_ms} ms)"
+
+
+class BackgroundTask(models.Model):
+    """
+    İstek dışında `manage.py run_task_worker` tarafından yürütülen ağır yönetim
+    işi (yedek, geri yükleme, arşiv, içe aktarma, gecikme güncellemesi).
+    """
+
+    KIND_CHOICES = [
+        ("backup", "Yedek alma"),
+        ("restore", "Geri yükleme"),
+        ("archive", "Arşivleme"),
+        ("import", "Öğrenci içe aktarma"),
+        ("overdue", "Gecikme güncellemesi"),
+        ("stats", "İstatistik yenileme"),
+    ]
+    STATUS_CHOICES = [
+        ("queued", "Sırada"),
+        ("running", "Çalışıyor"),
+        ("done", "Tamamlandı"),
+        ("failed", "Başarısız"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    params = models.JSONField(default=dict, blank=True)
+    progress = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    # Kullanıcı adı metin olarak tutulur: geri yükleme kullanıcı tablosunu boşaltırken FK engel olmasın
+    created_by = models.CharField(max_length=150, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-created_at", "-id")
+        indexes = [models.Index(fields=["status", "created_at"], name="task_status_created_idx")]
+        verbose_name = "Arka Plan Görevi"
+        verbose_name_plural = "Arka Plan Görevleri"
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_kind_display()} ({self.get_status_display()})"
@@ -0,0 +1,497 @@
+"""
+İade hatırlatması ve gecikme bildirimleri.
+
+Zamanlayıcı (`jobs.dispatch_notifications`) her kanal için iki adım yürütür:
+
+1. `queue_notifications`: bildirim gerektiren açık ödünçleri küme olarak seçer,
+   `reminder_*`/`overdue_*` şablonlarını (bir kez derlenmiş) her kayıt için
+   doldurur ve `NotificationOutbox` satırlarını partiler halinde ekler. Aynı
+   ödünç, kanal, tür ve iade tarihi için satır zaten varsa yeniden eklenmez.
+2. Kanalın göndericisi (`SENDERS`) bekleyen satırları partiler halinde alır.
+   E-postada her parti tek SMTP bağlantısı üzerinden ve
+   `email_rate_per_minute` sınırına uyularak gönderilir; sonuçlar satır
+   bazında yazılır, geçici hatalar bir sonraki çalıştırmada yeniden denenir.
+   SMS gönderimi `sms.py` içindedir (HTTP ağ geçidi, eşzamanlı istemci).
+
+E-posta Django'nun `EMAIL_BACKEND` ayarıyla gönderilir: üretimde SMTP
+(sunucu bilgileri bildirim ayarlarından), testlerde locmem ya da filebased.
+"""
+
+from __future__ import annotations
+
+import re
+import smtplib
+import time
+from datetime import datetime, time as dt_time, timedelta
+from functools import lru_cache
+
+from django.conf import settings as django_settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import NotificationOutbox, NotificationSettings, OduncKaydi
+
+QUEUE_BATCH_SIZE = 1000
+EMAIL_BATCH_SIZE = 200
+EMAIL_TIMEOUT = 30
+# Tek çalıştırmada e-posta gönderimine ayrılan en uzun süre (sn). Düşük hız
+# sınırında zamanlayıcı kilidi saatlerce tutulmasın; kalanlar sonraki çalıştırmada
+EMAIL_MAX_RUN_SECONDS = 10 * 60
+OUTBOX_MAX_ATTEMPTS = 3
+# Gönderici çökerse "sending" kalan satırlar bu süreden sonra yeniden denenir
+OUTBOX_CLAIM_TIMEOUT = timedelta(minutes=30)
+
+DEFAULT_TEMPLATES = {
+    "due_reminder": (
+        "Kitap iade hatırlatması: {{ kitap_baslik }}",
+        "Sayın {{ ogrenci_ad }} {{ ogrenci_soyad }},\n\n"
+        "Ödünç aldığınız \"{{ kitap_baslik }}\" ({{ kitap_barkod }}) kitabının iade tarihi "
+        "{{ iade_tarihi }}. Lütfen zamanında iade ediniz.\n\n{{ kutuphane_adi }}",
+    ),
+    "overdue": (
+        "Geciken kitap: {{ kitap_baslik }}",
+        "Sayın {{ ogrenci_ad }} {{ ogrenci_soyad }},\n\n"
+        "\"{{ kitap_baslik }}\" ({{ kitap_barkod }}) kitabının iade tarihi {{ iade_tarihi }} idi; "
+        "{{ gecikme_gun }} gün gecikmiştir. Lütfen en kısa sürede iade ediniz.\n\n{{ kutuphane_adi }}",
+    ),
+}
+TEMPLATE_FIELDS = {
+    "due_reminder": ("reminder_subject", "reminder_body"),
+    "overdue": ("overdue_subject", "overdue_body"),
+}
+RECIPIENT_FIELDS = {
+    "email": "ogrenci__eposta",
+    "sms": "ogrenci__telefon",
+}
+LOAN_FIELDS = (
+    "id",
+    "iade_tarihi",
+    "odunc_tarihi",
+    "ogrenci__ad",
+    "ogrenci__soyad",
+    "ogrenci__ogrenci_no",
+    "ogrenci__rol__ad",
+    "kitap_nusha__barkod",
+    "kitap_nusha__kitap__baslik",
+)
+
+
+# --- Şablonlar ---
+
+_TAG = re.compile(r"\{\{\s*(#if\s+.+?|else|/if|\w+)\s*\}\}", re.S)
+_CONDITION = re.compile(r"""^(\w+)\s*(?:(==|!=)\s*(?:"([^"]*)"|'([^']*)'))?$""")
+
+
+def _parse_condition(text):
+    match = _CONDITION.match(text.strip())
+    if not match:
+        return None
+    key, op, double, single = match.groups()
+    return key, op, double if double is not None else single
+
+
+def _test(condition, context):
+    if condition is None:
+        return False
+    key, op, expected = condition
+    value = context.get(key, "")
+    if op == "==":
+        return value == expected
+    if op == "!=":
+        return value != expected
+    return bool(value)
+
+
+class CompiledTemplate:
+    """
+    Masaüstü şablon düzenleyicisinin sözdizimi: `{{ anahtar }}` ve
+    `{{#if anahtar == "değer" }}…{{else}}…{{/if}}`. Metin bir kez ayrıştırılır;
+    her kayıt için yalnızca düğümler gezilir.
+    """
+
+    def __init__(self, text):
+        self.nodes = self._parse(text or "")
+
+    @staticmethod
+    def _parse(text):
+        root = []
+        stack = [(root, None)]
+        pos = 0
+        for match in _TAG.finditer(text):
+            if match.start() > pos:
+                stack[-1][0].append(("text", text[pos:match.start()]))
+            tag = match.group(1).strip()
+            if tag.startswith("#if"):
+                node = ("if", _parse_condition(tag[3:]), [], [])
+                stack[-1][0].append(node)
+                stack.append((node[2], node))
+            elif tag == "else" and stack[-1][1] is not None:
+                node = stack[-1][1]
+                stack[-1] = (node[3], node)
+            elif tag == "/if" and len(stack) > 1:
+                stack.pop()
+            else:
+                stack[-1][0].append(("var", tag))
+            pos = match.end()
+        if pos < len(text):
+            stack[-1][0].append(("text", text[pos:]))
+        return root
+
+    def _render(self, nodes, context, out):
+        for node in nodes:
+            kind = node[0]
+            if kind == "text":
+                out.append(node[1])
+            elif kind == "var":
+                out.append(context.get(node[1], ""))
+            else:
+                self._render(node[2] if _test(node[1], context) else node[3], context, out)
+
+    def render(self, context):
+        out = []
+        self._render(self.nodes, context, out)
+        return "".join(out)
+
+
+@lru_cache(maxsize=16)
+def compile_template(text):
+    return CompiledTemplate(text)
+
+
+def message_templates(settings, message_type):
+    """(konu, gövde) derlenmiş şablonları; ayar boşsa varsayılan metin kullanılır."""
+    subject_field, body_field = TEMPLATE_FIELDS[message_type]
+    default_subject, default_body = DEFAULT_TEMPLATES[message_type]
+    return (
+        compile_template(getattr(settings, subject_field) or default_subject),
+        compile_template(getattr(settings, body_field) or default_body),
+    )
+
+
+# --- Kuyruğa ekleme ---
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def due_loans(settings, message_type, today):
+    """Bugün `message_type` bildirimi gerektiren açık ödünçler (iade tarihi indeksiyle)."""
+    qs = OduncKaydi.objects.filter(teslim_tarihi__isnull=True)
+    if message_type == "due_reminder":
+        last_day = today + timedelta(days=settings.due_reminder_days_before)
+        return qs.filter(
+            durum="oduncte",
+            iade_tarihi__gte=_local_midnight(today),
+            iade_tarihi__lt=_local_midnight(last_day + timedelta(days=1)),
+        )
+    cutoff = today - timedelta(days=settings.due_overdue_days_after)
+    return qs.filter(durum__in=["oduncte", "gecikmis"], iade_tarihi__lt=_local_midnight(cutoff))
+
+
+def _format_date(value):
+    return timezone.localtime(value).strftime("%d.%m.%Y") if value else ""
+
+
+def loan_context(row, today, library_name):
+    due_date = timezone.localtime(row["iade_tarihi"]).date()
+    return {
+        "ogrenci_ad": row["ogrenci__ad"] or "",
+        "ogrenci_soyad": row["ogrenci__soyad"] or "",
+        "ogrenci_no": row["ogrenci__ogrenci_no"] or "",
+        "rol": row["ogrenci__rol__ad"] or "",
+        "kitap_baslik": row["kitap_nusha__kitap__baslik"] or "",
+        "kitap_barkod": row["kitap_nusha__barkod"] or "",
+        "iade_tarihi": _format_date(row["iade_tarihi"]),
+        "odunc_tarihi": _format_date(row["odunc_tarihi"]),
+        "gecikme_gun": str(max(0, (today - due_date).days)),
+        "kutuphane_adi": library_name,
+        "sunucu_tarihi": today.strftime("%d.%m.%Y"),
+    }
+
+
+def _insert_outbox(rows):
+    """
+    Satırları tek `bulk_create` ile ekler ve eklenen sayıyı döndürür. Eşzamanlı
+    bir çalıştırma aynı bildirimi araya girip kuyruğa aldıysa (`outbox_dedupe`)
+    satırlar tek tek eklenir; çakışanlar atlanır ve sayılmaz.
+    """
+    try:
+        with transaction.atomic():
+            NotificationOutbox.objects.bulk_create(rows)
+        return len(rows)
+    except IntegrityError:
+        pass
+    inserted = 0
+    for row in rows:
+        row.pk = None
+        try:
+            with transaction.atomic():
+                NotificationOutbox.objects.bulk_create([row])
+        except IntegrityError:
+            continue
+        inserted += 1
+    return inserted
+
+
+def queue_notifications(channel, types, now=None, settings=None):
+    """
+    Kanal için bildirimleri kuyruğa ekler; tür başına eklenen satır sayısını döndürür.
+    Alıcı bilgisi (e-posta/telefon) olmayan öğrenciler atlanır.
+    """
+    recipient_field = RECIPIENT_FIELDS.get(channel)
+    if recipient_field is None:
+        return {}
+    settings = settings or NotificationSettings.get_solo()
+    today = timezone.localdate(now)
+    library_name = getattr(django_settings, "KUTUPHANE_ADI", "Kütüphane")
+    tz = timezone.get_current_timezone()
+    queued = {}
+
+    for message_type in types:
+        subject_tpl, body_tpl = message_templates(settings, message_type)
+        already = NotificationOutbox.objects.filter(
+            odunc=OuterRef("pk"),
+            channel=channel,
+            message_type=message_type,
+            due_date=OuterRef("due_day"),
+        )
+        rows = (
+            due_loans(settings, message_type, today)
+            .annotate(due_day=TruncDate("iade_tarihi", tzinfo=tz))
+            .exclude(**{f"{recipient_field}__isnull": True})
+            .exclude(**{recipient_field: ""})
+            .exclude(Exists(already))
+            .order_by("id")
+            .values(*LOAN_FIELDS, recipient=F(recipient_field))
+        )
+        count = 0
+        batch = []
+        for row in rows.iterator(chunk_size=QUEUE_BATCH_SIZE):
+            context = loan_context(row, today, library_name)
+            batch.append(NotificationOutbox(
+                odunc_id=row["id"],
+                channel=channel,
+                message_type=message_type,
+                due_date=timezone.localtime(row["iade_tarihi"]).date(),
+                recipient=row["recipient"].strip(),
+                subject=subject_tpl.render(context)[:200],
+                body=body_tpl.render(context),
+            ))
+            if len(batch) >= QUEUE_BATCH_SIZE:
+                count += _insert_outbox(batch)
+                batch = []
+        if batch:
+            count += _insert_outbox(batch)
+        queued[message_type] = count
+    return queued
+
+
+# --- Gönderim ---
+
+
+class SendRateLimiter:
+    """Dakikada en fazla `per_minute` gönderim; 0 sınırsızdır."""
+
+    def __init__(self, per_minute, *, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._next = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = self._clock()
+        if self._next is not None and self._next > now:
+            self._sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+    def ready_at(self):
+        """Sıradaki gönderimin yapılabileceği an (`clock` cinsinden)."""
+        now = self._clock()
+        return self._next if self._next is not None and self._next > now else now
+
+
+def claim_outbox(channel, limit, after_id=0):
+    """
+    Bekleyen en eski `limit` satırı "sending" yapıp döndürür (deneme sayısı
+    artırılır). Eşzamanlı göndericiler kilitli satırları atlar; `after_id`
+    aynı çalıştırmada yeniden kuyruğa dönen satırların tekrar alınmasını önler.
+    """
+    now = timezone.now()
+    NotificationOutbox.objects.filter(
+        channel=channel, status="sending", claimed_at__lt=now - OUTBOX_CLAIM_TIMEOUT
+    ).update(status="pending")
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(channel=channel, status="pending", id__gt=after_id)
+            .order_by("id")[:limit]
+        )
+        if rows:
+            NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                status="sending", claimed_at=now, attempts=F("attempts") + 1
+            )
+    for row in rows:
+        row.attempts += 1
+    return rows
+
+
+def mark_sent(ids):
+    if ids:
+        NotificationOutbox.objects.filter(pk__in=ids).update(status="sent", sent_at=timezone.now(), last_error="")
+
+
+def mark_failed(row, error, *, permanent=False):
+    """Geçici hatada deneme hakkı kaldıysa satır yeniden "pending" olur; dönüş yeni durumdur."""
+    status = "failed" if permanent or row.attempts >= OUTBOX_MAX_ATTEMPTS else "pending"
+    NotificationOutbox.objects.filter(pk=row.pk).update(status=status, last_error=str(error)[:1000])
+    return status
+
+
+def email_connection(settings):
+    """Bildirim ayarlarındaki SMTP bilgileriyle bağlantı; locmem/filebased bunları yok sayar."""
+    options = {"timeout": EMAIL_TIMEOUT, "use_tls": settings.email_use_tls}
+    if settings.email_smtp_host:
+        options.update(host=settings.email_smtp_host, port=settings.email_smtp_port)
+    if settings.email_username:
+        options.update(username=settings.email_username, password=settings.email_password)
+    return get_connection(**options)
+
+
+def _is_permanent_smtp_error(exc):
+    """
+    Yeniden denense de düzelmeyecek hata mı: 5xx yanıtlar (geçersiz adres,
+    reddedilen içerik) kalıcıdır; 4xx yanıtlar (greylisting 451, 452 vb.) geçicidir.
+    """
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code >= 500
+    return False
+
+
+def release_unattempted(rows):
+    """Hiç denenmeyen satırlar deneme hakkı yenmeden kuyruğa döner."""
+    if rows:
+        NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+            status="pending", attempts=F("attempts") - 1
+        )
+
+
+def _send_email_batch(rows, settings, limiter, totals, deadline=None):
+    """
+    Partiyi tek bağlantıdan gönderir; sunucuya ulaşılamazsa ya da `deadline`
+    geçilecekse False döner. Sırası gelmeyen satırlar kuyruğa geri bırakılır.
+    """
+    sender = settings.email_sender or None
+    connection = email_connection(settings)
+    try:
+        connection.open()
+    except Exception as exc:
+        for row in rows:
+            totals[mark_failed(row, f"Bağlantı kurulamadı: {exc}")] += 1
+        return False
+
+    sent = []
+    done = 0
+    try:
+        for row in rows:
+            if deadline is not None and limiter.ready_at() >= deadline:
+                totals["deferred"] += len(rows) - done
+                release_unattempted(rows[done:])
+                return False
+            limiter.wait()
+            message = EmailMessage(row.subject, row.body, sender, [row.recipient], connection=connection)
+            done += 1
+            try:
+                message.send()
+            except ValueError as exc:
+                # Bozuk başlık ya da adres
+                totals[mark_failed(row, exc, permanent=True)] += 1
+            except (smtplib.SMTPException, OSError) as exc:
+                permanent = _is_permanent_smtp_error(exc)
+                totals[mark_failed(row, exc, permanent=permanent)] += 1
+                if not permanent:
+                    # Bağlantı düşmüş olabilir; kalan iletiler için yeniden aç
+                    connection.close()
+                    connection.open()
+            else:
+                sent.append(row.pk)
+    except Exception:
+        release_unattempted(rows[done:])
+        return False
+    finally:
+        connection.close()
+        mark_sent(sent)
+        totals["sent"] += len(sent)
+    return True
+
+
+def send_email_outbox(
+    *,
+    batch_size=EMAIL_BATCH_SIZE,
+    limit=None,
+    settings=None,
+    max_seconds=EMAIL_MAX_RUN_SECONDS,
+    clock=time.monotonic,
+    sleep=time.sleep,
+):
+    """
+    Bekleyen e-postaları gönderir. Her parti tek bağlantı kullanır;
+    {"sent", "pending", "failed", "deferred"} sayılarını döndürür ("pending":
+    yeniden denenecek, "deferred": süre dolunca alındığı halde kuyruğa geri bırakılan).
+    Gönderim en fazla `max_seconds` sürer (None: sınırsız); kalan satırlar kuyrukta bekler.
+    """
+    settings = settings or NotificationSettings.get_solo()
+    limiter = SendRateLimiter(settings.email_rate_per_minute, clock=clock, sleep=sleep)
+    deadline = clock() + max_seconds if max_seconds is not None else None
+    totals = {"sent": 0, "pending": 0, "failed": 0, "deferred": 0}
+    processed = 0
+    last_id = 0
+    while limit is None or processed < limit:
+        if deadline is not None and limiter.ready_at() >= deadline:
+            break
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        rows = claim_outbox("email", size, after_id=last_id)
+        if not rows:
+            break
+        processed += len(rows)
+        last_id = rows[-1].pk
+        if not _send_email_batch(rows, settings, limiter, totals, deadline):
+            break
+    return totals
+
+
+def send_sms_outbox(**kwargs):
+    from .sms import send_sms_outbox as send
+
+    return send(**kwargs)
+
+
+SENDERS = {
+    "email": send_email_outbox,
+    "sms": send_sms_outbox,
+}
+
+
+def dispatch_notifications(channel, types, now=None):
+    """Kanal için bildirimleri kuyruğa ekler ve göndericisi varsa bekleyenleri gönderir."""
+    settings = NotificationSettings.get_solo()
+    queued = queue_notifications(channel, types, now=now, settings=settings)
+    sender = SENDERS.get(channel)
+    delivery = sender(settings=settings) if sender else {}
+    return {
+        "channel": channel,
+        "types": types,
+        "timestamp": (now or timezone.now()).isoformat(),
+        "queued": sum(queued.values()),
+        "queued_by_type": queued,
+        **delivery,
+    }
@@ -0,0 +1,176 @@
+"""
+Sıcak sorguların `EXPLAIN` planlarını toplayan regresyon kontrolü.
+
+views.py, jobs.py ve ilgili modüllerdeki en sık çalışan sorgular burada
+kayıtlıdır; her üretici sorguyu uygulamanın kendi fonksiyonunu (ya da
+görünümün `get_queryset()`'ini) çağırarak kurar, böylece kod ile kontrol
+birbirinden kopmaz. `check_query_plans()` her birinin planını alır ve izlenen tablolar
+üzerinde sıralı tarama (PostgreSQL: `Seq Scan`, SQLite: `SCAN <tablo>`) olup
+olmadığını raporlar. PostgreSQL'de küçük tablolarda planlayıcının tercihine
+takılmamak için kontrol `enable_seqscan = off` ile yapılır; bu ayara rağmen
+sıralı tarama görülüyorsa sorguya uygun bir indeks yoktur. SQLite'ta ANALYZE
+istatistikleri bilinçli olarak toplanmaz: varsayılan tahmin indeksleri seçici
+kabul eder ve aynı soruyu ("kullanılabilir indeks var mı?") yanıtlar.
+
+Üretim benzeri veride elle çalıştırmak için:
+    python manage.py shell -c "from kutuphane_app.query_plans import report; print(report())"
+"""
+
+from __future__ import annotations
+
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import AuditLog, InventoryItem, OduncKaydi
+
+ACTIVE_STATES = ["oduncte", "gecikmis"]
+
+HOT_QUERIES = {}
+
+_PG_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+_SQLITE_SEQ_SCAN = re.compile(r"\bSCAN (\w+)\b(?!\s+USING)")
+
+
+def hot_query(name, *tables):
+    """Sorgu üreticisini kaydeder; `tables` sıralı taranmaması gereken tablolardır."""
+    def decorator(builder):
+        HOT_QUERIES[name] = (builder, tables)
+        return builder
+    return decorator
+
+
+def _sample_ids():
+    sample = OduncKaydi.objects.order_by("id").values("ogrenci_id", "kitap_nusha_id").first() or {}
+    return {
+        "ogrenci_id": sample.get("ogrenci_id") or 0,
+        "kitap_nusha_id": sample.get("kitap_nusha_id") or 0,
+    }
+
+
+LOAN_TABLE = OduncKaydi._meta.db_table
+AUDIT_TABLE = AuditLog._meta.db_table
+INVENTORY_ITEM_TABLE = InventoryItem._meta.db_table
+
+
+def _get_request(path="/", params=None, user=None):
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    request = RequestFactory().get(path, params or {})
+    request.user = user or AnonymousUser()
+    return request
+
+
+@hot_query("overdue_open_loans", LOAN_TABLE)
+def _overdue_open_loans(ids):
+    from .jobs import open_loans_chunk
+
+    return open_loans_chunk(0)
+
+
+@hot_query("loan_rows_page", LOAN_TABLE)
+def _loan_rows_page(ids):
+    # OduncKaydiViewSet.rows: masaüstünün istediği durumlar + cursor sıralaması
+    from rest_framework.request import Request
+
+    from .views import LoanRowCursorPagination, OduncKaydiViewSet
+
+    view = OduncKaydiViewSet(action="rows", format_kwarg=None)
+    view.request = Request(_get_request(params={"durum": ",".join(ACTIVE_STATES)}))
+    paginator = LoanRowCursorPagination()
+    return view.get_queryset().order_by(*paginator.ordering)[: paginator.page_size + 1]
+
+
+@hot_query("checkout_student_active", LOAN_TABLE)
+def _checkout_student_active(ids):
+    from .views import student_active_loans
+
+    return student_active_loans(ids["ogrenci_id"]).values("id")
+
+
+@hot_query("checkout_copy_active", LOAN_TABLE)
+def _checkout_copy_active(ids):
+    from .views import copy_active_loans
+
+    return copy_active_loans(ids["kitap_nusha_id"]).values("id")[:1]
+
+
+@hot_query("book_history_page", LOAN_TABLE)
+def _book_history_page(ids):
+    from .views import BookHistoryView
+
+    return BookHistoryView.history_queryset(ids["kitap_nusha_id"])[: BookHistoryView.HISTORY_DEFAULT_LIMIT + 1]
+
+
+@hot_query("student_unpaid_penalties", LOAN_TABLE)
+def _student_unpaid_penalties(ids):
+    # Masa ekranı: tek öğrencinin ceza toplamları
+    from .loan_policy import penalty_totals_queryset
+
+    return penalty_totals_queryset([ids["ogrenci_id"]])
+
+
+@hot_query("all_unpaid_penalties", LOAN_TABLE)
+def _all_unpaid_penalties(ids):
+    # jobs.update_overdue_loans başında: cezası olan tüm öğrenciler
+    from .loan_policy import penalty_totals_queryset
+
+    return penalty_totals_queryset(None)
+
+
+@hot_query("audit_log_recent", AUDIT_TABLE)
+def _audit_log_recent(ids):
+    # Yönetim paneli denetim kaydı listesi (ilk sayfa)
+    from .admin import AuditLogAdmin, admin_site
+
+    request = _get_request()
+    model_admin = AuditLogAdmin(AuditLog, admin_site)
+    ordering = model_admin.get_ordering(request) or AuditLog._meta.ordering
+    return model_admin.get_queryset(request).order_by(*ordering)[: model_admin.list_per_page]
+
+
+@hot_query("inventory_items_page", INVENTORY_ITEM_TABLE)
+def _inventory_items_page(ids):
+    # InventorySessionViewSet.list_items: görülmeyenler, ikinci sayfa (keyset imleci)
+    from .inventory import encode_items_cursor, filter_items, items_page_queryset
+    from .models import InventorySession
+
+    session = InventorySession(pk=0)
+    cursor = encode_items_cursor(InventoryItem(seen=False, raf_kodu="A", barkod="KIT", id=0))
+    return items_page_queryset(filter_items(session, "unseen"), 250, cursor)
+
+
+def seq_scanned_tables(plan, vendor):
+    pattern = _PG_SEQ_SCAN if vendor == "postgresql" else _SQLITE_SEQ_SCAN
+    return set(pattern.findall(plan))
+
+
+def check_query_plans(using=DEFAULT_DB_ALIAS, names=None):
+    """
+    Her sıcak sorgu için {"plan": metin, "seq_scans": [tablo, ...]} döndürür.
+    `seq_scans` yalnızca sorgunun izlenen tablolarını içerir; boş olmalıdır.
+    """
+    connection = connections[using]
+    vendor = connection.vendor
+    ids = _sample_ids()
+    results = {}
+    with transaction.atomic(using=using):
+        if vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        for name, (builder, tables) in HOT_QUERIES.items():
+            if names and name not in names:
+                continue
+            plan = builder(ids).using(using).explain()
+            scanned = seq_scanned_tables(plan, vendor) & set(tables)
+            results[name] = {"plan": plan, "seq_scans": sorted(scanned)}
+    return results
+
+
+def report(using=DEFAULT_DB_ALIAS):
+    lines = []
+    for name, result in check_query_plans(using).items():
+        status = "SEQ SCAN: " + ", ".join(result["seq_scans"]) if result["seq_scans"] else "ok"
+        lines.append(f"[{status}] {name}\n{result['plan']}\n")
+    return "\n".join(lines)
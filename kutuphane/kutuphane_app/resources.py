@@ -1,9 +1,20 @@
 # kutuphane_app/resources.py
+import csv
+import io
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+
 from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget
+from django.db import connection, transaction
 from django.utils.timezone import now
 from .models import Ogrenci, Sinif
 
+BULK_IMPORT_BATCH_SIZE = 1000
+STAGING_TABLE = "ogrenci_import_staging"
+
 class OgrenciResource(resources.ModelResource):
     sinif = fields.Field(
         column_name="sinif",
@@ -40,5 +51,183 @@ class OgrenciResource(resources.ModelResource):
     def after_import(self, dataset, result, using_transactions, dry_run, **kwargs):
         # Listede olmayanları pasifle
         if getattr(self, 'gelen_ogr_no', None) and not dry_run:
-            adaylar = Ogrenci.objects.exclude(ogrenci_no__in=self.gelen_ogr_no).filter(aktif=True)
-            adaylar.update(aktif=False, pasif_tarihi=now())
+            with transaction.atomic():
+                _create_staging_table()
+                try:
+                    _stage_numbers(self.gelen_ogr_no)
+                    _deactivate_unstaged()
+                finally:
+                    _drop_staging_table()
+
+
+# --- Toplu (yüksek hacimli) içe aktarma ---
+
+
+def _create_staging_table():
+    """Gelen öğrenci numaraları için bağlantıya özel geçici tablo."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {STAGING_TABLE} (ogrenci_no varchar(20) PRIMARY KEY)")
+
+
+def _drop_staging_table():
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+
+
+def _stage_numbers(numbers):
+    numbers = list(numbers)
+    with connection.cursor() as cursor:
+        for start in range(0, len(numbers), BULK_IMPORT_BATCH_SIZE):
+            cursor.executemany(
+                f"INSERT INTO {STAGING_TABLE} (ogrenci_no) VALUES (%s)",
+                [(no,) for no in numbers[start:start + BULK_IMPORT_BATCH_SIZE]],
+            )
+
+
+def _deactivate_unstaged():
+    """Geçici tabloda olmayan aktif öğrencileri pasifler; etkilenen satır sayısını döndürür."""
+    table = connection.ops.quote_name(Ogrenci._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET aktif = %s, pasif_tarihi = %s "
+            f"WHERE aktif = %s AND NOT EXISTS ("
+            f"SELECT 1 FROM {STAGING_TABLE} s WHERE s.ogrenci_no = {table}.ogrenci_no)",
+            [False, now(), True],
+        )
+        return cursor.rowcount
+
+
+@dataclass
+class BulkImportResult:
+    created: int = 0
+    updated: int = 0
+    deactivated: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+    dry_run: bool = False
+
+    @property
+    def total(self) -> int:
+        return self.created + self.updated
+
+
+@contextmanager
+def _timed(timings, phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+def _iter_csv_rows(fileobj, encoding):
+    if isinstance(fileobj, (bytes, bytearray)):
+        fileobj = io.BytesIO(fileobj)
+    if not isinstance(fileobj, io.TextIOBase):
+        fileobj = io.TextIOWrapper(fileobj, encoding=encoding, newline="")
+    sample = fileobj.read(4096)
+    fileobj.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(fileobj, dialect=dialect)
+    for line_no, row in enumerate(reader, start=2):
+        yield line_no, {
+            (key or "").strip(): (value or "").strip()
+            for key, value in row.items()
+        }
+
+
+def bulk_import_ogrenciler(fileobj, *, deactivate_missing=True, dry_run=False, batch_size=BULK_IMPORT_BATCH_SIZE, encoding="utf-8-sig"):
+    """
+    OgrenciResource ile aynı sütunları (ogrenci_no, ad, soyad, sinif) kullanan
+    hızlı içe aktarma. CSV akış olarak okunur, sınıf adları tek sorguyla
+    çözülür, kayıtlar `bulk_create(update_conflicts=True)` ile partiler halinde
+    eklenir/güncellenir. Dosyada olmayan aktif öğrenciler geçici bir tablo
+    üzerinden pasiflenir (dev `NOT IN` listesi yerine). Hatalı satırların
+    numaraları da dosyada sayılır; o öğrenciler güncellenmez ama pasiflenmez.
+
+    `dry_run=True` her şeyi çalıştırıp transaction'ı geri alır.
+    """
+    result = BulkImportResult(dry_run=dry_run)
+    phase = partial(_timed, result.timings)
+    started = time.perf_counter()
+
+    with phase("resolve"):
+        siniflar = dict(Sinif.objects.values_list("ad", "id"))
+
+    seen = set()
+
+    def flush(pending, rejected):
+        if pending:
+            with phase("upsert"):
+                existing = set(
+                    Ogrenci.objects.filter(ogrenci_no__in=list(pending)).values_list("ogrenci_no", flat=True)
+                )
+                Ogrenci.objects.bulk_create(
+                    pending.values(),
+                    batch_size=batch_size,
+                    update_conflicts=True,
+                    unique_fields=["ogrenci_no"],
+                    update_fields=["ad", "soyad", "sinif"],
+                )
+            result.updated += len(existing)
+            result.created += len(pending) - len(existing)
+        if deactivate_missing:
+            new_numbers = {no for no in (*pending, *rejected) if no not in seen}
+            if new_numbers:
+                with phase("stage"):
+                    _stage_numbers(new_numbers)
+                seen.update(new_numbers)
+
+    with transaction.atomic():
+        if deactivate_missing:
+            with phase("stage"):
+                _create_staging_table()
+        try:
+            pending = {}
+            rejected = []
+            rows = _iter_csv_rows(fileobj, encoding)
+            while True:
+                with phase("parse"):
+                    item = next(rows, None)
+                if item is None:
+                    break
+                line_no, row = item
+                ogrenci_no = row.get("ogrenci_no", "")
+                if not ogrenci_no:
+                    result.skipped += 1
+                    continue
+                sinif_ad = row.get("sinif", "")
+                sinif_id = siniflar.get(sinif_ad) if sinif_ad else None
+                if sinif_ad and sinif_id is None:
+                    result.errors.append(f"Satır {line_no}: '{sinif_ad}' sınıfı bulunamadı.")
+                    # Dosyada var: kayıt güncellenmese de pasiflenmemeli
+                    rejected.append(ogrenci_no)
+                    continue
+                # Aynı parti içinde tekrar eden numarada son satır geçerlidir
+                pending[ogrenci_no] = Ogrenci(
+                    ogrenci_no=ogrenci_no,
+                    ad=row.get("ad", ""),
+                    soyad=row.get("soyad", ""),
+                    sinif_id=sinif_id,
+                )
+                if len(pending) + len(rejected) >= batch_size:
+                    flush(pending, rejected)
+                    pending, rejected = {}, []
+            flush(pending, rejected)
+
+            if deactivate_missing and seen:
+                with phase("deactivate"):
+                    result.deactivated = _deactivate_unstaged()
+        finally:
+            if deactivate_missing:
+                _drop_staging_table()
+        if dry_run:
+            transaction.set_rollback(True)
+
+    result.timings["total"] = time.perf_counter() - started
+    return result
@@ -0,0 +1,162 @@
+"""
+Katalog araması.
+
+Başlık, yazar ve ISBN `Kitap.arama_metni` alanında Türkçe kurallarına göre
+küçültülmüş ve aksanlardan arındırılmış tek bir metin olarak tutulur
+("IŞIK", "ışık" ve "isik" aynı biçime iner). PostgreSQL'de bu alan üzerinde
+`pg_trgm` GIN indeksi vardır: alt dize (`LIKE %…%`) ve kelime benzerliği
+(`%>`) aramaları indeksten yanıtlanır, sonuçlar trigram benzerliğine göre
+sıralanır. Diğer veritabanlarında (SQLite testleri) alt dize araması ve
+sınırlı bir aday kümesi üzerinde `difflib` ile yazım hatası toleransı kullanılır.
+"""
+
+from __future__ import annotations
+
+import difflib
+import re
+
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Kitap
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+FUZZY_CANDIDATE_LIMIT = 500
+FUZZY_MIN_RATIO = 0.75
+
+_TURKISH_FOLD = str.maketrans({
+    "I": "ı", "İ": "i",
+})
+_ASCII_FOLD = str.maketrans({
+    "ı": "i", "ş": "s", "ğ": "g", "ü": "u", "ö": "o", "ç": "c",
+    "â": "a", "î": "i", "û": "u",
+})
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_search_text(*parts) -> str:
+    """Türkçe büyük/küçük harf kuralına göre küçültür, aksanları atar, boşlukları sadeleştirir."""
+    text = " ".join(str(part) for part in parts if part)
+    text = text.translate(_TURKISH_FOLD).lower().translate(_ASCII_FOLD)
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def book_search_text(kitap) -> str:
+    yazar = kitap.yazar.ad_soyad if kitap.yazar_id and kitap.yazar else ""
+    isbn = re.sub(r"[^0-9Xx]", "", kitap.isbn or "")
+    return normalize_search_text(kitap.baslik, yazar, isbn)
+
+
+def refresh_search_text(queryset=None, batch_size=2000, using=None):
+    """
+    `arama_metni` alanını toplu yeniden hesaplar (`save()` çağrılmadan yüklenen
+    kayıtlar için, ör. yedekten geri yükleme). Dönüş: güncellenen kitap sayısı.
+    """
+    queryset = Kitap.objects.all() if queryset is None else queryset
+    if using:
+        queryset = queryset.using(using)
+    queryset = queryset.select_related("yazar").only("id", "baslik", "isbn", "yazar__ad_soyad")
+    batch = []
+    count = 0
+    for kitap in queryset.order_by("pk").iterator(chunk_size=batch_size):
+        kitap.arama_metni = book_search_text(kitap)
+        batch.append(kitap)
+        if len(batch) >= batch_size:
+            count += Kitap.objects.db_manager(using).bulk_update(batch, ["arama_metni"])
+            batch = []
+    if batch:
+        count += Kitap.objects.db_manager(using).bulk_update(batch, ["arama_metni"])
+    return count
+
+
+def _tokens(query):
+    return [token for token in normalize_search_text(query).split() if token]
+
+
+def filter_books(qs, query):
+    """Her kelimenin arama metninde geçtiği kitaplar (alt dize; PG'de trigram indeksli)."""
+    for token in _tokens(query):
+        qs = qs.filter(arama_metni__contains=token)
+    return qs
+
+
+def _postgres_search(qs, tokens, normalized):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    condition = Q()
+    for token in tokens:
+        condition &= Q(arama_metni__contains=token) | Q(arama_metni__trigram_word_similar=token)
+    similarities = [TrigramWordSimilarity(token, "arama_metni") for token in tokens]
+    similarity = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+    return (
+        qs.filter(condition)
+        .annotate(
+            skor=similarity + Case(
+                When(arama_metni__startswith=normalized, then=Value(1.0)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+        .order_by("-skor", "baslik", "id")
+    )
+
+
+def _word_ratio(token, words):
+    best = 0.0
+    for word in words:
+        if word.startswith(token):
+            return 1.0
+        best = max(best, difflib.SequenceMatcher(None, token, word[: len(token) + 2]).ratio())
+    return best
+
+
+def _fallback_search(qs, tokens, normalized, offset, limit):
+    base = qs.select_related(None).order_by()
+    candidates = list(filter_books(base, normalized).values_list("id", "arama_metni", "baslik"))
+    if not candidates:
+        # Yazım hatası: kelime başlarıyla aday topla, benzerliğe göre süz
+        prefix_q = Q()
+        for token in tokens:
+            prefix_q |= Q(arama_metni__contains=token[:3])
+        candidates = list(
+            base.filter(prefix_q).values_list("id", "arama_metni", "baslik")[:FUZZY_CANDIDATE_LIMIT]
+        )
+
+    scored = []
+    for pk, text, baslik in candidates:
+        words = text.split()
+        ratios = [_word_ratio(token, words) for token in tokens]
+        if min(ratios) < FUZZY_MIN_RATIO:
+            continue
+        score = sum(ratios) / len(ratios) + (1.0 if text.startswith(normalized) else 0.0)
+        scored.append((score, baslik, pk))
+    scored.sort(key=lambda item: (-item[0], item[1], item[2]))
+    page = scored[offset: offset + limit + 1]
+    books = qs.in_bulk([pk for _, _, pk in page])
+    results = []
+    for score, _, pk in page:
+        kitap = books[pk]
+        kitap.skor = score
+        results.append(kitap)
+    return results
+
+
+def search_books(query, *, offset=0, limit=SEARCH_DEFAULT_LIMIT, queryset=None):
+    """
+    Sıralı arama. (sonuçlar, devamı_var) döndürür; her kitapta `skor` bulunur.
+    Önek eşleşmeleri ve yazım hatalı kelimeler de bulunur.
+    """
+    qs = queryset if queryset is not None else Kitap.objects.all()
+    tokens = _tokens(query)
+    if not tokens:
+        return [], False
+    normalized = " ".join(tokens)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+
+    if connection.vendor == "postgresql":
+        rows = list(_postgres_search(qs, tokens, normalized)[offset: offset + limit + 1])
+    else:
+        rows = _fallback_search(qs, tokens, normalized, offset, limit)
+    return rows[:limit], len(rows) > limit
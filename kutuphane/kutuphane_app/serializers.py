@@ -1,9 +1,11 @@
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import (
     TokenObtainPairSerializer as BaseTokenObtainPairSerializer,
     TokenRefreshSerializer as BaseTokenRefreshSerializer,
 )
 
+from .loan_policy import compute_effective_due
 from .models import (
     Ogrenci,
     Sinif,
@@ -20,6 +22,7 @@ from .models import (
     AuditLog,
     InventorySession,
     InventoryItem,
+    BackgroundTask,
 )
 
 
@@ -117,23 +120,10 @@ class KitapNushaSerializer(serializers.ModelSerializer):
         fields = ["id", "kitap", "kitap_id", "barkod", "durum", "raf_kodu"]
 
     def create(self, validated_data):
-        barkod = validated_data.get("barkod")
-        if not barkod:
-            from .models import KitapNusha
-            import re
-
-            prefix = "KIT"
-            max_n = 0
-            for code in KitapNusha.objects.filter(barkod__startswith=prefix).values_list("barkod", flat=True):
-                m = re.match(r"^%s(\d+)$" % prefix, code or "")
-                if m:
-                    try:
-                        n = int(m.group(1))
-                        if n > max_n:
-                            max_n = n
-                    except Exception:
-                        continue
-            validated_data["barkod"] = f"{prefix}{max_n+1:06d}"
+        if not validated_data.get("barkod"):
+            from .barcodes import allocate_barcodes
+
+            validated_data["barkod"] = allocate_barcodes()[0]
         return super().create(validated_data)
 
 
@@ -146,6 +136,83 @@ class OduncKaydiSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class LoanRowSerializer(serializers.ModelSerializer):
+    """
+    Masaüstü ödünç tablosu için düz (iç içe olmayan) satır gösterimi.
+    Etkin iade tarihi ve uyarı bayrakları sunucudaki politika ile hesaplanır;
+    `snapshot` context üzerinden verilmelidir.
+    """
+
+    ogrenci_ad = serializers.CharField(source="ogrenci.ad", read_only=True)
+    ogrenci_soyad = serializers.CharField(source="ogrenci.soyad", read_only=True)
+    ogrenci_no = serializers.CharField(source="ogrenci.ogrenci_no", read_only=True)
+    sinif = serializers.CharField(source="ogrenci.sinif.ad", read_only=True, default=None)
+    kitap_id = serializers.IntegerField(source="kitap_nusha.kitap_id", read_only=True)
+    kitap_baslik = serializers.CharField(source="kitap_nusha.kitap.baslik", read_only=True)
+    yazar = serializers.CharField(source="kitap_nusha.kitap.yazar.ad_soyad", read_only=True, default=None)
+    kategori = serializers.CharField(source="kitap_nusha.kitap.kategori.ad", read_only=True, default=None)
+    isbn = serializers.CharField(source="kitap_nusha.kitap.isbn", read_only=True, default=None)
+    barkod = serializers.CharField(source="kitap_nusha.barkod", read_only=True)
+    raf_kodu = serializers.CharField(source="kitap_nusha.raf_kodu", read_only=True, default=None)
+
+    class Meta:
+        model = OduncKaydi
+        fields = [
+            "id",
+            "ogrenci_id",
+            "ogrenci_ad",
+            "ogrenci_soyad",
+            "ogrenci_no",
+            "sinif",
+            "kitap_nusha_id",
+            "kitap_id",
+            "kitap_baslik",
+            "yazar",
+            "kategori",
+            "isbn",
+            "barkod",
+            "raf_kodu",
+            "odunc_tarihi",
+            "iade_tarihi",
+            "teslim_tarihi",
+            "durum",
+            "gecikme_cezasi",
+            "gecikme_cezasi_odendi",
+        ]
+        read_only_fields = fields
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        snapshot = self.context["snapshot"]
+        today = self.context.get("today") or timezone.localdate()
+        role = getattr(instance.ogrenci, "rol", None)
+        durum = (instance.durum or "").lower()
+
+        due = instance.iade_tarihi
+        effective_due = compute_effective_due(due, snapshot, role)
+        due_date = timezone.localtime(due).date() if due else None
+        effective_date = timezone.localtime(effective_due).date() if effective_due else due_date
+
+        grace_alert = bool(
+            due_date and durum != "gecikmis" and due_date < today <= effective_date
+        )
+        is_overdue = durum == "gecikmis" or bool(effective_date and effective_date < today)
+        due_soon = bool(
+            not is_overdue
+            and not grace_alert
+            and effective_date
+            and 0 <= (effective_date - today).days <= 3
+        )
+
+        data.update({
+            "effective_iade_tarihi": effective_due.isoformat() if effective_due else None,
+            "is_overdue": is_overdue,
+            "grace_alert": grace_alert,
+            "due_soon": due_soon,
+        })
+        return data
+
+
 class PersonelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Personel
@@ -285,8 +352,13 @@ class AuditLogSerializer(serializers.ModelSerializer):
             "detay",
             "ip_adresi",
             "olusturma_zamani",
+            "client_id",
+            "istemci_zamani",
+            "istemci_kullanici",
+        )
+        read_only_fields = (
+            "id", "kullanici_adi", "ad_soyad", "olusturma_zamani", "client_id", "istemci_kullanici",
         )
-        read_only_fields = ("id", "kullanici_adi", "ad_soyad", "olusturma_zamani")
         extra_kwargs = {
             "kullanici": {"required": False, "allow_null": True},
             "detay": {"required": False, "allow_blank": True},
@@ -302,6 +374,47 @@ class AuditLogSerializer(serializers.ModelSerializer):
         return str(value).strip() if value is not None else ""
 
 
+class AuditLogEntrySerializer(serializers.Serializer):
+    """Toplu log gönderimindeki tek kayıt; `client_id` istemcide üretilir."""
+
+    client_id = serializers.UUIDField()
+    islem = serializers.CharField(max_length=100)
+    detay = serializers.CharField(required=False, allow_blank=True, default="", trim_whitespace=True)
+    ip_adresi = serializers.IPAddressField(required=False, allow_null=True, default=None)
+    zaman = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    # İstemcinin bildirdiği, kaydı oluşturan oturumun kullanıcı adı (doğrulanmaz)
+    kullanici = serializers.CharField(max_length=150, required=False, allow_null=True, default=None)
+
+    def validate_islem(self, value):
+        if not value.strip():
+            raise serializers.ValidationError("İşlem açıklaması zorunludur.")
+        return value.strip()
+
+
+class BackgroundTaskSerializer(serializers.ModelSerializer):
+    kind_display = serializers.CharField(source="get_kind_display", read_only=True)
+    status_display = serializers.CharField(source="get_status_display", read_only=True)
+
+    class Meta:
+        model = BackgroundTask
+        fields = [
+            "id",
+            "kind",
+            "kind_display",
+            "status",
+            "status_display",
+            "progress",
+            "result",
+            "error",
+            "created_by",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
 class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
@@ -0,0 +1,287 @@
+"""
+SMS bildirimlerinin HTTP ağ geçidine gönderimi.
+
+Bekleyen `NotificationOutbox` satırları (kanal "sms") partiler halinde alınır
+ve `sms_api_url` adresine JSON olarak POST edilir:
+
+    POST <sms_api_url>
+    Authorization: Bearer <sms_api_key>
+    {"to": "<telefon>", "message": "<metin>", "reference": "<outbox id>"}
+
+Gönderimi `concurrency` adet thread yürütür: her biri kendi keep-alive
+`http.client` bağlantısını kullanarak sıradaki iletiyi alır; böylece aynı anda
+en fazla `concurrency` istek açıktır ve bağlantı her iletide yeniden kurulmaz.
+Bağlantı hatası, 5xx, 408 ve 429 yanıtları üstel beklemeyle yeniden denenir;
+diğer 4xx yanıtları (geçersiz numara vb.) kalıcı hatadır. İstek gönderildikten
+sonra yanıt gelmezse (ör. okuma zaman aşımı) ileti teslim edilmiş olabileceği
+için yeniden denenmez; satır kalıcı hata olarak işaretlenir. Veritabanı işlemleri
+çağıran thread'de kalır; worker'lar yalnızca ağ trafiğini yürütür.
+
+Ortamdaki `HTTP_PROXY` / `HTTPS_PROXY` (ve `NO_PROXY`) ayarları kullanılır.
+Ek bağımlılık gerektirmez (yalnızca standart kütüphane). Ağsız deneme ve
+hız ölçümü için `sms_mock.MockSmsGateway` / `manage.py sms_mock_gateway`.
+"""
+
+from __future__ import annotations
+
+import base64
+import http.client
+import json
+import queue
+import random
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import unquote, urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+from django.conf import settings as django_settings
+
+from .models import NotificationSettings
+from .notifications import claim_outbox, mark_failed, mark_sent
+
+SMS_BATCH_SIZE = 500
+SMS_CONCURRENCY = 8
+SMS_TIMEOUT = 15.0
+SMS_RETRIES = 3
+SMS_BACKOFF = 0.5
+SMS_MAX_BACKOFF = 30.0
+RETRY_STATUSES = {408, 429}
+# Yanıt beklenirken bu hatalar yalnızca yeniden kullanılan bağlantıda "sunucu
+# boştaki bağlantıyı kapatmış" anlamına gelir; istek hiç işlenmemiştir
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class SmsGatewayError(Exception):
+    """Ağ geçidi isteği başarısız; `permanent` yeniden denemenin anlamsız olduğunu belirtir."""
+
+    def __init__(self, message, *, status=None, permanent=False, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.permanent = permanent
+        self.retry_after = retry_after
+
+
+@dataclass
+class SmsResult:
+    reference: object
+    ok: bool
+    error: str = ""
+    permanent: bool = False
+    attempts: int = 0
+
+
+def _proxy_for(scheme, host):
+    """Ortam değişkenlerindeki vekil sunucu: (host, port, Proxy-Authorization) ya da None."""
+    if proxy_bypass(host):
+        return None
+    url = getproxies().get(scheme)
+    if not url:
+        return None
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    if not parts.hostname:
+        return None
+    auth = None
+    if parts.username:
+        credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+        auth = "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+    return parts.hostname, parts.port or 8080, auth
+
+
+class SmsGatewayClient:
+    """
+    Ağ geçidine sınırlı eşzamanlılıkla gönderim yapan istemci.
+    `send_all` (kimlik, telefon, metin) üçlülerini alır ve `SmsResult` listesi döndürür.
+    """
+
+    def __init__(
+        self,
+        url,
+        api_key="",
+        *,
+        concurrency=SMS_CONCURRENCY,
+        timeout=SMS_TIMEOUT,
+        retries=SMS_RETRIES,
+        backoff=SMS_BACKOFF,
+        sleep=time.sleep,
+        proxy=None,
+    ):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Geçersiz SMS ağ geçidi adresi: {url!r}")
+        if any(char in api_key for char in "\r\n\0"):
+            raise ValueError("SMS API anahtarı satır sonu içeremez.")
+        self.host = parts.hostname
+        self.use_ssl = parts.scheme == "https"
+        self.port = parts.port or (443 if self.use_ssl else 80)
+        self.target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.api_key = api_key
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self._sleep = sleep
+        # `proxy`: (host, port, Proxy-Authorization); verilmezse ortamdan okunur, False: vekil yok
+        self.proxy = _proxy_for(parts.scheme, self.host) if proxy is None else (proxy or None)
+        self._ssl = ssl.create_default_context() if self.use_ssl else None
+        self._headers = {"Content-Type": "application/json; charset=utf-8"}
+        if api_key:
+            self._headers["Authorization"] = f"Bearer {api_key}"
+        if self.proxy and not self.use_ssl:
+            # Düz HTTP vekili mutlak adres bekler; kimlik bilgisi istekle gider
+            self.target = f"http://{self.host}:{self.port}{self.target}"
+            if self.proxy[2]:
+                self._headers["Proxy-Authorization"] = self.proxy[2]
+
+    def _connect(self):
+        if self.proxy is None:
+            if self.use_ssl:
+                return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self._ssl)
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        proxy_host, proxy_port, proxy_auth = self.proxy
+        if not self.use_ssl:
+            return http.client.HTTPConnection(proxy_host, proxy_port, timeout=self.timeout)
+        connection = http.client.HTTPSConnection(proxy_host, proxy_port, timeout=self.timeout, context=self._ssl)
+        connection.set_tunnel(
+            self.host, self.port, headers={"Proxy-Authorization": proxy_auth} if proxy_auth else None
+        )
+        return connection
+
+    def _request(self, connection, body):
+        """
+        (durum kodu, başlıklar, gövde) döndürür. İstek gönderilemediyse ağ hatası
+        olduğu gibi yükselir (yeniden denenebilir). İstek gönderildikten sonra
+        yanıt alınamazsa ileti ağ geçidine ulaşmış olabilir: aynı SMS iki kez
+        gitmesin diye kalıcı `SmsGatewayError` fırlatılır. Tek istisna, sunucunun
+        boşta kapattığı keep-alive bağlantısıdır; bu bir kez yeni bağlantıyla denenir.
+        """
+        for attempt in (1, 2):
+            reused = connection.sock is not None
+            try:
+                connection.request("POST", self.target, body, self._headers)
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if not reused or attempt == 2:
+                    raise
+                continue
+            try:
+                response = connection.getresponse()
+                return response.status, response.headers, response.read()
+            except _STALE_CONNECTION_ERRORS as exc:
+                connection.close()
+                if reused and attempt == 1:
+                    continue  # boştaki bağlantı kapanmış; istek işlenmedi
+                error = exc
+            except (http.client.HTTPException, OSError) as exc:
+                connection.close()
+                error = exc
+            raise SmsGatewayError(
+                f"Teslim durumu bilinmiyor, yinelenmemesi için yeniden denenmedi: "
+                f"{error.__class__.__name__}: {error}",
+                permanent=True,
+            ) from error
+
+    def _post(self, connection, reference, recipient, message):
+        body = json.dumps(
+            {"to": recipient, "message": message, "reference": str(reference)}, ensure_ascii=False
+        ).encode("utf-8")
+        try:
+            status, headers, data = self._request(connection, body)
+        except (http.client.HTTPException, OSError) as exc:
+            raise SmsGatewayError(f"Ağ geçidine ulaşılamadı: {exc.__class__.__name__}: {exc}") from exc
+        if 200 <= status < 300:
+            return
+        detail = data[:200].decode("utf-8", "replace").strip()
+        retry_after = (headers.get("Retry-After") or "").strip()
+        raise SmsGatewayError(
+            f"HTTP {status}: {detail}" if detail else f"HTTP {status}",
+            status=status,
+            permanent=status < 500 and status not in RETRY_STATUSES,
+            retry_after=float(retry_after) if retry_after.isdigit() else None,
+        )
+
+    def _delay(self, attempt, error):
+        if error.retry_after is not None:
+            return min(error.retry_after, SMS_MAX_BACKOFF)
+        # Üstel bekleme + rastgele sapma: worker'lar aynı anda yeniden yüklenmesin
+        return min(SMS_MAX_BACKOFF, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def _send_one(self, connection, reference, recipient, message):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self._post(connection, reference, recipient, message)
+                return SmsResult(reference, True, attempts=attempt)
+            except SmsGatewayError as exc:
+                if exc.permanent or attempt > self.retries:
+                    return SmsResult(reference, False, str(exc), exc.permanent, attempt)
+                self._sleep(self._delay(attempt, exc))
+
+    def _worker(self, jobs, results):
+        connection = self._connect()
+        try:
+            while True:
+                try:
+                    index, (reference, recipient, message) = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                results[index] = self._send_one(connection, reference, recipient, message)
+        finally:
+            connection.close()
+
+    def send_all(self, messages):
+        messages = list(messages)
+        jobs = queue.SimpleQueue()
+        for item in enumerate(messages):
+            jobs.put(item)
+        results = [None] * len(messages)
+        workers = [
+            threading.Thread(target=self._worker, args=(jobs, results), name=f"sms-{n}", daemon=True)
+            for n in range(min(self.concurrency, len(messages)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # Beklenmedik bir hatayla duran worker'ın iletileri yeniden denenecek olarak döner
+        return [
+            result or SmsResult(reference, False, "Gönderilemedi: worker durdu.")
+            for result, (reference, _, _) in zip(results, messages)
+        ]
+
+
+def gateway_client(settings, **kwargs):
+    kwargs.setdefault("concurrency", getattr(django_settings, "SMS_CONCURRENCY", SMS_CONCURRENCY))
+    return SmsGatewayClient(settings.sms_api_url.strip(), settings.sms_api_key, **kwargs)
+
+
+def send_sms_outbox(*, batch_size=SMS_BATCH_SIZE, limit=None, settings=None, client=None):
+    """
+    Bekleyen SMS'leri ağ geçidine gönderir; {"sent", "pending", "failed"} döndürür.
+    Ağ geçidi adresi tanımlı değilse satırlar kuyrukta bekler.
+    """
+    settings = settings or NotificationSettings.get_solo()
+    totals = {"sent": 0, "pending": 0, "failed": 0}
+    if client is None:
+        if not settings.sms_api_url.strip():
+            return totals
+        client = gateway_client(settings)
+
+    processed = 0
+    last_id = 0
+    while limit is None or processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        rows = claim_outbox("sms", size, after_id=last_id)
+        if not rows:
+            break
+        processed += len(rows)
+        last_id = rows[-1].pk
+        results = client.send_all((row.pk, row.recipient, row.body) for row in rows)
+        mark_sent([result.reference for result in results if result.ok])
+        totals["sent"] += sum(1 for result in results if result.ok)
+        for row, result in zip(rows, results):
+            if not result.ok:
+                totals[mark_failed(row, result.error, permanent=result.permanent)] += 1
+    return totals
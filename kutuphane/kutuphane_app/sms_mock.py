@@ -0,0 +1,100 @@
+"""
+Ağsız deneme ve hız ölçümü için yerel SMS ağ geçidi.
+
+`sms.py` istemcisinin beklediği sözleşmeyi uygular: JSON gövdeli POST,
+isteğe bağlı `Authorization: Bearer <anahtar>`, keep-alive bağlantılar.
+Gelen iletiler `messages` listesinde tutulur. Hata davranışı denenebilir:
+`fail_statuses` sıradaki isteklere sırayla döndürülecek durum kodlarıdır,
+rakam dışı karakter içeren numaralar 400 ile reddedilir.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Başlık ve gövde ayrı yazılır; Nagle gecikmesi ölçümü bozmasın
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        gateway = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        with gateway.lock:
+            gateway.requests += 1
+            gateway.connections.add(self.client_address)
+            forced = gateway.fail_statuses.popleft() if gateway.fail_statuses else None
+        if gateway.latency:
+            time.sleep(gateway.latency)
+
+        if gateway.api_key and self.headers.get("Authorization") != f"Bearer {gateway.api_key}":
+            return self._reply(401, {"error": "unauthorized"})
+        if forced:
+            return self._reply(forced, {"error": "forced"})
+        try:
+            payload = json.loads(raw.decode("utf-8"))
+        except ValueError:
+            return self._reply(400, {"error": "invalid json"})
+        number = str(payload.get("to") or "").replace(" ", "").lstrip("+")
+        if not number.isdigit() or not payload.get("message"):
+            return self._reply(400, {"error": "invalid recipient"})
+        with gateway.lock:
+            gateway.messages.append(payload)
+            message_id = len(gateway.messages)
+        return self._reply(200, {"id": message_id, "status": "queued"})
+
+
+class MockSmsGateway(ThreadingHTTPServer):
+    """`with MockSmsGateway() as gateway:` arka planda dinler; adres `gateway.url`."""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, *, api_key="", latency=0.0, fail_statuses=()):
+        super().__init__((host, port), _GatewayHandler)
+        self.api_key = api_key
+        self.latency = latency
+        self.fail_statuses = deque(fail_statuses)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.requests = 0
+        self.connections = set()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/send"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), name="sms-mock-gateway", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,282 @@
+"""
+Ödünç istatistikleri için günlük toplamlar (rollup).
+
+`OduncKaydi` tablosu her istatistik isteğinde yeniden taranmaz; zamanlanmış iş
+`refresh_loan_rollups()` ile son işlenen ödünç id'sinden (watermark) itibaren
+yalnızca yeni kayıtları gün + öğrenci/sınıf/kitap/kategori bazında
+`LoanStatRollup` tablosuna ekler. Rapor uçları bu küçük tablodan okur ve
+istek içinde yenileme yapmaz: toplamlar bayatsa yenileme arka planda başlatılır
+(`jobs.request_rollup_refresh`), yanıt o anki toplamlarla döner. İlk doldurma
+(tüm ödünç geçmişi) da zamanlanmış işin ilk çalıştırmasında yapılır.
+
+`build_dashboard()` ise tarih/sınıf filtreli özet ekranını doğrudan ödünç
+tablosundan, sabit sayıda gruplu sorguyla hesaplar ve kısa süre önbellekler.
+
+Sayımlar ödünç anındaki sınıf/kategoriye göre tutulur; silinen (ör. arşivlenen)
+kayıtlar geçmiş toplamlardan düşülmez. Gerekirse `rebuild_loan_rollups()` ile
+tablo baştan oluşturulabilir.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import LoanStatRollup, LoanStatWatermark, OduncKaydi
+
+ROLLUP_BATCH_SIZE = 20000
+# Henüz commit edilmemiş (daha küçük id'li) kayıtları atlamamak için son birkaç
+# dakikanın ödünçleri bir sonraki çalıştırmaya bırakılır.
+ROLLUP_SAFETY_LAG = timedelta(minutes=2)
+ROLLUP_MAX_AGE = timedelta(minutes=5)
+
+ROLLUP_DIMENSIONS = {
+    LoanStatRollup.DIMENSION_TOTAL: None,
+    LoanStatRollup.DIMENSION_STUDENT: "ogrenci_id",
+    LoanStatRollup.DIMENSION_CLASS: "ogrenci__sinif_id",
+    LoanStatRollup.DIMENSION_BOOK: "kitap_nusha__kitap_id",
+    LoanStatRollup.DIMENSION_CATEGORY: "kitap_nusha__kitap__kategori_id",
+}
+
+
+def _collect_window(low, high):
+    """(low, high] aralığındaki ödünçleri boyut başına gün bazında sayar."""
+    loans = (
+        OduncKaydi.objects
+        .filter(id__gt=low, id__lte=high)
+        .annotate(gun=TruncDate("odunc_tarihi"))
+    )
+    increments = {}
+    for dimension, field in ROLLUP_DIMENSIONS.items():
+        group = ["gun"] + ([field] if field else [])
+        rows = loans.values(*group).annotate(sayi=Count("id")).order_by()
+        for row in rows:
+            key = row[field] if field else 0
+            if key is None:
+                continue
+            increments[(dimension, key, row["gun"])] = row["sayi"]
+    return increments
+
+
+def _apply_increments(increments):
+    by_dimension = {}
+    for dimension, key, day in increments:
+        by_dimension.setdefault(dimension, (set(), set()))
+        by_dimension[dimension][0].add(key)
+        by_dimension[dimension][1].add(day)
+
+    to_update = []
+    for dimension, (keys, days) in by_dimension.items():
+        existing = LoanStatRollup.objects.filter(dimension=dimension, key__in=keys, day__in=days)
+        for row in existing:
+            added = increments.pop((row.dimension, row.key, row.day), None)
+            if added:
+                row.loan_count += added
+                to_update.append(row)
+
+    LoanStatRollup.objects.bulk_update(to_update, ["loan_count"], batch_size=1000)
+    LoanStatRollup.objects.bulk_create(
+        [
+            LoanStatRollup(dimension=dimension, key=key, day=day, loan_count=count)
+            for (dimension, key, day), count in increments.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def refresh_loan_rollups(now=None, *, batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Watermark'tan sonraki ödünçleri günlük toplamlara ekler.
+    Kayıtlar `batch_size` genişliğinde id pencereleriyle gruplanarak okunur;
+    watermark satırı kilitlendiği için eşzamanlı iki yenileme çakışmaz.
+    Dönüş: {"processed": n, "last_loan_id": id}
+    """
+    now = now or timezone.now()
+    LoanStatWatermark.get_solo()
+    processed = 0
+
+    with transaction.atomic():
+        # Aynı anda iki yenileme çalışmasın
+        state = LoanStatWatermark.objects.select_for_update().get(singleton_key="default")
+        high = (
+            OduncKaydi.objects
+            .filter(id__gt=state.last_loan_id, odunc_tarihi__lte=now - ROLLUP_SAFETY_LAG)
+            .aggregate(son=Max("id"))["son"]
+        )
+        low = state.last_loan_id
+        while high and low < high:
+            window_high = min(low + batch_size, high)
+            increments = _collect_window(low, window_high)
+            processed += sum(
+                count for (dimension, _, _), count in increments.items()
+                if dimension == LoanStatRollup.DIMENSION_TOTAL
+            )
+            _apply_increments(increments)
+            low = window_high
+        state.last_loan_id = low
+        state.refreshed_at = now
+        state.save(update_fields=["last_loan_id", "refreshed_at"])
+
+    return {"processed": processed, "last_loan_id": state.last_loan_id}
+
+
+def rebuild_loan_rollups(now=None):
+    """Toplamları silip tüm ödünç geçmişinden yeniden hesaplar."""
+    with transaction.atomic():
+        LoanStatRollup.objects.all().delete()
+        LoanStatWatermark.objects.update_or_create(
+            singleton_key="default",
+            defaults={"last_loan_id": 0, "refreshed_at": None},
+        )
+        return refresh_loan_rollups(now=now)
+
+
+def rollup_state(max_age=ROLLUP_MAX_AGE):
+    """
+    Toplamların son yenilenme anı ve bayat olup olmadığı: {"refreshed_at", "stale"}.
+    Hiç yenilenmemişse (ör. kurulumdan sonra ilk zamanlanmış iş çalışmadıysa) bayattır.
+    """
+    state = LoanStatWatermark.objects.filter(singleton_key="default").only("refreshed_at").first()
+    refreshed_at = state.refreshed_at if state else None
+    stale = refreshed_at is None or timezone.now() - refreshed_at > max_age
+    return {"refreshed_at": refreshed_at, "stale": stale}
+
+
+def rollup_totals(dimension, since=None):
+    """Boyut anahtarına göre toplam ödünç sayıları: values("key", "toplam")."""
+    qs = LoanStatRollup.objects.filter(dimension=dimension)
+    if since is not None:
+        qs = qs.filter(day__gte=since)
+    return qs.values("key").annotate(toplam=Sum("loan_count")).order_by()
+
+
+def rollup_monthly(since=None):
+    """Toplam boyutundan aylık ödünç sayıları: [(ayın_ilk_günü, sayı), ...]."""
+    qs = LoanStatRollup.objects.filter(dimension=LoanStatRollup.DIMENSION_TOTAL)
+    if since is not None:
+        qs = qs.filter(day__gte=since)
+    months = {}
+    for day, count in qs.values_list("day", "loan_count"):
+        month = day.replace(day=1)
+        months[month] = months.get(month, 0) + count
+    return sorted(months.items())
+
+
+# --- Gösterge paneli ---
+
+DASHBOARD_CACHE_PREFIX = "istatistik:dashboard:"
+DASHBOARD_CACHE_TTL = 60
+DASHBOARD_DEFAULT_LIMIT = 10
+DASHBOARD_MAX_LIMIT = 50
+
+
+def dashboard_cache_key(params: dict) -> str:
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return DASHBOARD_CACHE_PREFIX + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _top(loans, group, label_fields, count_name, limit, **filter_kwargs):
+    """Tek gruplu sorgu: `group` alanına göre en yüksek sayılar."""
+    qs = loans.filter(**filter_kwargs) if filter_kwargs else loans
+    fields = [group] + list(label_fields)
+    return list(
+        qs.exclude(**{f"{group}__isnull": True})
+        .values(*fields)
+        .annotate(**{count_name: Count("id")})
+        .order_by(f"-{count_name}", group)[:limit]
+    )
+
+
+def build_dashboard(*, baslangic=None, bitis=None, sinif_id=None, limit=DASHBOARD_DEFAULT_LIMIT):
+    """
+    İstatistik ekranındaki tüm metrikleri aynı filtrelenmiş ödünç kümesi
+    üzerinden sabit sayıda gruplu sorguyla hesaplar (özet için koşullu
+    toplama, aylık trend için TruncMonth). SQLite ve PostgreSQL'de çalışır.
+    """
+    loans = OduncKaydi.objects.all()
+    if baslangic:
+        loans = loans.filter(odunc_tarihi__date__gte=baslangic)
+    if bitis:
+        loans = loans.filter(odunc_tarihi__date__lte=bitis)
+    if sinif_id:
+        loans = loans.filter(ogrenci__sinif_id=sinif_id)
+
+    unpaid = Q(gecikme_cezasi__gt=0, gecikme_cezasi_odendi=False)
+    ozet = loans.aggregate(
+        toplam_odunc=Count("id"),
+        aktif_odunc=Count("id", filter=Q(durum="oduncte")),
+        geciken=Count("id", filter=Q(durum="gecikmis")),
+        teslim_edilen=Count("id", filter=Q(durum="teslim")),
+        okuyan_ogrenci=Count("ogrenci", distinct=True),
+        okunan_kitap=Count("kitap_nusha__kitap", distinct=True),
+        odenmemis_ceza=Sum("gecikme_cezasi", filter=unpaid),
+        odenmemis_ceza_adet=Count("id", filter=unpaid),
+    )
+    ozet["odenmemis_ceza"] = format(ozet["odenmemis_ceza"] or Decimal("0"), ".2f")
+
+    aylik = (
+        loans.annotate(ay=TruncMonth("odunc_tarihi"))
+        .values("ay")
+        .annotate(
+            odunc=Count("id"),
+            teslim=Count("id", filter=Q(durum="teslim")),
+            geciken=Count("id", filter=Q(durum="gecikmis")),
+        )
+        .order_by("ay")
+    )
+
+    def _month(value):
+        return (value.date() if hasattr(value, "date") else value).isoformat()
+
+    return {
+        "filters": {
+            "baslangic": baslangic.isoformat() if baslangic else None,
+            "bitis": bitis.isoformat() if bitis else None,
+            "sinif_id": sinif_id,
+            "limit": limit,
+        },
+        "ozet": ozet,
+        "aylik": [{**row, "ay": _month(row["ay"])} for row in aylik],
+        "en_cok_okuyan_ogrenciler": [
+            {"id": row["ogrenci_id"], "ogrenci": f"{row['ogrenci__ad']} {row['ogrenci__soyad']} ({row['ogrenci__ogrenci_no']})", "okunan": row["okunan"]}
+            for row in _top(loans, "ogrenci_id", ("ogrenci__ad", "ogrenci__soyad", "ogrenci__ogrenci_no"), "okunan", limit)
+        ],
+        "en_cok_okunan_kitaplar": [
+            {"id": row["kitap_nusha__kitap_id"], "kitap": row["kitap_nusha__kitap__baslik"], "okunma": row["okunma"]}
+            for row in _top(loans, "kitap_nusha__kitap_id", ("kitap_nusha__kitap__baslik",), "okunma", limit)
+        ],
+        "sinif_dagilimi": [
+            {"id": row["ogrenci__sinif_id"], "sinif": row["ogrenci__sinif__ad"], "okunan": row["okunan"]}
+            for row in _top(loans, "ogrenci__sinif_id", ("ogrenci__sinif__ad",), "okunan", DASHBOARD_MAX_LIMIT)
+        ],
+        "kategori_dagilimi": [
+            {"id": row["kitap_nusha__kitap__kategori_id"], "kategori": row["kitap_nusha__kitap__kategori__ad"], "okunma": row["okunma"]}
+            for row in _top(loans, "kitap_nusha__kitap__kategori_id", ("kitap_nusha__kitap__kategori__ad",), "okunma", DASHBOARD_MAX_LIMIT)
+        ],
+        "en_cok_geciken": [
+            {"id": row["ogrenci_id"], "ogrenci": f"{row['ogrenci__ad']} {row['ogrenci__soyad']} ({row['ogrenci__ogrenci_no']})", "gecikme": row["gecikme"]}
+            for row in _top(
+                loans, "ogrenci_id", ("ogrenci__ad", "ogrenci__soyad", "ogrenci__ogrenci_no"), "gecikme", limit,
+                gecikme_cezasi__gt=0, gecikme_cezasi_odendi=False,
+            )
+        ],
+        "generated_at": timezone.now().isoformat(),
+    }
+
+
+def get_dashboard(**params):
+    """`build_dashboard` sonucunu parametre kümesi başına kısa süreli önbellekler."""
+    key = dashboard_cache_key(params)
+    data = cache.get(key)
+    if data is None:
+        data = build_dashboard(**params)
+        cache.set(key, data, DASHBOARD_CACHE_TTL)
+    return data
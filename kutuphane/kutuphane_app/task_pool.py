@@ -0,0 +1,28 @@
+"""
+`run_task_worker` süreç havuzunun giriş noktaları.
+
+Havuz süreçleri spawn ile açılır; bu modül havuz sürecinde Django kurulmadan
+önce içe aktarıldığı için modül düzeyinde model içe aktarmaz.
+"""
+
+import os
+
+
+def init_pool_process(settings_module):
+    """Havuzdaki her süreçte bir kez çalışır: Django yeniden kurulur."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+
+
+def run_pooled_task(task_id):
+    from django.db import connections
+
+    from .tasks import run_task
+
+    try:
+        return run_task(task_id)
+    finally:
+        # Süreç bir sonraki göreve kadar boşta bağlantı tutmasın
+        connections.close_all()
@@ -0,0 +1,254 @@
+"""
+Ağır yönetim işleri için veritabanı tabanlı görev kuyruğu.
+
+Yedek alma, geri yükleme, arşivleme, öğrenci içe aktarma, gecikme
+güncellemesi ve istatistik yenilemesi HTTP isteği içinde çalışmaz: istek yalnızca bir `BackgroundTask`
+satırı ekler. `manage.py run_task_worker` sıradaki satırları
+`SELECT … FOR UPDATE SKIP LOCKED` ile alır (birden çok worker aynı görevi
+almaz) ve her görevi bir süreç havuzunda yürütür. Görev ilerlemesini
+`progress`, sonucunu `result`, hatasını `error` alanına yazar; durum yönetim
+panelinden ve `/api/tasks/` üzerinden izlenir. Redis/Celery gerekmez.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .jobs import OVERDUE_JOB, STATS_JOB, _json_safe, claim_job_run, execute_overdue_run, execute_stats_run
+from .models import BackgroundTask, Ogrenci, ScheduledJobRun
+
+logger = logging.getLogger(__name__)
+
+TASK_HANDLERS = {}
+PROGRESS_INTERVAL = 1.0
+# İlerleme yazmayan "running" görev bu süreden sonra (worker öldü sayılıp) düşer
+TASK_STALE_AFTER = timedelta(hours=2)
+
+
+def task_handler(kind):
+    """`handler(params, progress)` fonksiyonunu görev türü için kaydeder; dönüş görev sonucudur."""
+    def decorator(func):
+        TASK_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue_task(kind, params=None, user=None):
+    """Görevi sıraya ekler; worker boşta ise birkaç saniye içinde başlar."""
+    if kind not in TASK_HANDLERS:
+        raise ValueError(f"Bilinmeyen görev türü: {kind}")
+    username = user.get_username() if user is not None and user.is_authenticated else ""
+    return BackgroundTask.objects.create(kind=kind, params=_json_safe(params or {}), created_by=username)
+
+
+def _update_task(task_id, **fields):
+    fields["updated_at"] = timezone.now()
+    return BackgroundTask.objects.filter(pk=task_id).update(**fields)
+
+
+def _update_outside_transaction(task_id, **fields):
+    """
+    Görev kendi transaction'ı içindeyken (ör. geri yükleme) ilerleme dışarıdan
+    görünsün diye PostgreSQL'de ayrı bir bağlantıdan (ayrı thread) yazar.
+    """
+    if not (connection.in_atomic_block and connection.vendor == "postgresql"):
+        _update_task(task_id, **fields)
+        return
+
+    def target():
+        try:
+            _update_task(task_id, **fields)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=target, name=f"task-{task_id}-progress", daemon=True)
+    thread.start()
+    thread.join()
+
+
+def fail_stale_tasks():
+    now = timezone.now()
+    return BackgroundTask.objects.filter(status="running", updated_at__lt=now - TASK_STALE_AFTER).update(
+        status="failed",
+        finished_at=now,
+        updated_at=now,
+        error="Zaman aşımı: worker görevi tamamlamadan durdu.",
+    )
+
+
+def claim_tasks(limit, worker=""):
+    """
+    Sıradaki en eski `limit` görevi "running" yapar ve kimliklerini döndürür.
+    Başka bir worker'ın kilitlediği satırlar beklenmeden atlanır.
+    """
+    if limit <= 0:
+        return []
+    fail_stale_tasks()
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            BackgroundTask.objects
+            .select_for_update(skip_locked=True)
+            .filter(status="queued")
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if ids:
+            BackgroundTask.objects.filter(pk__in=ids).update(
+                status="running", started_at=now, updated_at=now, worker=worker[:100]
+            )
+    return ids
+
+
+class TaskProgress:
+    """Görevin `progress` alanını günceller; veritabanına en fazla `interval` saniyede bir yazar."""
+
+    def __init__(self, task_id, interval=PROGRESS_INTERVAL):
+        self.task_id = task_id
+        self.interval = interval
+        self.state = {}
+        self._last = 0.0
+
+    def __call__(self, state=None, **kwargs):
+        self.state.update(state or {}, **kwargs)
+        if time.monotonic() - self._last >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self._last = time.monotonic()
+        _update_outside_transaction(self.task_id, progress=_json_safe(self.state))
+
+
+def fail_task(task_id, error):
+    _update_task(task_id, status="failed", finished_at=timezone.now(), error=str(error))
+
+
+def run_task(task_id):
+    """Görevi bu süreçte yürütür ve sonucunu yazar; "done" ya da "failed" döndürür."""
+    task = BackgroundTask.objects.get(pk=task_id)
+    progress = TaskProgress(task_id)
+    try:
+        handler = TASK_HANDLERS.get(task.kind)
+        if handler is None:
+            raise ValueError(f"Bilinmeyen görev türü: {task.kind}")
+        result = handler(dict(task.params), progress)
+    except Exception as exc:
+        logger.exception("Görev #%s (%s) başarısız", task_id, task.kind)
+        _update_task(
+            task_id,
+            status="failed",
+            finished_at=timezone.now(),
+            error=f"{exc.__class__.__name__}: {exc}",
+            progress=_json_safe(progress.state),
+        )
+        return "failed"
+    _update_task(
+        task_id,
+        status="done",
+        finished_at=timezone.now(),
+        result=_json_safe(result) if isinstance(result, dict) else {},
+        progress=_json_safe(progress.state),
+    )
+    return "done"
+
+
+# --- Görevler ---
+
+
+def backups_dir():
+    path = Path(settings.BASE_DIR) / "backups"
+    path.mkdir(exist_ok=True)
+    return path
+
+
+@task_handler("backup")
+def _backup_task(params, progress):
+    from .backup import BACKUP_SUFFIX, write_backup
+
+    filename = f"backup_{timezone.localtime():%Y%m%d_%H%M%S}{BACKUP_SUFFIX}"
+    progress(file=filename, message="Yedek yazılıyor")
+    manifest = write_backup(backups_dir() / filename)
+    return {"file": filename, "total": manifest.get("total")}
+
+
+@task_handler("restore")
+def _restore_task(params, progress):
+    from .backup import RestoreError, restore_backup
+
+    path = params["path"]
+    # Önce doğrulama: bozuk dosya mevcut veriye dokunmadan reddedilir
+    check = restore_backup(path, dry_run=True, progress=lambda state: progress(state, phase="dogrulama"))
+    if check["checksum_ok"] is False:
+        raise RestoreError("Yedek manifest ile uyuşmuyor (sağlama toplamı).")
+    if params.get("dry_run"):
+        return check
+    return restore_backup(path, progress=lambda state: progress(state, phase="yukleme"))
+
+
+@task_handler("archive")
+def _archive_task(params, progress):
+    from .archive import archive_candidates, archive_students
+
+    ids = params.get("student_ids")
+    queryset = Ogrenci.objects.filter(id__in=ids) if ids is not None else archive_candidates()
+    kwargs = {"aciklama": params["aciklama"]} if params.get("aciklama") else {}
+    return archive_students(queryset, progress=progress, **kwargs)
+
+
+@task_handler("import")
+def _import_task(params, progress):
+    from .resources import bulk_import_ogrenciler
+
+    path = params["path"]
+    progress(message="Öğrenci listesi içe aktarılıyor")
+    try:
+        with open(path, "rb") as fh:
+            sonuc = bulk_import_ogrenciler(
+                fh,
+                deactivate_missing=bool(params.get("deactivate_missing", True)),
+                dry_run=bool(params.get("dry_run")),
+            )
+    finally:
+        if params.get("cleanup"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return dataclasses.asdict(sonuc)
+
+
+@task_handler("overdue")
+def _overdue_task(params, progress):
+    run = None
+    if params.get("run_id"):
+        run = ScheduledJobRun.objects.filter(pk=params["run_id"], status="running").first()
+    if run is None:
+        run, claimed = claim_job_run(OVERDUE_JOB)
+        if not claimed:
+            # Zamanlayıcı ya da başka bir istek zaten tarıyor
+            return {"run_id": run.pk, "joined": True}
+    progress(run_id=run.pk)
+    return {"run_id": run.pk, **execute_overdue_run(run)}
+
+
+@task_handler("stats")
+def _stats_task(params, progress):
+    run = None
+    if params.get("run_id"):
+        run = ScheduledJobRun.objects.filter(pk=params["run_id"], status="running").first()
+    if run is None:
+        run, claimed = claim_job_run(STATS_JOB)
+        if not claimed:
+            return {"run_id": run.pk, "joined": True}
+    progress(run_id=run.pk)
+    return {"run_id": run.pk, **execute_stats_run(run)}
@@ -1,3 +1,1431 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import shutil
+import smtplib
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import audit, notifications
+from .archive import archive_students
+from .barcodes import allocate_barcodes
+from .stats import rebuild_loan_rollups, refresh_loan_rollups
+from .backup import RestoreError, manifest_path_for, restore_backup, stream_backup
+from .jobs import (
+    JOB_RUN_STALE_AFTER,
+    claim_job_run,
+    next_scheduled_wakeup,
+    overdue_rows,
+    touch_job_run,
+    update_overdue_loans,
+)
+from .sms import SmsGatewayClient, send_sms_outbox
+from .sms_mock import MockSmsGateway
+from .notifications import (
+    SendRateLimiter,
+    compile_template,
+    dispatch_notifications,
+    queue_notifications,
+    send_email_outbox,
+)
+from .loan_policy import bump_policy_version, get_policy_payload, get_snapshot
+from .models import (
+    ArsivBatch,
+    ArsivOdunc,
+    ArsivOgrenci,
+    AuditLog,
+    BarcodeSequence,
+    InventoryItem,
+    InventorySession,
+    Kategori,
+    Kitap,
+    KitapNusha,
+    LoanPolicy,
+    LoanStatRollup,
+    NotificationOutbox,
+    NotificationSettings,
+    Ogrenci,
+    OduncKaydi,
+    Rol,
+    RoleLoanPolicy,
+    ScheduledJobRun,
+    BackgroundTask,
+    Sinif,
+    Yazar,
+)
+from .query_plans import HOT_QUERIES, check_query_plans, seq_scanned_tables
+from .resources import OgrenciResource, bulk_import_ogrenciler
+from .search import normalize_search_text, search_books
+from .tasks import claim_tasks, enqueue_task, run_task
+
+
+def build_circulation_fixture(*, students=20, loans_per_student=30, penalty_rate="1.50"):
+    """
+    Sorgu bütçesi testleri için büyük ödünç veri seti oluşturur.
+    Her öğrencinin yarısı açık (gecikmiş), yarısı teslim edilmiş cezalı kayıtlardan oluşur.
+    """
+    LoanPolicy.get_solo()
+    rol = Rol.objects.create(ad="Öğrenci")
+    RoleLoanPolicy.objects.filter(role=rol).update(
+        daily_penalty_rate=Decimal(penalty_rate),
+        penalty_max_per_student=Decimal("500.00"),
+    )
+    sinif = Sinif.objects.create(ad="9-A")
+    kitap = Kitap.objects.create(baslik="Sefiller", isbn="9789750700000")
+
+    ogrenciler = Ogrenci.objects.bulk_create(
+        Ogrenci(ad=f"Ad{i}", soyad=f"Soyad{i}", ogrenci_no=f"{1000 + i}", sinif=sinif, rol=rol)
+        for i in range(students)
+    )
+    nushalar = KitapNusha.objects.bulk_create(
+        KitapNusha(kitap=kitap, barkod=f"KIT{n:06d}", durum="oduncte")
+        for n in range(1, students * loans_per_student + 1)
+    )
+
+    now = timezone.now()
+    loans = []
+    copies = iter(nushalar)
+    for ogrenci in ogrenciler:
+        for j in range(loans_per_student):
+            returned = j % 2 == 1
+            loans.append(OduncKaydi(
+                ogrenci=ogrenci,
+                kitap_nusha=next(copies),
+                iade_tarihi=now - timedelta(days=5 + j),
+                teslim_tarihi=now - timedelta(days=1) if returned else None,
+                durum="teslim" if returned else "gecikmis",
+                gecikme_cezasi=Decimal("3.00"),
+            ))
+    OduncKaydi.objects.bulk_create(loans, batch_size=500)
+    bump_policy_version()
+    return ogrenciler, nushalar
+
+
+# Testler dağıtımın dosya önbelleğine (politika sürüm damgası, pano) dokunmasın
+isolated_cache = override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+
+
+@isolated_cache
+class ApiTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        bump_policy_version()
+        self.user = get_user_model().objects.create_user(username="masa", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertQueryBudget(self, budget, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLessEqual(
+            len(ctx.captured_queries),
+            budget,
+            "\n".join(q["sql"] for q in ctx.captured_queries),
+        )
+        return response
+
+
+class FastQueryBudgetTests(ApiTestCase):
+    BUDGET = 10
+
+    def setUp(self):
+        super().setUp()
+        self.ogrenciler, self.nushalar = build_circulation_fixture()
+
+    def test_student_lookup_is_constant(self):
+        ogrenci = self.ogrenciler[0]
+        response = self.assertQueryBudget(self.BUDGET, "get", "/api/fast-query/", data={"q": ogrenci.ogrenci_no})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["type"], "student")
+        self.assertEqual(len(data["active_loans"]), 15)
+        self.assertEqual(data["penalty_summary"]["outstanding_count"], 15)
+        self.assertEqual(data["penalty_summary"]["outstanding_total"], "45.00")
+        self.assertTrue(all(loan["penalty_preview"] for loan in data["active_loans"]))
+
+    def test_copy_lookup_is_constant(self):
+        response = self.assertQueryBudget(self.BUDGET, "get", "/api/fast-query/", data={"q": self.nushalar[0].barkod})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["type"], "book_copy")
+        self.assertEqual(data["loan"]["ogrenci"]["ogrenci_no"], self.ogrenciler[0].ogrenci_no)
+
+    def test_isbn_and_not_found(self):
+        response = self.assertQueryBudget(self.BUDGET, "get", "/api/fast-query/", data={"q": "9789750700000"})
+        self.assertEqual(response.json()["type"], "isbn")
+        self.assertTrue(response.json()["exists"])
+        response = self.client.get("/api/fast-query/", {"q": "yok-boyle-bir-sey"})
+        self.assertEqual(response.json()["type"], "not_found")
+
+    def test_penalty_preview_respects_student_cap(self):
+        RoleLoanPolicy.objects.update(penalty_max_per_student=Decimal("90.00"))
+        bump_policy_version()
+        ogrenci = self.ogrenciler[0]
+        data = self.client.get("/api/fast-query/", {"q": ogrenci.ogrenci_no}).json()
+        # Diğer 29 kaydın toplamı 87.00; en fazla 3.00 kalan pay olabilir.
+        for loan in data["active_loans"]:
+            self.assertLessEqual(Decimal(loan["penalty_preview"]), Decimal("3.00"))
+
+
+@isolated_cache
+class UpdateOverdueLoansTests(TestCase):
+    def setUp(self):
+        self.ogrenciler, _ = build_circulation_fixture(students=20, loans_per_student=30)
+
+    def test_chunked_run_uses_constant_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            result = update_overdue_loans(chunk_size=100)
+        # 300 açık kayıt, 100'lük parçalar: parça başına seçim + toplu güncelleme
+        self.assertLessEqual(len(ctx.captured_queries), 20)
+        self.assertEqual(result["recalculated"], 300)
+        self.assertEqual(result["updated_overdue"], 0)
+        self.assertEqual(result["reverted"], 0)
+        loan = OduncKaydi.objects.filter(teslim_tarihi__isnull=True).order_by("iade_tarihi").first()
+        self.assertEqual(loan.gecikme_cezasi, Decimal("1.50") * 33)
+
+    def test_student_cap_tracks_changes_within_run(self):
+        RoleLoanPolicy.objects.update(penalty_max_per_student=Decimal("100.00"))
+        bump_policy_version()
+        update_overdue_loans(chunk_size=7)
+        for ogrenci in self.ogrenciler:
+            total = (
+                OduncKaydi.objects
+                .filter(ogrenci=ogrenci, gecikme_cezasi__gt=0, gecikme_cezasi_odendi=False)
+                .aggregate(total=Sum("gecikme_cezasi"))["total"]
+            )
+            self.assertEqual(total, Decimal("100.00"))
+
+    def test_status_only_change_keeps_payment_fields(self):
+        update_overdue_loans()
+        loan = OduncKaydi.objects.filter(teslim_tarihi__isnull=True).first()
+        paid_at = timezone.now()
+        OduncKaydi.objects.filter(pk=loan.pk).update(
+            durum="oduncte", gecikme_cezasi_odendi=True, gecikme_odeme_tarihi=paid_at,
+            gecikme_odeme_tutari=loan.gecikme_cezasi,
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            result = update_overdue_loans()
+        loan.refresh_from_db()
+        self.assertEqual((result["updated_overdue"], result["recalculated"]), (1, 0))
+        self.assertEqual(loan.durum, "gecikmis")
+        self.assertTrue(loan.gecikme_cezasi_odendi)
+        self.assertEqual(loan.gecikme_odeme_tarihi, paid_at)
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertTrue(updates)
+        self.assertFalse(any("gecikme_odeme" in sql for sql in updates))
+
+    def test_returned_to_schedule_reverts_status(self):
+        loan = OduncKaydi.objects.filter(teslim_tarihi__isnull=True).first()
+        loan.iade_tarihi = timezone.now() + timedelta(days=3)
+        loan.save(update_fields=["iade_tarihi"])
+        result = update_overdue_loans()
+        loan.refresh_from_db()
+        self.assertEqual(result["reverted"], 1)
+        self.assertEqual(loan.durum, "oduncte")
+        self.assertIsNone(loan.gecikme_cezasi)
+
+
+class ScheduledTasksCommandTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        build_circulation_fixture(students=4, loans_per_student=4)
+
+    def test_one_shot_records_each_job(self):
+        out = io.StringIO()
+        call_command("run_scheduled_tasks", stdout=out)
+        runs = {run.job: run for run in ScheduledJobRun.objects.all()}
+        self.assertEqual(set(runs), {"stats", "overdue"})
+        self.assertEqual(runs["overdue"].rows, 8)
+        self.assertEqual(runs["overdue"].status, "ok")
+        self.assertIn("processed", runs["stats"].result)
+        self.assertIn("overdue:", out.getvalue())
+        self.assertIsNotNone(NotificationSettings.get_solo().overdue_last_run)
+
+        # Aynı gün ikinci çalıştırma taramayı tekrarlamaz
+        call_command("run_scheduled_tasks", stdout=io.StringIO())
+        self.assertEqual(ScheduledJobRun.objects.filter(job="overdue").count(), 1)
+
+    def test_overdue_endpoint_reuses_todays_scheduler_run(self):
+        call_command("run_scheduled_tasks", stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/jobs/update-overdue/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["state"], "recent")
+        self.assertEqual(response.data["result"]["recalculated"], 8)
+        self.assertFalse(any("odunckaydi" in q["sql"].lower() for q in ctx.captured_queries))
+
+    def test_overdue_endpoint_coalesces_and_runs_in_background(self):
+        started = []
+        with mock.patch("kutuphane_app.jobs.start_in_background", lambda func, *args: started.append((func, args))):
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.client.post("/api/jobs/update-overdue/")
+            with self.captureOnCommitCallbacks(execute=True):
+                second = self.client.post("/api/jobs/update-overdue/")
+        self.assertEqual((first.status_code, second.status_code), (202, 202))
+        self.assertEqual((first.data["state"], second.data["state"]), ("started", "running"))
+        self.assertEqual(first.data["job_id"], second.data["job_id"])
+        self.assertEqual(len(started), 1)
+
+        # Zamanlayıcı da süren taramaya katılır, ikinci bir tarama açmaz
+        self.assertFalse(claim_job_run("overdue")[1])
+
+        polled = self.client.get("/api/jobs/update-overdue/", {"job_id": first.data["job_id"]})
+        self.assertEqual(polled.data["status"], "running")
+
+        func, args = started[0]
+        func(*args)
+        polled = self.client.get("/api/jobs/update-overdue/", {"job_id": first.data["job_id"]})
+        self.assertEqual(polled.data["status"], "ok")
+        self.assertEqual(polled.data["result"]["recalculated"], 8)
+        self.assertEqual(self.client.post("/api/jobs/update-overdue/").data["state"], "recent")
+
+    def test_long_scan_keeps_its_run_alive(self):
+        run, _ = claim_job_run("overdue")
+        long_ago = timezone.now() - JOB_RUN_STALE_AFTER - timedelta(minutes=5)
+        ScheduledJobRun.objects.filter(pk=run.pk).update(started_at=long_ago, heartbeat_at=long_ago)
+
+        beats = []
+
+        def heartbeat():
+            touch_job_run(run)
+            beats.append(1)
+            # Tarama sürerken başka bir istek yeni tarama açamaz
+            self.assertFalse(claim_job_run("overdue")[1])
+
+        update_overdue_loans(chunk_size=5, heartbeat=heartbeat)
+        self.assertEqual(len(beats), 2)
+        self.assertEqual(ScheduledJobRun.objects.get(pk=run.pk).status, "running")
+
+        # Sinyal kesilen (süreci ölen) kayıt süre dolunca düşer
+        ScheduledJobRun.objects.filter(pk=run.pk).update(heartbeat_at=long_ago)
+        self.assertTrue(claim_job_run("overdue")[1])
+        self.assertEqual(ScheduledJobRun.objects.get(pk=run.pk).status, "error")
+
+    def test_loop_wakes_at_next_schedule_boundary(self):
+        NotificationSettings.get_solo()
+        NotificationSettings.objects.update(
+            email_enabled=True, due_reminder_enabled=True, due_reminder_email_enabled=True,
+            email_schedule_enabled=True, email_schedule_hour=18, email_schedule_minute=30,
+            email_schedule_timezone="Europe/Istanbul",
+        )
+        now = timezone.make_aware(timezone.datetime(2026, 3, 2, 12, 0), timezone.get_fixed_timezone(180))
+        self.assertEqual(next_scheduled_wakeup(now).isoformat(), "2026-03-02T15:30:00+00:00")
+        # Kanal kapalıysa bir sonraki yerel gün başı (gecikme güncellemesi)
+        NotificationSettings.objects.update(email_enabled=False)
+        self.assertEqual(next_scheduled_wakeup(now).isoformat(), "2026-03-02T21:00:00+00:00")
+
+
+class BackgroundTaskTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        build_circulation_fixture(students=3, loans_per_student=4)
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def test_claim_takes_oldest_queued_once(self):
+        first = enqueue_task("overdue")
+        second = enqueue_task("overdue")
+        self.assertEqual(claim_tasks(1, worker="w1"), [first.pk])
+        self.assertEqual(claim_tasks(5, worker="w2"), [second.pk])
+        self.assertEqual(claim_tasks(5), [])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.worker), ("running", "w1"))
+
+    def test_backup_and_restore_tasks_report_progress(self):
+        with override_settings(BASE_DIR=self.tmpdir):
+            backup = enqueue_task("backup", user=self.user)
+            self.assertEqual(run_task(backup.pk), "done")
+        backup.refresh_from_db()
+        self.assertEqual(backup.created_by, "masa")
+        path = self.tmpdir / "backups" / backup.result["file"]
+        self.assertTrue(path.exists())
+
+        OduncKaydi.objects.all().delete()
+        restore = enqueue_task("restore", {"path": str(path)})
+        self.assertEqual(run_task(restore.pk), "done")
+        restore.refresh_from_db()
+        self.assertEqual(OduncKaydi.objects.count(), 12)
+        self.assertEqual(restore.progress["phase"], "yukleme")
+        self.assertEqual(restore.progress["loaded"], restore.result["total"])
+        # Görev tablosu yedeğe girmez, geri yüklemede silinmez
+        self.assertTrue(BackgroundTask.objects.filter(pk=backup.pk).exists())
+
+    def test_failed_task_records_error(self):
+        task = enqueue_task("restore", {"path": str(self.tmpdir / "yok.jsonl.gz")})
+        with self.assertLogs("kutuphane_app.tasks", level="ERROR"):
+            self.assertEqual(run_task(task.pk), "failed")
+        task.refresh_from_db()
+        self.assertEqual(task.status, "failed")
+        self.assertIn("RestoreError", task.error)
+
+    def test_worker_command_drains_queue_and_api_reports(self):
+        task = enqueue_task("overdue")
+        out = io.StringIO()
+        call_command("run_task_worker", "--once", "--processes", "0", stdout=out)
+        self.assertIn(f"Görev #{task.pk}: done", out.getvalue())
+        task.refresh_from_db()
+        run = ScheduledJobRun.objects.get(pk=task.result["run_id"])
+        self.assertEqual((run.status, run.rows), ("ok", overdue_rows(task.result)))
+
+        self.assertEqual(self.client.get("/api/tasks/").status_code, 403)
+        self.user.is_staff = True
+        self.user.save(update_fields=["is_staff"])
+        response = self.client.get("/api/tasks/", {"status": "done", "kind": "overdue"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.data], [task.pk])
+        self.assertEqual(response.data[0]["status_display"], "Tamamlandı")
+
+
+@isolated_cache
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        ogrenciler, _ = build_circulation_fixture(students=3, loans_per_student=4)
+        for ogrenci in ogrenciler:
+            Ogrenci.objects.filter(pk=ogrenci.pk).update(eposta=f"{ogrenci.ogrenci_no}@okul.test")
+        NotificationSettings.get_solo()
+        NotificationSettings.objects.update(email_sender="kutuphane@okul.test")
+
+    def test_queue_is_idempotent_per_due_date(self):
+        self.assertEqual(queue_notifications("email", ["overdue"]), {"overdue": 6})
+        self.assertEqual(queue_notifications("email", ["overdue"]), {"overdue": 0})
+        row = NotificationOutbox.objects.select_related("odunc__ogrenci").first()
+        self.assertEqual(row.recipient, row.odunc.ogrenci.eposta)
+        self.assertIn("Sefiller", row.subject)
+        self.assertIn("gün gecikmiştir", row.body)
+
+        # İade tarihi uzatılan ödünç yeni tarih için yeniden bildirilir
+        OduncKaydi.objects.filter(pk=row.odunc_id).update(iade_tarihi=F("iade_tarihi") - timedelta(days=1))
+        self.assertEqual(queue_notifications("email", ["overdue"]), {"overdue": 1})
+
+    def test_concurrent_queue_counts_only_its_own_rows(self):
+        insert_outbox = notifications._insert_outbox
+
+        def racing_insert(rows):
+            # Eşzamanlı bir çalıştırma ilk iki bildirimi araya girip kuyruğa alır
+            NotificationOutbox.objects.bulk_create(
+                NotificationOutbox(
+                    odunc_id=row.odunc_id, channel=row.channel, message_type=row.message_type,
+                    due_date=row.due_date, recipient=row.recipient,
+                )
+                for row in rows[:2]
+            )
+            return insert_outbox(rows)
+
+        with mock.patch("kutuphane_app.notifications._insert_outbox", side_effect=racing_insert):
+            self.assertEqual(queue_notifications("email", ["overdue"]), {"overdue": 4})
+        self.assertEqual(NotificationOutbox.objects.count(), 6)
+
+    def test_template_conditionals(self):
+        text = '{{#if rol == "Öğrenci" }}Sevgili {{ ogrenci_ad }}{{else}}Sayın {{ ogrenci_soyad }}{{/if}}, {{ eksik }}.'
+        template = compile_template(text)
+        self.assertEqual(template.render({"rol": "Öğrenci", "ogrenci_ad": "Ali"}), "Sevgili Ali, .")
+        self.assertEqual(template.render({"rol": "Personel", "ogrenci_soyad": "Kaya"}), "Sayın Kaya, .")
+        self.assertIs(compile_template(text), template)
+
+    def test_send_reuses_one_connection_per_batch(self):
+        queue_notifications("email", ["overdue"])
+        from django.core.mail import get_connection
+
+        with mock.patch("kutuphane_app.notifications.get_connection", wraps=get_connection) as factory:
+            totals = send_email_outbox(batch_size=4)
+        self.assertEqual(totals, {"sent": 6, "pending": 0, "failed": 0, "deferred": 0})
+        self.assertEqual(factory.call_count, 2)
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertEqual(mail.outbox[0].from_email, "kutuphane@okul.test")
+        self.assertFalse(NotificationOutbox.objects.exclude(status="sent").exists())
+        self.assertEqual(send_email_outbox(), {"sent": 0, "pending": 0, "failed": 0, "deferred": 0})
+
+    def test_transient_errors_retry_on_next_run(self):
+        queue_notifications("email", ["overdue"])
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=smtplib.SMTPServerDisconnected("kapandı"),
+        ):
+            totals = send_email_outbox()
+        # Aynı çalıştırmada yeniden alınmaz; deneme hakkı bitince kalıcı hata olur
+        self.assertEqual(totals, {"sent": 0, "pending": 6, "failed": 0, "deferred": 0})
+        self.assertEqual(set(NotificationOutbox.objects.values_list("attempts", flat=True)), {1})
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=smtplib.SMTPRecipientsRefused({}),
+        ):
+            self.assertEqual(send_email_outbox(limit=2)["failed"], 2)
+        self.assertEqual(send_email_outbox()["sent"], 4)
+
+    def test_temporary_smtp_replies_are_retried(self):
+        queue_notifications("email", ["overdue"])
+        errors = [
+            smtplib.SMTPDataError(451, b"greylisted"),
+            smtplib.SMTPSenderRefused(452, b"too many messages", "kutuphane@okul.test"),
+            smtplib.SMTPRecipientsRefused({"a@okul.test": (450, b"mailbox busy")}),
+            smtplib.SMTPDataError(554, b"rejected"),
+            smtplib.SMTPRecipientsRefused({"b@okul.test": (550, b"no such user")}),
+            None,
+        ]
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=errors
+        ):
+            totals = send_email_outbox()
+        self.assertEqual(totals, {"sent": 1, "pending": 3, "failed": 2, "deferred": 0})
+
+    def test_run_stops_at_time_cap(self):
+        queue_notifications("email", ["overdue"])
+        NotificationSettings.objects.update(email_rate_per_minute=1)
+        now = [0.0]
+        totals = send_email_outbox(
+            batch_size=4, max_seconds=150, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s)
+        )
+        # Dakikada bir ileti: 0, 60 ve 120. saniyelerde gönderilir, kalanlar kuyrukta bekler
+        self.assertEqual(totals, {"sent": 3, "pending": 0, "failed": 0, "deferred": 1})
+        self.assertEqual(
+            set(NotificationOutbox.objects.values_list("status", "attempts")), {("pending", 0), ("sent", 1)}
+        )
+        self.assertEqual(NotificationOutbox.objects.filter(status="pending").count(), 3)
+
+    def test_rate_limiter_spaces_sends(self):
+        clock = iter([0.0, 0.2, 1.5, 1.5])
+        sleeps = []
+        limiter = SendRateLimiter(60, clock=lambda: next(clock), sleep=sleeps.append)
+        for _ in range(4):
+            limiter.wait()
+        self.assertEqual(sleeps, [0.8, 0.5, 1.5])
+        unlimited = SendRateLimiter(0, sleep=sleeps.append)
+        unlimited.wait()
+        self.assertEqual(len(sleeps), 3)
+
+    def test_dispatch_reports_queue_and_delivery(self):
+        result = dispatch_notifications("email", ["overdue"])
+        self.assertEqual((result["queued"], result["sent"], result["failed"]), (6, 6, 0))
+        self.assertEqual(result["queued_by_type"], {"overdue": 6})
+        self.assertEqual(dispatch_notifications("mobile", ["overdue"])["queued"], 0)
+
+
+@isolated_cache
+class SmsDispatchTests(TestCase):
+    def setUp(self):
+        ogrenciler, _ = build_circulation_fixture(students=3, loans_per_student=4)
+        for ogrenci in ogrenciler:
+            Ogrenci.objects.filter(pk=ogrenci.pk).update(telefon=f"0555 000 {ogrenci.ogrenci_no}")
+        self.ogrenciler = ogrenciler
+        NotificationSettings.get_solo()
+        NotificationSettings.objects.update(sms_api_key="gizli")
+        self.gateway = MockSmsGateway(api_key="gizli").start()
+        self.addCleanup(self.gateway.stop)
+        self.sleeps = []
+
+    def _client(self, url=None, **kwargs):
+        kwargs.setdefault("proxy", False)
+        return SmsGatewayClient(url or self.gateway.url, "gizli", sleep=self.sleeps.append, **kwargs)
+
+    def test_dispatch_delivers_over_kept_alive_connections(self):
+        NotificationSettings.objects.update(sms_api_url=self.gateway.url)
+        with override_settings(SMS_CONCURRENCY=2):
+            result = dispatch_notifications("sms", ["overdue"])
+        self.assertEqual((result["queued"], result["sent"], result["failed"]), (6, 6, 0))
+        self.assertEqual(self.gateway.requests, 6)
+        self.assertLessEqual(len(self.gateway.connections), 2)
+        self.assertEqual(
+            sorted(message["reference"] for message in self.gateway.messages),
+            sorted(str(pk) for pk in NotificationOutbox.objects.values_list("pk", flat=True)),
+        )
+        self.assertFalse(NotificationOutbox.objects.exclude(status="sent").exists())
+
+    def test_transient_statuses_are_retried_with_backoff(self):
+        queue_notifications("sms", ["overdue"])
+        self.gateway.fail_statuses.extend([503, 429])
+        totals = send_sms_outbox(client=self._client(concurrency=1, backoff=0.5))
+        self.assertEqual(totals, {"sent": 6, "pending": 0, "failed": 0})
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0.25 <= self.sleeps[0] <= 0.5 and 0.5 <= self.sleeps[1] <= 1.0)
+
+    def test_rejected_number_fails_permanently(self):
+        Ogrenci.objects.filter(pk=self.ogrenciler[0].pk).update(telefon="yok")
+        queue_notifications("sms", ["overdue"])
+        totals = send_sms_outbox(client=self._client())
+        self.assertEqual(totals, {"sent": 4, "pending": 0, "failed": 2})
+        failed = NotificationOutbox.objects.filter(status="failed")
+        self.assertEqual({row.recipient for row in failed}, {"yok"})
+        self.assertTrue(all(row.last_error.startswith("HTTP 400") for row in failed))
+        self.assertEqual(self.sleeps, [])
+
+    def test_unreachable_gateway_keeps_rows_queued(self):
+        queue_notifications("sms", ["overdue"])
+        closed = MockSmsGateway()
+        url = closed.url
+        closed.server_close()
+        totals = send_sms_outbox(client=self._client(url, retries=1))
+        self.assertEqual(totals, {"sent": 0, "pending": 6, "failed": 0})
+        self.assertEqual(set(NotificationOutbox.objects.values_list("status", "attempts")), {("pending", 1)})
+
+        # Ağ geçidi adresi yoksa satırlar alınmadan kuyrukta bekler
+        self.assertEqual(send_sms_outbox(), {"sent": 0, "pending": 0, "failed": 0})
+        self.assertEqual(set(NotificationOutbox.objects.values_list("attempts", flat=True)), {1})
+
+    def test_read_timeout_is_not_resent(self):
+        # İstek ağ geçidine ulaştı ama yanıt gecikti: ileti gitmiş olabilir
+        self.gateway.latency = 0.3
+        results = self._client(timeout=0.1, retries=2).send_all([(1, "05550001111", "Merhaba")])
+        self.assertFalse(results[0].ok)
+        self.assertTrue(results[0].permanent)
+        self.assertEqual(results[0].attempts, 1)
+        self.assertEqual(self.gateway.requests, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_plain_http_proxy_and_header_injection(self):
+        host, port = self.gateway.server_address[:2]
+        # Ağ geçidi adı çözülemez; istek vekile mutlak adresle gider
+        client = self._client("http://sms.invalid/send", proxy=(host, port, None))
+        results = client.send_all([(1, "05550001111", "Merhaba")])
+        self.assertTrue(results[0].ok)
+        self.assertEqual(self.gateway.messages[0]["to"], "05550001111")
+
+        with self.assertRaises(ValueError):
+            SmsGatewayClient(self.gateway.url, "gizli\r\nX-Ek: 1")
+
+
+class LoanRowListingTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        build_circulation_fixture(students=10, loans_per_student=20)
+
+    def test_rows_are_flat_paginated_and_constant(self):
+        response = self.assertQueryBudget(
+            6, "get", "/api/oduncler/rows/", data={"durum": "oduncte,gecikmis", "page_size": 40}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data["results"]), 40)
+        self.assertIsNotNone(data["next"])
+        row = data["results"][0]
+        self.assertEqual(row["durum"], "gecikmis")
+        self.assertTrue(row["is_overdue"])
+        self.assertFalse(row["grace_alert"])
+        self.assertIn("effective_iade_tarihi", row)
+        self.assertNotIsInstance(row.get("ogrenci_ad"), dict)
+
+        seen = {r["id"] for r in data["results"]}
+        url = data["next"]
+        while url:
+            page = self.client.get(url).json()
+            seen.update(r["id"] for r in page["results"])
+            url = page["next"]
+        self.assertEqual(len(seen), 100)
+
+    def test_grace_alert_comes_from_server_policy(self):
+        LoanPolicy.objects.update(delay_grace_days=3)
+        bump_policy_version()
+        loan = OduncKaydi.objects.filter(teslim_tarihi__isnull=True).first()
+        OduncKaydi.objects.filter(pk=loan.pk).update(
+            durum="oduncte", iade_tarihi=timezone.now() - timedelta(days=1)
+        )
+        rows = self.client.get("/api/oduncler/rows/", {"durum": "oduncte"}).json()["results"]
+        self.assertEqual(len(rows), 1)
+        self.assertTrue(rows[0]["grace_alert"])
+        self.assertFalse(rows[0]["is_overdue"])
+
+
+@isolated_cache
+class LoanPolicyCacheTests(TestCase):
+    def setUp(self):
+        bump_policy_version()
+
+    def test_snapshot_is_cached_until_policy_changes(self):
+        first = get_snapshot()
+        with self.assertNumQueries(0):
+            self.assertIs(get_snapshot(), first)
+            get_policy_payload()
+
+        policy = LoanPolicy.get_solo()
+        policy.default_duration = 21
+        with self.captureOnCommitCallbacks(execute=True):
+            policy.save()
+        self.assertEqual(get_snapshot().default_duration, 21)
+        self.assertEqual(get_policy_payload()["default_duration"], 21)
+
+    def test_role_policy_delete_invalidates(self):
+        rol = Rol.objects.create(ad="Öğretmen")
+        RoleLoanPolicy.objects.filter(role=rol).update(duration=30)
+        bump_policy_version()
+        self.assertEqual(get_snapshot().role_overrides[rol.id].duration, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            RoleLoanPolicy.objects.filter(role=rol).delete()
+        self.assertNotIn(rol.id, get_snapshot().role_overrides)
+
+    def test_payload_copies_are_independent(self):
+        payload = get_policy_payload()
+        payload["role_limits"] = ["x"]
+        self.assertNotIn("role_limits", get_policy_payload())
+
+
+class BookHistoryTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ogrenciler, self.nushalar = build_circulation_fixture(students=5, loans_per_student=10)
+        # Aynı nüshaya eski kayıtlar ekle; en son kaydı iptal olan bir nüsha da olsun
+        now = timezone.now()
+        OduncKaydi.objects.bulk_create(
+            OduncKaydi(
+                ogrenci=self.ogrenciler[i % 5],
+                kitap_nusha=self.nushalar[0],
+                iade_tarihi=now - timedelta(days=100 + i),
+                teslim_tarihi=now - timedelta(days=99 + i),
+                durum="teslim",
+            )
+            for i in range(25)
+        )
+        OduncKaydi.objects.filter(kitap_nusha=self.nushalar[0], durum="teslim").update(
+            odunc_tarihi=F("iade_tarihi") - timedelta(days=15)
+        )
+        OduncKaydi.objects.filter(kitap_nusha=self.nushalar[1]).update(durum="iptal")
+
+    def test_copy_list_uses_fixed_queries(self):
+        response = self.assertQueryBudget(5, "get", f"/api/book-history/{self.nushalar[0].barkod}/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data["all_copies"]), 50)
+        first = data["all_copies"][0]
+        self.assertTrue(first["aktif"])
+        self.assertEqual(first["durum"], "gecikmis")
+        self.assertEqual(first["ogrenci"], "Ad0 Soyad0")
+        cancelled = next(c for c in data["all_copies"] if c["barkod"] == self.nushalar[1].barkod)
+        self.assertEqual(cancelled["durum"], "kütüphanede")
+        self.assertEqual(len(data["history"]), 26)
+        self.assertIsNone(data["history_next"])
+
+    def test_history_keyset_pages(self):
+        url = f"/api/book-history/{self.nushalar[0].barkod}/"
+        collected = []
+        cursor = None
+        while True:
+            params = {"history_limit": 7}
+            if cursor:
+                params["history_before"] = cursor
+            data = self.client.get(url, params).json()
+            collected.extend(data["history"])
+            cursor = data["history_next"]
+            if not cursor:
+                break
+        self.assertEqual(len(collected), 26)
+        dates = [rec["odunc_tarihi"] for rec in collected]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+
+@isolated_cache
+class StreamingBackupTests(TestCase):
+    def setUp(self):
+        build_circulation_fixture(students=5, loans_per_student=10)
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def test_backup_manifest_matches_stream(self):
+        path = self.tmpdir / "backup_test.jsonl.gz"
+        streamed = b"".join(stream_backup(path, chunk_size=7))
+        self.assertEqual(streamed, path.read_bytes())
+        self.assertFalse((self.tmpdir / "backup_test.jsonl.gz.partial").exists())
+
+        manifest = json.loads(manifest_path_for(path).read_text(encoding="utf-8"))
+        counts = {entry["model"]: entry["count"] for entry in manifest["models"]}
+        self.assertEqual(counts["kutuphane_app.odunckaydi"], 50)
+        self.assertEqual(counts["kutuphane_app.kitapnusha"], 50)
+
+        raw = gzip.decompress(streamed)
+        self.assertEqual(hashlib.sha256(raw).hexdigest(), manifest["sha256"])
+        lines = raw.decode("utf-8").splitlines()
+        self.assertEqual(len(lines), manifest["total"])
+        models_in_order = list(dict.fromkeys(json.loads(line)["model"] for line in lines))
+        self.assertLess(
+            models_in_order.index("kutuphane_app.ogrenci"),
+            models_in_order.index("kutuphane_app.odunckaydi"),
+        )
+
+
+@isolated_cache
+class RestoreBackupTests(TestCase):
+    def setUp(self):
+        build_circulation_fixture(students=4, loans_per_student=6)
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.path = self.tmpdir / "backup_test.jsonl.gz"
+        for _ in stream_backup(self.path, chunk_size=5):
+            pass
+
+    def test_dry_run_validates_without_writing(self):
+        OduncKaydi.objects.all().delete()
+        result = restore_backup(self.path, dry_run=True, batch_size=7)
+        self.assertTrue(result["checksum_ok"])
+        self.assertEqual(result["models"]["kutuphane_app.odunckaydi"], 24)
+        self.assertEqual(OduncKaydi.objects.count(), 0)
+
+    def test_restore_round_trip_replaces_data(self):
+        expected_loans = set(OduncKaydi.objects.values_list("id", "gecikme_cezasi", "durum"))
+        OduncKaydi.objects.all().delete()
+        Ogrenci.objects.create(ogrenci_no="9999", ad="Geçici", soyad="Kayıt")
+        progress = []
+
+        result = restore_backup(self.path, batch_size=7, progress=progress.append)
+
+        self.assertFalse(result["dry_run"])
+        self.assertEqual(set(OduncKaydi.objects.values_list("id", "gecikme_cezasi", "durum")), expected_loans)
+        self.assertFalse(Ogrenci.objects.filter(ogrenci_no="9999").exists())
+        self.assertEqual(progress[-1]["loaded"], result["total"])
+        # Sequence sıfırlandı: yeni kayıt mevcut id'lerle çakışmaz
+        Ogrenci.objects.create(ogrenci_no="10000", ad="Yeni", soyad="Kayıt")
+
+    def test_restore_reads_legacy_json(self):
+        records = [json.loads(line) for line in gzip.decompress(self.path.read_bytes()).decode("utf-8").splitlines()]
+        legacy = self.tmpdir / "backup_legacy.json"
+        legacy.write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding="utf-8")
+        OduncKaydi.objects.all().delete()
+
+        result = restore_backup(legacy, batch_size=3)
+
+        self.assertIsNone(result["checksum_ok"])
+        self.assertEqual(OduncKaydi.objects.count(), 24)
+
+    def test_restore_rebuilds_search_text(self):
+        # Arama alanından önce alınmış yedekler: alan yok
+        records = [json.loads(line) for line in gzip.decompress(self.path.read_bytes()).decode("utf-8").splitlines()]
+        for record in records:
+            record["fields"].pop("arama_metni", None)
+        legacy = self.tmpdir / "backup_old.json"
+        legacy.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+
+        restore_backup(legacy)
+
+        self.assertEqual(Kitap.objects.get().arama_metni, "sefiller 9789750700000")
+
+    def test_truncated_legacy_json_is_rejected(self):
+        legacy = self.tmpdir / "backup_broken.json"
+        legacy.write_text('[{"model": "kutuphane_app.sinif", "pk": 1, "fields": {"ad": "9-A"}}, {"model"', encoding="utf-8")
+        with self.assertRaises(RestoreError):
+            restore_backup(legacy, dry_run=True)
+
+
+@isolated_cache
+class StudentArchiveTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.tmpdir)
+        media.enable()
+        self.addCleanup(media.disable)
+        ogrenciler, _ = build_circulation_fixture(students=7, loans_per_student=4)
+        eski = timezone.now() - timedelta(days=4 * 365)
+        Ogrenci.objects.filter(id__in=[o.id for o in ogrenciler[:5]]).update(aktif=False, pasif_tarihi=eski)
+
+    def _package_lines(self, batch):
+        with batch.json_dosya.open("rb") as fh:
+            return [json.loads(line) for line in gzip.decompress(fh.read()).decode("utf-8").splitlines()]
+
+    def test_archive_moves_candidates_in_chunks(self):
+        progress = []
+        result = archive_students(chunk_size=2, progress=progress.append)
+
+        self.assertEqual(result["students"], 5)
+        self.assertEqual(result["loans"], 20)
+        self.assertEqual([p["done"] for p in progress], [2, 4, 5])
+        self.assertEqual(Ogrenci.objects.count(), 2)
+        self.assertEqual(OduncKaydi.objects.count(), 8)
+
+        batch = ArsivBatch.objects.get(id=result["batch_id"])
+        self.assertTrue(batch.json_dosya.name.endswith(".jsonl.gz"))
+        self.assertEqual(ArsivOgrenci.objects.filter(batch=batch).count(), 5)
+        self.assertEqual(ArsivOdunc.objects.filter(batch=batch).count(), 20)
+
+        kinds = [line["type"] for line in self._package_lines(batch)]
+        self.assertEqual(kinds[0], "batch")
+        self.assertEqual(kinds.count("ogrenci"), 5)
+        self.assertEqual(kinds.count("odunc"), 20)
+        self.assertEqual(kinds.count("nusha"), 20)
+        self.assertEqual(kinds.count("kitap"), 1)
+
+    def test_admin_confirm_queues_large_periods(self):
+        admin_user = get_user_model().objects.create_superuser("yonetici", "y@okul.test", "x")
+        self.client.force_login(admin_user)
+        url = "/admin/kutuphane_app/ogrenci/arsiv_onayla/"
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.assertEqual(Ogrenci.objects.count(), 7)
+
+        with mock.patch("kutuphane_app.admin.SYNC_ARCHIVE_MAX_STUDENTS", 3):
+            response = self.client.post(url)
+        task = BackgroundTask.objects.get(kind="archive")
+        self.assertRedirects(response, f"/admin/system/tasks/{task.pk}/", fetch_redirect_response=False)
+        self.assertEqual(len(task.params["student_ids"]), 5)
+        # Taşıma worker'a kalır
+        self.assertEqual(Ogrenci.objects.count(), 7)
+
+    def test_archive_task_reports_progress(self):
+        ids = list(Ogrenci.objects.filter(aktif=False).values_list("id", flat=True))
+        task = enqueue_task("archive", {"student_ids": ids})
+        self.assertEqual(run_task(task.pk), "done")
+
+        task.refresh_from_db()
+        self.assertEqual((task.progress["done"], task.progress["total"]), (5, 5))
+        self.assertTrue(ArsivBatch.objects.filter(id=task.result["batch_id"]).exists())
+
+
+@isolated_cache
+class BulkStudentImportTests(TestCase):
+    def setUp(self):
+        self.sinif_a = Sinif.objects.create(ad="9-A")
+        self.sinif_b = Sinif.objects.create(ad="9-B")
+        Ogrenci.objects.create(ogrenci_no="100", ad="Eski", soyad="Ad", sinif=self.sinif_a)
+        Ogrenci.objects.create(ogrenci_no="200", ad="Giden", soyad="Öğrenci", sinif=self.sinif_a)
+
+    def _csv(self, rows):
+        lines = ["ogrenci_no;ad;soyad;sinif"] + [";".join(row) for row in rows]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def test_admin_upload_queues_large_lists(self):
+        admin_user = get_user_model().objects.create_superuser("yonetici", "y@okul.test", "x")
+        self.client.force_login(admin_user)
+        url = "/admin/kutuphane_app/ogrenci/toplu_ice_aktar/"
+        data = self._csv([("300", "Yeni", "Öğrenci", "9-B"), ("301", "Diğer", "Öğrenci", "9-B")])
+
+        self.client.post(url, {"csv_file": io.BytesIO(data), "pasifle": "1"})
+        self.assertTrue(Ogrenci.objects.filter(ogrenci_no="300").exists())
+        self.assertFalse(BackgroundTask.objects.exists())
+
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            with mock.patch("kutuphane_app.admin.SYNC_IMPORT_MAX_ROWS", 1):
+                response = self.client.post(url, {"csv_file": io.BytesIO(data), "pasifle": "1"})
+            task = BackgroundTask.objects.get(kind="import")
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(Path(task.params["path"]).exists())
+
+    def test_upserts_and_deactivates_missing(self):
+        data = self._csv([
+            ("100", "Yeni", "Ad", "9-B"),
+            ("300", "Ayşe", "Yılmaz", "9-A"),
+            ("400", "Ali", "Kaya", ""),
+            ("500", "Can", "Demir", "12-Z"),
+        ])
+        result = bulk_import_ogrenciler(data, batch_size=2)
+
+        self.assertEqual((result.created, result.updated, result.deactivated), (2, 1, 1))
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn("upsert", result.timings)
+        self.assertIn("total", result.timings)
+
+        guncel = Ogrenci.objects.get(ogrenci_no="100")
+        self.assertEqual((guncel.ad, guncel.sinif_id, guncel.aktif), ("Yeni", self.sinif_b.id, True))
+        giden = Ogrenci.objects.get(ogrenci_no="200")
+        self.assertFalse(giden.aktif)
+        self.assertIsNotNone(giden.pasif_tarihi)
+        self.assertIsNone(Ogrenci.objects.get(ogrenci_no="400").sinif_id)
+        self.assertFalse(Ogrenci.objects.filter(ogrenci_no="500").exists())
+
+    def test_rejected_row_keeps_student_active(self):
+        data = self._csv([
+            ("100", "Eski", "Ad", "9-A"),
+            ("200", "Giden", "Öğrenci", "10-Z"),
+        ])
+        result = bulk_import_ogrenciler(data, deactivate_missing=True)
+
+        self.assertEqual((result.updated, result.deactivated), (1, 0))
+        self.assertEqual(len(result.errors), 1)
+        ogrenci = Ogrenci.objects.get(ogrenci_no="200")
+        # Hatalı satır güncellenmez ama dosyada olduğu için pasiflenmez
+        self.assertEqual((ogrenci.aktif, ogrenci.sinif_id), (True, self.sinif_a.id))
+
+    def test_dry_run_rolls_back(self):
+        result = bulk_import_ogrenciler(self._csv([("300", "Ayşe", "Yılmaz", "9-A")]), dry_run=True)
+
+        self.assertEqual((result.created, result.deactivated), (1, 2))
+        self.assertFalse(Ogrenci.objects.filter(ogrenci_no="300").exists())
+        self.assertEqual(Ogrenci.objects.filter(aktif=True).count(), 2)
+
+    def test_resource_after_import_uses_staging_table(self):
+        resource = OgrenciResource()
+        resource.gelen_ogr_no = {"100"}
+        resource.after_import(None, None, True, False)
+        self.assertEqual(list(Ogrenci.objects.filter(aktif=True).values_list("ogrenci_no", flat=True)), ["100"])
+
+
+class BarcodeAllocationTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.kitap = Kitap.objects.create(baslik="Nutuk", isbn="9789750000001")
+        for barkod in ("KIT000007", "KIT000003", "KITABC", "X000099"):
+            KitapNusha.objects.create(kitap=self.kitap, barkod=barkod)
+
+    def test_sequence_seeds_from_existing_and_skips_taken_codes(self):
+        self.assertEqual(allocate_barcodes(), ["KIT000008"])
+        # Sayaçtan ileri elle girilmiş barkodlar atlanır
+        KitapNusha.objects.create(kitap=self.kitap, barkod="KIT000009")
+        KitapNusha.objects.create(kitap=self.kitap, barkod="KIT000011")
+        self.assertEqual(allocate_barcodes(count=2), ["KIT000010", "KIT000012"])
+        self.assertEqual(BarcodeSequence.objects.get(prefix="KIT").last_value, 12)
+
+    def test_serializer_create_uses_allocator_without_scanning(self):
+        allocate_barcodes()  # sayaç oluşturuldu
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/nushalar/", {"kitap_id": self.kitap.id, "barkod": ""}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["barkod"], "KIT000009")
+        self.assertFalse(any("LIKE" in q["sql"] for q in ctx.captured_queries))
+
+    def test_endpoint_peeks_and_reserves_blocks(self):
+        response = self.client.get("/api/barcodes/next/", {"prefix": "KIT"})
+        self.assertEqual(response.data["next"], "KIT000008")
+
+        response = self.client.post("/api/barcodes/next/", {"prefix": "KIT", "count": 2}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["codes"], ["KIT000008", "KIT000009"])
+
+        response = self.client.post("/api/barcodes/next/", {"prefix": "K T", "count": 1}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogSearchTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.yazar = Yazar.objects.create(ad_soyad="Sabahattin Ali")
+        self.kuyucakli = Kitap.objects.create(baslik="Kuyucaklı Yusuf", yazar=self.yazar, isbn="978-975-08-0001-1")
+        self.isik = Kitap.objects.create(baslik="IŞIK VE GÖLGE", isbn="9786050000002")
+        Kitap.objects.create(baslik="Çalıkuşu", isbn="9789750000003")
+        KitapNusha.objects.create(kitap=self.isik, barkod="KIT000001")
+
+    def test_turkish_case_and_accent_folding(self):
+        self.assertEqual(normalize_search_text("IŞIK"), "isik")
+        self.assertEqual(normalize_search_text("İstanbul'da ÇAĞ"), "istanbul da cag")
+        self.assertEqual(self.isik.arama_metni, "isik ve golge 9786050000002")
+
+    def test_search_matches_title_author_isbn_prefix_and_typos(self):
+        def ids(query):
+            return [kitap.id for kitap in search_books(query)[0]]
+
+        self.assertEqual(ids("ışık"), [self.isik.id])
+        self.assertEqual(ids("sabahattin"), [self.kuyucakli.id])
+        self.assertEqual(ids("9789750800011"), [self.kuyucakli.id])
+        self.assertEqual(ids("kuyu"), [self.kuyucakli.id])
+        self.assertEqual(ids("kuyucakli yusf"), [self.kuyucakli.id])
+        self.assertEqual(ids("calikusu"), [Kitap.objects.get(baslik="Çalıkuşu").id])
+
+    def test_author_rename_refreshes_search_text(self):
+        self.yazar.ad_soyad = "S. Ali"
+        self.yazar.save()
+        self.kuyucakli.refresh_from_db()
+        self.assertIn("s ali", self.kuyucakli.arama_metni)
+        self.assertEqual(search_books("sabahattin")[0], [])
+
+    def test_endpoint_pages_ranked_results(self):
+        response = self.client.get("/api/kitaplar/ara/", {"q": "ISIK", "limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["id"], self.isik.id)
+        self.assertEqual(response.data["results"][0]["nusha_sayisi"], 1)
+        self.assertFalse(response.data["has_more"])
+
+        Kitap.objects.create(baslik="Işık Yılı")
+        response = self.client.get("/api/kitaplar/ara/", {"q": "ışık", "limit": 1})
+        self.assertTrue(response.data["has_more"])
+        response = self.client.get("/api/kitaplar/ara/", {"q": "ışık", "limit": 1, "offset": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertFalse(response.data["has_more"])
+
+        response = self.client.get("/api/kitaplar/", {"q": "gölge"})
+        self.assertEqual([row["id"] for row in response.data], [self.isik.id])
+
+
+class InventoryScanTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        kitap = Kitap.objects.create(baslik="Sefiller")
+        KitapNusha.objects.bulk_create(
+            KitapNusha(kitap=kitap, barkod=f"KIT{n:06d}", raf_kodu=f"A{n % 3}") for n in range(1, 21)
+        )
+        response = self.client.post("/api/inventory-sessions/", {"name": "Yıl sonu"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.session = InventorySession.objects.get(pk=response.data["id"])
+        self.url = f"/api/inventory-sessions/{self.session.id}/"
+
+    def test_session_snapshot_is_a_single_insert_select(self):
+        self.assertEqual(self.session.total_items, 20)
+        item = InventoryItem.objects.get(session=self.session, barkod="KIT000004")
+        self.assertEqual((item.kitap_baslik, item.raf_kodu, item.durum, item.seen, item.note),
+                         ("Sefiller", "A1", "mevcut", False, ""))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                "/api/inventory-sessions/", {"name": "Raf A0", "filters": {"raf_prefix": "A0"}}, format="json"
+            )
+        self.assertEqual(response.data["total_items"], 6)
+        inserts = [q["sql"] for q in ctx.captured_queries if "inventoryitem" in q["sql"].lower()]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn("SELECT", inserts[0])
+
+        response = self.client.post(
+            "/api/inventory-sessions/", {"name": "Boş", "filters": {"raf_prefix": "Z"}}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(InventorySession.objects.filter(name="Boş").exists())
+
+    def test_items_keyset_pages_cover_all_rows_once(self):
+        self.client.post(self.url + "mark-bulk/", {"barkodlar": ["KIT000005", "KIT000010"]}, format="json")
+        expected = list(
+            InventoryItem.objects.filter(session=self.session)
+            .order_by("-seen", "raf_kodu", "barkod", "id").values_list("barkod", flat=True)
+        )
+        seen, cursor = [], None
+        while True:
+            params = {"status": "all", "limit": 6}
+            if cursor:
+                params["cursor"] = cursor
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(self.url + "items/", params)
+            self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+            self.assertEqual(response.data["count"], 20)
+            seen.extend(row["barkod"] for row in response.data["results"])
+            cursor = response.data["next"]
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
+        self.assertEqual(seen[:2], ["KIT000010", "KIT000005"])
+
+    def test_items_prefix_search_on_barcode_and_shelf(self):
+        response = self.client.get(self.url + "items/", {"q": "kit00001", "count": "exact"})
+        self.assertEqual(sorted(row["barkod"] for row in response.data["results"]),
+                         [f"KIT0000{n}" for n in range(10, 20)])
+        self.assertEqual((response.data["count"], response.data["count_exact"]), (10, True))
+
+        response = self.client.get(self.url + "items/", {"q": "A2", "status": "all"})
+        self.assertEqual(len(response.data["results"]), 7)
+        self.assertFalse(response.data["count_exact"])
+
+    def test_mark_updates_counter_without_counting_items(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url + "mark/", {"barkod": "KIT000001"}, format="json")
+        self.assertTrue(response.data["seen"])
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+
+        self.client.post(self.url + "mark/", {"barkod": "KIT000001"}, format="json")
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.seen_items, 1)
+
+        self.client.post(self.url + "mark/", {"barkod": "KIT000001", "seen": False}, format="json")
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.seen_items, 0)
+
+    def test_mark_bulk_reports_per_barcode_results(self):
+        self.client.post(self.url + "mark/", {"barkod": "KIT000002"}, format="json")
+        codes = ["KIT000001", "KIT000002", "YOK123", "KIT000003", "KIT000001"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url + "mark-bulk/", {"barkodlar": codes}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+        self.assertEqual(
+            [row["result"] for row in response.data["results"]],
+            ["seen", "already_seen", "unknown", "seen", "already_seen"],
+        )
+        self.assertEqual(response.data["marked"], 2)
+        self.assertEqual(response.data["session"]["seen_items"], 3)
+        self.assertEqual(InventoryItem.objects.filter(session=self.session, seen=True).count(), 3)
+
+        response = self.client.post(self.url + "mark-bulk/", {"barkodlar": "KIT000001"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class InventoryReconciliationTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        kitap = Kitap.objects.create(baslik="Nutuk")
+        self.nushalar = KitapNusha.objects.bulk_create(
+            KitapNusha(kitap=kitap, barkod=f"KIT{n:06d}", raf_kodu="A1") for n in range(1, 9)
+        )
+        KitapNusha.objects.create(kitap=kitap, barkod="DIS000001", raf_kodu="B1")
+        response = self.client.post(
+            "/api/inventory-sessions/", {"name": "A rafı", "filters": {"raf_prefix": "A"}}, format="json"
+        )
+        self.url = f"/api/inventory-sessions/{response.data['id']}/"
+        ogrenci = Ogrenci.objects.create(ad="Ali", soyad="Kaya", ogrenci_no="501")
+        OduncKaydi.objects.create(ogrenci=ogrenci, kitap_nusha=self.nushalar[0], durum="oduncte",
+                                  iade_tarihi=timezone.now() + timedelta(days=7))
+        KitapNusha.objects.filter(barkod="KIT000002").update(durum="kayip")
+        self.client.post(self.url + "mark-bulk/", {
+            "barkodlar": ["KIT000001", "KIT000002", "KIT000003", "DIS000001", "YOK999"],
+        }, format="json")
+        self.client.post(self.url + "mark/", {"barkod": "YOK998"}, format="json")
+
+    def test_summary_and_paged_categories(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url + "reconciliation/")
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+        self.assertEqual(response.data["summary"], {
+            "missing": 5,
+            "seen_on_loan": 1,
+            "seen_lost_damaged": 1,
+            "out_of_scope": 1,
+            "unknown_barcode": 2,
+        })
+
+        response = self.client.get(self.url + "reconciliation/", {"category": "missing", "limit": 3})
+        first = [row["barkod"] for row in response.data["results"]]
+        response = self.client.get(
+            self.url + "reconciliation/", {"category": "missing", "limit": 3, "after": response.data["next"]}
+        )
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(first + [row["barkod"] for row in response.data["results"]],
+                         [f"KIT00000{n}" for n in range(4, 9)])
+
+        response = self.client.get(self.url + "reconciliation/", {"category": "seen_on_loan"})
+        self.assertEqual([row["barkod"] for row in response.data["results"]], ["KIT000001"])
+        response = self.client.get(self.url + "reconciliation/", {"category": "yok"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_csv_stream(self):
+        response = self.client.get(self.url + "reconciliation/csv/")
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(lines[0], "kategori,barkod,kitap_baslik,raf_kodu,katalog_durumu,seen_at")
+        self.assertEqual(len(lines), 1 + 5 + 1 + 1 + 1 + 2)
+        self.assertIn("seen_lost_damaged,KIT000002,Nutuk,A1,kayip,", "\n".join(lines))
+
+
+class AuditLogBulkTests(ApiTestCase):
+    def test_bulk_ingest_is_idempotent_per_client_id(self):
+        entries = [
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000001", "islem": "Ödünç", "detay": "KIT000001",
+             "zaman": "2026-10-01T09:30:00+03:00"},
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000002", "islem": "İade"},
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000002", "islem": "İade"},
+            {"client_id": "gecersiz", "islem": "Ceza"},
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000003", "islem": " "},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/logs/bulk/", {"entries": entries}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in ctx.captured_queries if q["sql"].startswith("INSERT")]), 1)
+        self.assertEqual((response.data["created"], response.data["duplicates"]), (2, 0))
+        self.assertEqual([row["index"] for row in response.data["rejected"]], [3, 4])
+
+        log = AuditLog.objects.get(client_id="6f1c2a9e-0000-4000-8000-000000000001")
+        self.assertEqual((log.kullanici, log.detay), (self.user, "KIT000001"))
+        self.assertEqual(log.istemci_zamani.isoformat(), "2026-10-01T06:30:00+00:00")
+
+        # Yanıtı alamayan istemci aynı partiyi yeniden gönderir
+        response = self.client.post("/api/logs/bulk/", entries[:3], format="json")
+        self.assertEqual((response.data["created"], response.data["duplicates"]), (0, 2))
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+        response = self.client.post("/api/logs/bulk/", {"entries": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_concurrent_resend_is_not_counted_as_created(self):
+        entries = [
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000021", "islem": "Ödünç"},
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000022", "islem": "İade"},
+        ]
+        insert_logs = audit._insert_logs
+
+        def racing_insert(logs):
+            # Aynı partinin eşzamanlı gönderimi ilk kaydı denetimden sonra yazar
+            AuditLog.objects.create(client_id=entries[0]["client_id"], islem="Ödünç")
+            return insert_logs(logs)
+
+        with mock.patch("kutuphane_app.audit._insert_logs", side_effect=racing_insert):
+            response = self.client.post("/api/logs/bulk/", {"entries": entries}, format="json")
+        self.assertEqual((response.data["created"], response.data["duplicates"]), (1, 1))
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    def test_author_is_always_the_requester(self):
+        get_user_model().objects.create_user(username="mudur", password="x", is_staff=True)
+        entries = [
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000011", "islem": "İade", "kullanici": "mudur"},
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000012", "islem": "İade", "kullanici": "silinmis"},
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000013", "islem": "İade", "kullanici": ""},
+            {"client_id": "6f1c2a9e-0000-4000-8000-000000000014", "islem": "Ödünç"},
+        ]
+        response = self.client.post("/api/logs/bulk/", {"entries": entries}, format="json")
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([row["index"] for row in response.data["rejected"]], [1, 2])
+        # Bildirilen ad yalnızca bilgi olarak saklanır; yazar isteği yapan kullanıcıdır
+        self.assertEqual(
+            set(AuditLog.objects.values_list("kullanici", "istemci_kullanici")),
+            {(self.user.pk, "mudur"), (self.user.pk, "")},
+        )
+
+
+class StatsRollupTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        ogrenciler, nushalar = build_circulation_fixture(students=3, loans_per_student=4)
+        self.ogrenciler = ogrenciler
+        roman = Kategori.objects.create(ad="Roman")
+        Kitap.objects.update(kategori=roman)
+        self.kitap2 = Kitap.objects.create(baslik="Çalıkuşu", kategori=roman)
+        # İlk öğrenci ikinci kitaptan 3 kez daha okumuş olsun
+        extra = KitapNusha.objects.bulk_create(
+            KitapNusha(kitap=self.kitap2, barkod=f"EK{n}") for n in range(3)
+        )
+        OduncKaydi.objects.bulk_create(
+            OduncKaydi(ogrenci=ogrenciler[0], kitap_nusha=n, iade_tarihi=timezone.now(), durum="teslim")
+            for n in extra
+        )
+        OduncKaydi.objects.update(odunc_tarihi=timezone.now() - timedelta(days=10))
+
+    def test_incremental_refresh_matches_full_counts(self):
+        first = refresh_loan_rollups()
+        self.assertEqual(first["processed"], 15)
+        self.assertEqual(refresh_loan_rollups()["processed"], 0)
+
+        OduncKaydi.objects.create(
+            ogrenci=self.ogrenciler[1], kitap_nusha=KitapNusha.objects.get(barkod="EK0"),
+            iade_tarihi=timezone.now(),
+        )
+        OduncKaydi.objects.filter(id=OduncKaydi.objects.latest("id").id).update(
+            odunc_tarihi=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(refresh_loan_rollups(batch_size=2)["processed"], 1)
+
+        totals = dict(
+            LoanStatRollup.objects.filter(dimension=LoanStatRollup.DIMENSION_STUDENT)
+            .values_list("key").annotate(s=Sum("loan_count"))
+        )
+        self.assertEqual(totals, {self.ogrenciler[0].id: 7, self.ogrenciler[1].id: 5, self.ogrenciler[2].id: 4})
+
+        rebuilt = rebuild_loan_rollups()
+        self.assertEqual(rebuilt["processed"], 16)
+
+    def test_endpoints_read_rollups_without_scanning_loans(self):
+        refresh_loan_rollups()
+        loan_table = OduncKaydi._meta.db_table
+        with CaptureQueriesContext(connection) as ctx:
+            top = self.client.get("/api/istatistik/en_cok_okuyan_ogrenci/").data
+            kitaplar = self.client.get("/api/istatistik/en_cok_okunan_kitaplar/", {"limit": 1}).data
+            kategoriler = self.client.get("/api/istatistik/kategori_dagilimi/").data
+            trend = self.client.get("/api/istatistik/odunc_trend/").data
+        self.assertFalse(any(loan_table in q["sql"] for q in ctx.captured_queries))
+
+        self.assertEqual(top["okunan_sayi"], 7)
+        self.assertEqual(kitaplar, [{"kitap": "Sefiller", "okunma": 12}])
+        self.assertEqual(kategoriler, [{"ad": "Roman", "okunma": 15}])
+        self.assertEqual(sum(row["sayi"] for row in trend), 15)
+
+
+    def test_stale_rollups_refresh_in_background(self):
+        started = []
+        with mock.patch("kutuphane_app.jobs.start_in_background", side_effect=lambda *a: started.append(a)):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get("/api/istatistik/en_cok_okuyan_ogrenci/")
+            # İstek eldeki (boş) toplamlarla döner; yenileme isteği bekletmez
+            self.assertEqual(response["X-Stats-Stale"], "1")
+            self.assertEqual(response.data["okunan_sayi"], 0)
+            self.assertEqual(len(started), 1)
+            # Yenileme sürerken gelen istekler ikinci bir yenileme başlatmaz
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get("/api/istatistik/odunc_trend/")
+            self.assertEqual(len(started), 1)
+
+        func, *args = started[0]
+        func(*args)
+        response = self.client.get("/api/istatistik/en_cok_okuyan_ogrenci/")
+        self.assertEqual(response["X-Stats-Stale"], "0")
+        self.assertEqual(response.data["okunan_sayi"], 7)
+
+
+class DashboardTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        build_circulation_fixture(students=4, loans_per_student=4)
+        diger = Sinif.objects.create(ad="10-B")
+        Ogrenci.objects.filter(ogrenci_no="1003").update(sinif=diger)
+        self.diger = diger
+        OduncKaydi.objects.update(odunc_tarihi=timezone.now() - timedelta(days=3))
+
+    def test_dashboard_computes_all_metrics_with_fixed_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get("/api/istatistik/dashboard/").data
+        # oturum + özet + aylık + 5 gruplu sıralama
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+
+        ozet = data["ozet"]
+        self.assertEqual(ozet["toplam_odunc"], 16)
+        self.assertEqual(ozet["geciken"], 8)
+        self.assertEqual(ozet["teslim_edilen"], 8)
+        self.assertEqual(ozet["okuyan_ogrenci"], 4)
+        self.assertEqual(ozet["odenmemis_ceza"], "48.00")
+        self.assertEqual(sum(row["odunc"] for row in data["aylik"]), 16)
+        self.assertEqual({row["sinif"]: row["okunan"] for row in data["sinif_dagilimi"]}, {"9-A": 12, "10-B": 4})
+        self.assertEqual(data["en_cok_okunan_kitaplar"][0]["okunma"], 16)
+
+    def test_dashboard_filters_and_caches(self):
+        params = {"sinif_id": self.diger.id, "baslangic": (timezone.localdate() - timedelta(days=7)).isoformat()}
+        first = self.client.get("/api/istatistik/dashboard/", params).data
+        self.assertEqual(first["ozet"]["toplam_odunc"], 4)
+
+        OduncKaydi.objects.all().delete()
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get("/api/istatistik/dashboard/", params).data
+        self.assertEqual(cached["ozet"]["toplam_odunc"], 4)
+        self.assertFalse(any(OduncKaydi._meta.db_table in q["sql"] for q in ctx.captured_queries))
+
+        future = {"baslangic": (timezone.localdate() + timedelta(days=1)).isoformat()}
+        self.assertEqual(self.client.get("/api/istatistik/dashboard/", future).data["ozet"]["toplam_odunc"], 0)
+        self.assertEqual(self.client.get("/api/istatistik/dashboard/", {"bitis": "dün"}).status_code, 400)
+
+
+@isolated_cache
+class QueryPlanRegressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ogrenciler, nushalar = build_circulation_fixture(students=60, loans_per_student=40)
+        # Gerçekçi dağılım: geçmiş (teslim edilmiş) kayıtlar açık kayıtlardan çok daha fazla
+        now = timezone.now()
+        OduncKaydi.objects.bulk_create(
+            (
+                OduncKaydi(
+                    ogrenci=ogrenciler[i % len(ogrenciler)],
+                    kitap_nusha=nushalar[i % len(nushalar)],
+                    iade_tarihi=now - timedelta(days=400 - i % 300),
+                    teslim_tarihi=now - timedelta(days=390 - i % 300),
+                    durum="teslim",
+                    gecikme_cezasi_odendi=True,
+                )
+                for i in range(5000)
+            ),
+            batch_size=1000,
+        )
+        AuditLog.objects.bulk_create(AuditLog(islem=f"islem {i}") for i in range(500))
+
+    def test_hot_queries_avoid_sequential_scans(self):
+        results = check_query_plans()
+        self.assertEqual(set(results), set(HOT_QUERIES))
+        regressions = {
+            name: result["plan"] for name, result in results.items() if result["seq_scans"]
+        }
+        self.assertEqual(regressions, {}, "Sıralı taramaya dönen planlar:\n" + "\n".join(
+            f"{name}:\n{plan}" for name, plan in regressions.items()
+        ))
+
+    def test_missing_index_is_reported(self):
+        # İndeksi olmayan bir sıralama regresyon olarak yakalanmalı
+        unindexed = (lambda ids: AuditLog.objects.order_by("islem")[:50], (AuditLog._meta.db_table,))
+        with mock.patch.dict(HOT_QUERIES, {"audit_log_by_action": unindexed}):
+            result = check_query_plans(names={"audit_log_by_action"})["audit_log_by_action"]
+        self.assertEqual(result["seq_scans"], [AuditLog._meta.db_table], result["plan"])
+
+    def test_seq_scan_detection(self):
+        self.assertEqual(seq_scanned_tables("Seq Scan on kutuphane_app_odunckaydi  (cost=0..1)", "postgresql"),
+                         {"kutuphane_app_odunckaydi"})
+        self.assertEqual(seq_scanned_tables("2 0 0 SCAN kutuphane_app_odunckaydi", "sqlite"),
+                         {"kutuphane_app_odunckaydi"})
+        self.assertEqual(seq_scanned_tables("2 0 0 SCAN kutuphane_app_auditlog USING INDEX auditlog_zaman_idx", "sqlite"),
+                         set())
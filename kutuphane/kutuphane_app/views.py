@@ -1,16 +1,20 @@
+import csv
+
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.exceptions import ValidationError as DRFValidationError
 from django.db import transaction
-from django.db.models import Count, Sum, Avg, Q, F
+from django.db.models import Count, Sum, Avg, Q, F, Value, IntegerField, OuterRef, Subquery
 from django.shortcuts import get_object_or_404
-from datetime import timedelta
+from django.http import StreamingHttpResponse
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal, InvalidOperation
-from django.utils.timezone import now, make_aware, is_naive
+from django.utils.timezone import now, localdate, make_aware, is_naive
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django.contrib.auth.password_validation import validate_password
@@ -31,7 +35,9 @@ from .models import (
     NotificationSettings,
     AuditLog,
     InventorySession,
-    InventoryItem,
+    LoanStatRollup,
+    ScheduledJobRun,
+    BackgroundTask,
 )
 from .serializers import (
     OgrenciSerializer,
@@ -43,15 +49,36 @@ from .serializers import (
     KitapDetailSerializer,
     KitapNushaSerializer,
     OduncKaydiSerializer,
+    LoanRowSerializer,
     PersonelSerializer,
     LoanPolicySerializer,
     RoleLoanPolicySerializer,
     NotificationSettingsSerializer,
     AuditLogSerializer,
     InventorySessionSerializer,
+    BackgroundTaskSerializer,
     InventoryItemSerializer,
 )
+from .inventory import (
+    ITEMS_DEFAULT_LIMIT,
+    ITEMS_MAX_LIMIT,
+    MARK_BULK_MAX,
+    RECON_CATEGORIES,
+    filter_items,
+    iter_reconciliation_rows,
+    items_count,
+    items_page,
+    mark_barcodes,
+    reconciliation_page,
+    reconciliation_summary,
+    record_unknown_scans,
+    set_item_seen,
+    snapshot_copies,
+)
+from .audit import AUDIT_BULK_MAX, ingest_audit_entries
+from .search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, filter_books, search_books
 from .loan_policy import (
+    EMPTY_PENALTY_TOTALS,
     calculate_penalty,
     compute_assigned_due,
     compute_effective_due,
@@ -59,16 +86,30 @@ from .loan_policy import (
     daily_penalty_rate_for_role,
     duration_for_role,
     grace_days_for_role,
+    get_policy_payload,
     get_snapshot,
     max_items_for_role,
     is_role_blocked,
     penalty_delay_for_role,
     penalty_max_per_loan_for_role,
     penalty_max_per_student_for_role,
+    penalty_totals_by_student,
     shift_weekend_for_role,
-    LoanPolicySnapshot,
 )
-from .jobs import update_overdue_loans
+from .jobs import OVERDUE_JOB, last_job_run, request_overdue_run, request_rollup_refresh
+from .stats import (
+    DASHBOARD_DEFAULT_LIMIT,
+    DASHBOARD_MAX_LIMIT,
+    get_dashboard,
+    rollup_monthly,
+    rollup_totals,
+)
+from .barcodes import (
+    DEFAULT_BARCODE_PREFIX,
+    DEFAULT_BARCODE_WIDTH,
+    allocate_barcodes,
+    peek_next_barcode,
+)
 
 
 def serialize_book_payload(kitap, request=None):
@@ -115,7 +156,11 @@ def _client_ip_from_request(request):
     return request.META.get("REMOTE_ADDR")
 
 
-def penalty_summary_for_student(ogrenci, limit=None):
+def penalty_summary_for_student(ogrenci, limit=None, totals=None):
+    """
+    Öğrencinin tahsil edilmemiş cezalarını özetler.
+    `totals` (StudentPenaltyTotals) verilirse toplam ve adet için ek sorgu çalıştırılmaz.
+    """
     if not ogrenci:
         return {
             "outstanding_total": "0.00",
@@ -136,8 +181,10 @@ def penalty_summary_for_student(ogrenci, limit=None):
         .order_by("-teslim_tarihi", "-iade_tarihi", "-odunc_tarihi")
     )
 
-    total = qs.aggregate(total=Sum("gecikme_cezasi")).get("total") or Decimal("0")
-    total_count = qs.count()
+    if totals is None:
+        totals = penalty_totals_by_student([ogrenci.id]).get(ogrenci.id, EMPTY_PENALTY_TOTALS)
+    total = totals.returned_total
+    total_count = totals.returned_count
 
     limited_qs = qs
     if limit is not None:
@@ -209,9 +256,43 @@ class KitapViewSet(viewsets.ModelViewSet):
             qs = qs.filter(kategori_id=kategori_id)
         arama = self.request.query_params.get("q")
         if arama:
-            qs = qs.filter(baslik__icontains=arama)
+            qs = filter_books(qs, arama)
         return qs.annotate(nusha_sayisi=Count('nushalar', distinct=True))
 
+    @action(detail=False, methods=["get"], url_path="ara")
+    def ara(self, request):
+        """
+        Başlık, yazar ve ISBN üzerinde sıralı katalog araması.
+        GET /api/kitaplar/ara/?q=isik&limit=20&offset=0
+        Türkçe harf duyarsızdır, önek ve yazım hatalı eşleşmeleri de bulur.
+        """
+        q = (request.query_params.get("q") or "").strip()
+        try:
+            limit = int(request.query_params.get("limit", SEARCH_DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            limit = SEARCH_DEFAULT_LIMIT
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        try:
+            offset = max(0, int(request.query_params.get("offset", 0)))
+        except (TypeError, ValueError):
+            offset = 0
+
+        queryset = (
+            Kitap.objects
+            .select_related("yazar", "kategori")
+            .annotate(nusha_sayisi=Count("nushalar", distinct=True))
+        )
+        kitaplar, has_more = search_books(q, offset=offset, limit=limit, queryset=queryset)
+        data = KitapSerializer(kitaplar, many=True).data
+        for row, kitap in zip(data, kitaplar):
+            row["skor"] = round(float(kitap.skor), 4)
+        return Response({
+            "results": data,
+            "offset": offset,
+            "limit": limit,
+            "has_more": has_more,
+        })
+
 class KitapNushaViewSet(viewsets.ModelViewSet):
     queryset = KitapNusha.objects.all()
     serializer_class = KitapNushaSerializer
@@ -232,23 +313,119 @@ class KitapNushaViewSet(viewsets.ModelViewSet):
             qs = qs.filter(kitap__isbn=isbn)
         return qs
 
+class BarcodeAllocationView(APIView):
+    """
+    GET  /api/barcodes/next/?prefix=KIT&width=6  -> sıradaki kod (ayırmaz)
+    POST /api/barcodes/next/ {"prefix": "KIT", "count": 1, "width": 6}
+         -> {"codes": [...]} ardışık kodları kalıcı olarak ayırır
+    """
+    permission_classes = [IsAuthenticated]
+
+    def _params(self, data):
+        prefix = (data.get("prefix") or DEFAULT_BARCODE_PREFIX).strip()
+        width = int(data.get("width") or DEFAULT_BARCODE_WIDTH)
+        if not 1 <= width <= 12:
+            raise ValueError("Genişlik 1 ile 12 arasında olmalıdır.")
+        return prefix, width
+
+    def get(self, request):
+        try:
+            prefix, width = self._params(request.query_params)
+            code = peek_next_barcode(prefix, width)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"prefix": prefix, "next": code})
+
+    def post(self, request):
+        try:
+            prefix, width = self._params(request.data)
+            count = int(request.data.get("count") or 1)
+            codes = allocate_barcodes(prefix, count, width)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"prefix": prefix, "codes": codes}, status=status.HTTP_201_CREATED)
+
+
+class LoanRowCursorPagination(CursorPagination):
+    page_size = 200
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    ordering = ("iade_tarihi", "id")
+
+
 class OduncKaydiViewSet(viewsets.ModelViewSet):
     queryset = OduncKaydi.objects.all()
     serializer_class = OduncKaydiSerializer
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = super().get_queryset().select_related(
+            "ogrenci__sinif",
+            "kitap_nusha__kitap__yazar",
+            "kitap_nusha__kitap__kategori",
+        )
         durum = self.request.query_params.get("durum")
         if durum:
-            qs = qs.filter(durum=durum)
+            durumlar = [part.strip() for part in durum.split(",") if part.strip()]
+            qs = qs.filter(durum__in=durumlar)
         return qs
 
+    @action(detail=False, methods=["get"], url_path="rows")
+    def rows(self, request):
+        """
+        Masaüstü ödünç tablosu için düz, sayfalı (cursor) liste.
+        GET /api/oduncler/rows/?durum=oduncte,gecikmis&page_size=500
+        """
+        qs = self.get_queryset().select_related("ogrenci__rol")
+        paginator = LoanRowCursorPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        serializer = LoanRowSerializer(
+            page,
+            many=True,
+            context={"request": request, "snapshot": get_snapshot(), "today": timezone.localdate()},
+        )
+        return paginator.get_paginated_response(serializer.data)
+
 class PersonelViewSet(viewsets.ModelViewSet):
     queryset = Personel.objects.all()
     serializer_class = PersonelSerializer
     permission_classes = [IsAuthenticated]
 
 
+RECONCILIATION_CSV_FIELDS = ["kategori", "barkod", "kitap_baslik", "raf_kodu", "katalog_durumu", "seen_at"]
+
+
+class _EchoBuffer:
+    def write(self, value):
+        return value
+
+
+def _csv_lines(fields, rows):
+    """Satırları bellekte biriktirmeden CSV satırı olarak üretir (BOM: Excel için)."""
+    writer = csv.DictWriter(_EchoBuffer(), fieldnames=fields)
+    yield "\ufeff" + writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class BackgroundTaskViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Arka plan görevlerinin durumu, ilerlemesi ve sonucu (yalnızca yöneticiler).
+    GET /api/tasks/?status=queued,running&kind=backup
+    """
+
+    queryset = BackgroundTask.objects.all()
+    serializer_class = BackgroundTaskSerializer
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        for param in ("status", "kind"):
+            values = [part.strip() for part in self.request.query_params.get(param, "").split(",") if part.strip()]
+            if values:
+                qs = qs.filter(**{f"{param}__in": values})
+        return qs
+
+
 class InventorySessionViewSet(viewsets.ModelViewSet):
     queryset = InventorySession.objects.all().select_related("created_by")
     serializer_class = InventorySessionSerializer
@@ -269,30 +446,20 @@ class InventorySessionViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         filters = serializer.validated_data.get("filters") or {}
-        copies = list(self._filter_copies(filters))
-        if not copies:
-            raise DRFValidationError({"detail": "Belirtilen filtrelere uyan nüsha bulunamadı."})
         user = self.request.user if getattr(self.request, "user", None) and self.request.user.is_authenticated else None
         with transaction.atomic():
             session = serializer.save(
                 created_by=user,
                 filters=filters,
                 status="active",
-                total_items=len(copies),
+                total_items=0,
                 seen_items=0,
             )
-            batch = [
-                InventoryItem(
-                    session=session,
-                    kitap_nusha=copy,
-                    barkod=copy.barkod,
-                    kitap_baslik=copy.kitap.baslik if copy.kitap else "",
-                    raf_kodu=copy.raf_kodu,
-                    durum=copy.durum,
-                )
-                for copy in copies
-            ]
-            InventoryItem.objects.bulk_create(batch, batch_size=500)
+            total = snapshot_copies(session, self._filter_copies(filters))
+            if not total:
+                raise DRFValidationError({"detail": "Belirtilen filtrelere uyan nüsha bulunamadı."})
+            session.total_items = total
+            session.save(update_fields=["total_items"])
 
     def _filter_copies(self, filters):
         filters = filters or {}
@@ -316,38 +483,33 @@ class InventorySessionViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["get"], url_path="items")
     def list_items(self, request, pk=None):
+        """
+        Sayım kalemleri, (seen, raf_kodu, barkod, id) keyset sayfalı.
+        GET .../items/?status=unseen&q=A1&limit=250&cursor=<next>&count=approx|exact|none
+        `q` barkod veya raf kodu önekidir. Arama yoksa `count` oturum
+        sayaçlarından gelir; aramada varsayılan planlayıcı tahminidir.
+        """
         session = self.get_object()
         status_filter = (request.query_params.get("status") or "unseen").lower()
-        qs = session.items.select_related("kitap_nusha", "seen_by")
-        if status_filter == "unseen":
-            qs = qs.filter(seen=False)
-        elif status_filter == "seen":
-            qs = qs.filter(seen=True)
         search = request.query_params.get("q")
-        if search:
-            qs = qs.filter(
-                Q(barkod__icontains=search)
-                | Q(kitap_baslik__icontains=search)
-                | Q(raf_kodu__icontains=search)
-            )
-        total = qs.count()
+        qs = filter_items(session, status_filter, search)
         try:
-            limit = int(request.query_params.get("limit", 250))
+            limit = int(request.query_params.get("limit", ITEMS_DEFAULT_LIMIT))
         except (TypeError, ValueError):
-            limit = 250
-        limit = max(1, min(limit, 1000))
-        try:
-            offset = int(request.query_params.get("offset", 0))
-        except (TypeError, ValueError):
-            offset = 0
-        offset = max(0, offset)
-        items = qs[offset : offset + limit]
+            limit = ITEMS_DEFAULT_LIMIT
+        limit = max(1, min(limit, ITEMS_MAX_LIMIT))
+        items, next_cursor = items_page(
+            qs.select_related("kitap_nusha", "seen_by"), limit, request.query_params.get("cursor")
+        )
+        count_mode = (request.query_params.get("count") or "approx").lower()
+        total, exact = items_count(session, qs, status_filter, search, count_mode)
         serializer = InventoryItemSerializer(items, many=True)
         return Response(
             {
                 "results": serializer.data,
                 "count": total,
-                "offset": offset,
+                "count_exact": exact,
+                "next": next_cursor,
                 "limit": limit,
                 "session": InventorySessionSerializer(session).data,
             }
@@ -363,7 +525,10 @@ class InventorySessionViewSet(viewsets.ModelViewSet):
         if item_id:
             item = get_object_or_404(session.items.select_related("kitap_nusha"), pk=item_id)
         elif barkod:
-            item = get_object_or_404(session.items.select_related("kitap_nusha"), barkod=barkod)
+            item = session.items.select_related("kitap_nusha").filter(barkod=barkod).first()
+            if item is None:
+                record_unknown_scans(session, [barkod], request.user)
+                return Response({"detail": "Bu barkod sayım kapsamında değil."}, status=status.HTTP_404_NOT_FOUND)
         else:
             return Response({"detail": "Barkod veya item_id alanı zorunludur."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -371,28 +536,73 @@ class InventorySessionViewSet(viewsets.ModelViewSet):
         mark_seen = True if seen_flag is None else bool(seen_flag)
         note = request.data.get("note")
 
-        changed = False
-        if mark_seen and not item.seen:
-            item.seen = True
-            item.seen_at = timezone.now()
-            item.seen_by = request.user
-            changed = True
-        elif not mark_seen and item.seen:
-            item.seen = False
-            item.seen_at = None
-            item.seen_by = None
-            changed = True
+        set_item_seen(session, item, mark_seen, request.user)
 
         if note is not None:
             item.note = note
+            item.save(update_fields=["note"])
 
-        item.save(update_fields=["seen", "seen_at", "seen_by", "note"])
+        return Response(InventoryItemSerializer(item).data, status=status.HTTP_200_OK)
 
-        if changed:
-            session.seen_items = session.items.filter(seen=True).count()
-            session.save(update_fields=["seen_items"])
+    @action(detail=True, methods=["post"], url_path="mark-bulk")
+    def mark_bulk(self, request, pk=None):
+        """
+        Birden çok barkodu tek istekte görüldü yapar.
+        POST {"barkodlar": ["KIT000001", ...]}
+        Her barkod için sonuç: seen / already_seen / unknown.
+        """
+        session = self.get_object()
+        if session.status != "active":
+            return Response({"detail": "Yalnızca aktif sayımlarda değişiklik yapılabilir."}, status=status.HTTP_400_BAD_REQUEST)
+        barkodlar = request.data.get("barkodlar")
+        if not isinstance(barkodlar, (list, tuple)) or not barkodlar:
+            return Response({"detail": "barkodlar alanı boş olmayan bir liste olmalıdır."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(barkodlar) > MARK_BULK_MAX:
+            return Response({"detail": f"Tek istekte en fazla {MARK_BULK_MAX} barkod gönderilebilir."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results, marked = mark_barcodes(session, barkodlar, request.user)
+        session.refresh_from_db(fields=["seen_items", "total_items", "updated_at"])
+        return Response({
+            "results": results,
+            "marked": marked,
+            "session": InventorySessionSerializer(session).data,
+        })
 
-        return Response(InventoryItemSerializer(item).data, status=status.HTTP_200_OK)
+    @action(detail=True, methods=["get"], url_path="reconciliation")
+    def reconciliation(self, request, pk=None):
+        """
+        Sayım mutabakatı: kategori adetleri ve seçilen kategorinin bir sayfası.
+        GET .../reconciliation/?category=missing&limit=500&after=<next>
+        Kategoriler: missing, seen_on_loan, seen_lost_damaged, out_of_scope, unknown_barcode
+        """
+        session = self.get_object()
+        data = {"summary": reconciliation_summary(session)}
+        category = request.query_params.get("category")
+        if category:
+            if category not in RECON_CATEGORIES:
+                return Response({"detail": "Geçersiz kategori."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                limit = int(request.query_params.get("limit", ITEMS_DEFAULT_LIMIT))
+                after = int(request.query_params.get("after") or 0)
+            except (TypeError, ValueError):
+                return Response({"detail": "limit ve after tam sayı olmalıdır."}, status=status.HTTP_400_BAD_REQUEST)
+            limit = max(1, min(limit, ITEMS_MAX_LIMIT))
+            results, next_id = reconciliation_page(session, category, limit, after)
+            data.update({"category": category, "results": results, "next": next_id, "limit": limit})
+        return Response(data)
+
+    @action(detail=True, methods=["get"], url_path="reconciliation/csv")
+    def reconciliation_csv(self, request, pk=None):
+        session = self.get_object()
+        categories = [c for c in request.query_params.get("category", "").split(",") if c]
+        if any(c not in RECON_CATEGORIES for c in categories):
+            return Response({"detail": "Geçersiz kategori."}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(
+            _csv_lines(RECONCILIATION_CSV_FIELDS, iter_reconciliation_rows(session, categories or None)),
+            content_type="text/csv; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="sayim_{session.id}_mutabakat.csv"'
+        return response
 
     @action(detail=True, methods=["post"], url_path="complete")
     def complete_session(self, request, pk=None):
@@ -408,85 +618,156 @@ class InventorySessionViewSet(viewsets.ModelViewSet):
         return Response(InventorySessionSerializer(session).data)
 
 class IstatistikViewSet(viewsets.ViewSet):
+    """
+    Ödünç sayımları günlük toplamlardan (`stats.LoanStatRollup`) okunur;
+    ödünç tablosu her istekte taranmaz. Ceza istatistikleri (9, 10) ödeme
+    durumuna bağlı olduğundan canlı sorgulanır.
+
+    Toplamlar istek içinde yenilenmez: bayatsa yenileme arka planda başlar ve
+    yanıt eldeki toplamlarla döner. `X-Stats-Refreshed-At` son yenilenme anını,
+    `X-Stats-Stale: 1` toplamların güncel olmadığını bildirir.
+    """
+
+    rollup_state = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action != "dashboard":
+            _, self.rollup_state = request_rollup_refresh()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.rollup_state is not None:
+            refreshed_at = self.rollup_state["refreshed_at"]
+            response["X-Stats-Refreshed-At"] = refreshed_at.isoformat() if refreshed_at else ""
+            response["X-Stats-Stale"] = "1" if self.rollup_state["stale"] else "0"
+        return response
+
+    @staticmethod
+    def _since_months(ay):
+        return localdate() - timedelta(days=30 * ay) if ay > 0 else None
 
     # 1. En çok okuyan öğrenci
     @action(detail=False, methods=['get'])
     def en_cok_okuyan_ogrenci(self, request):
         ay = int(request.query_params.get('ay', 0))
-        qs = Ogrenci.objects.annotate(okunan=Count('odunckaydi'))
-        if ay > 0:
-            baslangic = now() - timedelta(days=30*ay)
-            qs = Ogrenci.objects.annotate(
-                okunan=Count('odunckaydi', filter=Q(odunckaydi__odunc_tarihi__gte=baslangic))
-            )
-        ogr = qs.order_by('-okunan').first()
+        top = (rollup_totals(LoanStatRollup.DIMENSION_STUDENT, self._since_months(ay))
+               .filter(key__in=Ogrenci.objects.values("id"))
+               .order_by('-toplam', 'key')
+               .first())
+        if top:
+            ogr = Ogrenci.objects.get(id=top["key"])
+            return Response({"ogrenci": str(ogr), "okunan_sayi": top["toplam"]})
+        ogr = Ogrenci.objects.order_by("id").first()
         if ogr:
-            return Response({"ogrenci": str(ogr), "okunan_sayi": ogr.okunan})
+            return Response({"ogrenci": str(ogr), "okunan_sayi": 0})
         return Response({"mesaj": "Veri bulunamadı"})
 
     # 2. En az okuyan öğrenci
     @action(detail=False, methods=['get'])
     def en_az_okuyan_ogrenci(self, request):
-        ogr = Ogrenci.objects.annotate(okunan=Count('odunckaydi')).order_by('okunan').first()
+        okuyanlar = LoanStatRollup.objects.filter(dimension=LoanStatRollup.DIMENSION_STUDENT).values("key")
+        ogr = Ogrenci.objects.exclude(id__in=okuyanlar).order_by("id").first()
         if ogr:
-            return Response({"ogrenci": str(ogr), "okunan_sayi": ogr.okunan})
+            return Response({"ogrenci": str(ogr), "okunan_sayi": 0})
+        low = (rollup_totals(LoanStatRollup.DIMENSION_STUDENT)
+               .filter(key__in=Ogrenci.objects.values("id"))
+               .order_by('toplam', 'key')
+               .first())
+        if low:
+            ogr = Ogrenci.objects.get(id=low["key"])
+            return Response({"ogrenci": str(ogr), "okunan_sayi": low["toplam"]})
         return Response({"mesaj": "Veri bulunamadı"})
 
     # 3. Bir öğrencinin toplam ödünç sayısı
     @action(detail=False, methods=['get'])
     def ogrenci_toplam(self, request):
         ogr_id = request.query_params.get('ogrenci_id')
-        toplam = OduncKaydi.objects.filter(ogrenci_id=ogr_id).count()
+        toplam = 0
+        if ogr_id and str(ogr_id).isdigit():
+            row = rollup_totals(LoanStatRollup.DIMENSION_STUDENT).filter(key=int(ogr_id)).first()
+            toplam = row["toplam"] if row else 0
         return Response({"ogrenci_id": ogr_id, "toplam_odunc": toplam})
 
     # 4. En çok okuyan sınıf
     @action(detail=False, methods=['get'])
     def en_cok_okuyan_sinif(self, request):
-        sinif = Sinif.objects.annotate(
-            okunan=Count('ogrenci__odunckaydi')
-        ).order_by('-okunan').first()
+        top = (rollup_totals(LoanStatRollup.DIMENSION_CLASS)
+               .filter(key__in=Sinif.objects.values("id"))
+               .order_by('-toplam', 'key')
+               .first())
+        if top:
+            return Response({"sinif": Sinif.objects.get(id=top["key"]).ad, "okunan_sayi": top["toplam"]})
+        sinif = Sinif.objects.order_by("id").first()
         if sinif:
-            return Response({"sinif": sinif.ad, "okunan_sayi": sinif.okunan})
+            return Response({"sinif": sinif.ad, "okunan_sayi": 0})
         return Response({"mesaj": "Veri yok"})
 
     # 5. Sınıf dağılımı (öğrencilerin ödünç sayısı)
     @action(detail=False, methods=['get'])
     def sinif_dagilimi(self, request):
         sinif_id = request.query_params.get('sinif_id')
-        ogrenciler = Ogrenci.objects.filter(sinif_id=sinif_id).annotate(
-            okunan=Count('odunckaydi')
-        ).values("id", "ad", "soyad", "okunan")
-        return Response(list(ogrenciler))
+        ogrenciler = list(Ogrenci.objects.filter(sinif_id=sinif_id).values("id", "ad", "soyad"))
+        sayilar = {
+            row["key"]: row["toplam"]
+            for row in rollup_totals(LoanStatRollup.DIMENSION_STUDENT).filter(key__in=[o["id"] for o in ogrenciler])
+        }
+        for o in ogrenciler:
+            o["okunan"] = sayilar.get(o["id"], 0)
+        return Response(ogrenciler)
 
     # 6. En çok okunan kitaplar (ilk 10)
     @action(detail=False, methods=['get'])
     def en_cok_okunan_kitaplar(self, request):
         limit = int(request.query_params.get('limit', 10))
-        kitaplar = Kitap.objects.annotate(
-            okunma=Count('nushalar__odunckaydi')
-        ).order_by('-okunma')[:limit]
-        return Response([{"kitap": k.baslik, "okunma": k.okunma} for k in kitaplar])
+        top = list(
+            rollup_totals(LoanStatRollup.DIMENSION_BOOK)
+            .filter(key__in=Kitap.objects.values("id"))
+            .order_by('-toplam', 'key')[:limit]
+        )
+        basliklar = dict(Kitap.objects.filter(id__in=[row["key"] for row in top]).values_list("id", "baslik"))
+        sonuc = [{"kitap": basliklar[row["key"]], "okunma": row["toplam"]} for row in top]
+        if len(sonuc) < limit:
+            # Hiç okunmamış kitaplarla tamamla (eski davranış)
+            kalan = Kitap.objects.exclude(id__in=basliklar.keys()).order_by("id")[:limit - len(sonuc)]
+            sonuc += [{"kitap": k.baslik, "okunma": 0} for k in kalan]
+        return Response(sonuc)
 
     # 7. Kategori bazlı okuma dağılımı
     @action(detail=False, methods=['get'])
     def kategori_dagilimi(self, request):
-        kategoriler = Kategori.objects.annotate(
-            okunma=Count('kitap__nushalar__odunckaydi')
-        ).values("ad", "okunma")
-        return Response(list(kategoriler))
+        sayilar = {row["key"]: row["toplam"] for row in rollup_totals(LoanStatRollup.DIMENSION_CATEGORY)}
+        return Response([
+            {"ad": k.ad, "okunma": sayilar.get(k.id, 0)}
+            for k in Kategori.objects.only("id", "ad")
+        ])
 
     # 8. Zaman bazlı ödünç trendi (son X ay)
     @action(detail=False, methods=['get'])
     def odunc_trend(self, request):
         ay = int(request.query_params.get('ay', 6))
-        baslangic = now() - timedelta(days=30*ay)
-        qs = (OduncKaydi.objects
-              .filter(odunc_tarihi__gte=baslangic)
-              .extra(select={'ay': "DATE_TRUNC('month', odunc_tarihi)"})
-              .values('ay')
-              .annotate(sayi=Count('id'))
-              .order_by('ay'))
-        return Response(list(qs))
+        return Response([
+            {"ay": month.isoformat(), "sayi": count}
+            for month, count in rollup_monthly(self._since_months(ay))
+        ])
+
+    # Tüm metrikler tek istekte (istatistik ekranı)
+    # GET /api/istatistik/dashboard/?baslangic=2025-01-01&bitis=2025-06-30&sinif_id=3&limit=10
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        params = request.query_params
+        try:
+            baslangic = date.fromisoformat(params["baslangic"]) if params.get("baslangic") else None
+            bitis = date.fromisoformat(params["bitis"]) if params.get("bitis") else None
+            sinif_id = int(params["sinif_id"]) if params.get("sinif_id") else None
+            limit = int(params.get("limit") or DASHBOARD_DEFAULT_LIMIT)
+        except ValueError:
+            return Response(
+                {"error": "Geçersiz filtre. Tarihler YYYY-AA-GG, sinif_id ve limit sayı olmalıdır."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, DASHBOARD_MAX_LIMIT))
+        return Response(get_dashboard(baslangic=baslangic, bitis=bitis, sinif_id=sinif_id, limit=limit))
 
     # 9. En çok geciken öğrenciler
     @action(detail=False, methods=['get'])
@@ -554,33 +835,45 @@ class StudentPenaltySummaryView(APIView):
         return Response(summary)
 
 class FastQueryView(APIView):
+    # Sınıflandırma önceliği: barkod > ISBN > öğrenci numarası
+    KIND_COPY = 0
+    KIND_ISBN = 1
+    KIND_STUDENT = 2
+
     def get(self, request):
         q = request.query_params.get("q", "").strip()
         if not q:
             return Response({"error": "No query provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-        policy_instance = LoanPolicy.get_solo()
-        policy_snapshot = LoanPolicySnapshot.from_policy(policy_instance)
-        policy_data = LoanPolicySerializer(policy_instance).data
+        policy_snapshot = get_snapshot()
+        policy_data = get_policy_payload()
         policy_data["role_limits"] = []
 
+        kind, pk = self._classify(q)
+
         # 1. Barkod kontrolü
-        try:
-            nusha = KitapNusha.objects.select_related("kitap", "kitap__yazar", "kitap__kategori").get(barkod=q)
+        if kind == self.KIND_COPY:
+            nusha = KitapNusha.objects.select_related("kitap", "kitap__yazar", "kitap__kategori").get(pk=pk)
             loan = (
                 OduncKaydi.objects
                 .filter(kitap_nusha=nusha, durum__in=["oduncte", "gecikmis"])
-                .select_related("ogrenci")
+                .select_related("ogrenci", "ogrenci__rol")
                 .order_by("-odunc_tarihi")
                 .first()
             )
-            history = (
+            history = list(
                 OduncKaydi.objects
                 .filter(kitap_nusha=nusha)
                 .exclude(durum__in=["oduncte", "iptal"])
-                .select_related("ogrenci")
+                .select_related("ogrenci", "ogrenci__rol")
                 .order_by("-odunc_tarihi")[:5]
             )
+            # Kayıtlar nüshayı yeniden sorgulamasın
+            for rec in ([loan] if loan else []) + history:
+                rec.kitap_nusha = nusha
+            totals = penalty_totals_by_student(
+                ([loan.ogrenci_id] if loan else []) + [h.ogrenci_id for h in history]
+            )
             return Response({
                 "type": "book_copy",
                 "copy": {
@@ -591,19 +884,21 @@ class FastQueryView(APIView):
                 },
                 "book": serialize_book_payload(nusha.kitap, request),
                 "policy": policy_data,
-                "loan": self._serialize_loan(loan, policy_snapshot, include_student=True, include_copy=False) if loan else None,
-                "penalty_summary": penalty_summary_for_student(loan.ogrenci, limit=10) if loan else None,
+                "loan": self._serialize_loan(loan, policy_snapshot, totals, include_student=True, include_copy=False) if loan else None,
+                "penalty_summary": penalty_summary_for_student(
+                    loan.ogrenci,
+                    limit=10,
+                    totals=totals.get(loan.ogrenci_id, EMPTY_PENALTY_TOTALS),
+                ) if loan else None,
                 "history": [
-                    self._serialize_loan(h, policy_snapshot, include_student=True, include_copy=False)
+                    self._serialize_loan(h, policy_snapshot, totals, include_student=True, include_copy=False)
                     for h in history
                 ]
             })
-        except KitapNusha.DoesNotExist:
-            pass
 
         # 2. ISBN kontrolü
-        kitap = Kitap.objects.filter(isbn=q).select_related("yazar", "kategori").first()
-        if kitap:
+        if kind == self.KIND_ISBN:
+            kitap = Kitap.objects.select_related("yazar", "kategori").get(pk=pk)
             return Response({
                 "type": "isbn",
                 "exists": True,
@@ -615,20 +910,24 @@ class FastQueryView(APIView):
             return Response({"type": "isbn", "exists": False})
 
         # 3. Öğrenci numarası kontrolü
-        ogrenci = Ogrenci.objects.filter(ogrenci_no=q).select_related("sinif", "rol").first()
-        if ogrenci:
-            aktif_oduncler = (
+        if kind == self.KIND_STUDENT:
+            ogrenci = Ogrenci.objects.select_related("sinif", "rol").get(pk=pk)
+            aktif_oduncler = list(
                 OduncKaydi.objects
                 .filter(ogrenci=ogrenci, durum__in=["oduncte", "gecikmis"])
                 .select_related("kitap_nusha__kitap")
             )
-            history = (
+            history = list(
                 OduncKaydi.objects
                 .filter(ogrenci=ogrenci)
                 .exclude(durum__in=["oduncte", "iptal"])
                 .select_related("kitap_nusha__kitap")
                 .order_by("-odunc_tarihi")[:5]
             )
+            # Kayıtlar öğrenciyi yeniden sorgulamasın
+            for od in aktif_oduncler + history:
+                od.ogrenci = ogrenci
+            totals = penalty_totals_by_student([ogrenci.id])
             return Response({
                 "type": "student",
                 "student": {
@@ -645,13 +944,17 @@ class FastQueryView(APIView):
                     **policy_data,
                     "role": self._serialize_role_policy(policy_snapshot, ogrenci.rol),
                 },
-                "penalty_summary": penalty_summary_for_student(ogrenci, limit=10),
+                "penalty_summary": penalty_summary_for_student(
+                    ogrenci,
+                    limit=10,
+                    totals=totals.get(ogrenci.id, EMPTY_PENALTY_TOTALS),
+                ),
                 "active_loans": [
-                    self._serialize_loan(od, policy_snapshot, include_copy=True)
+                    self._serialize_loan(od, policy_snapshot, totals, include_copy=True)
                     for od in aktif_oduncler
                 ],
                 "history": [
-                    self._serialize_loan(h, policy_snapshot, include_copy=True, include_student=False)
+                    self._serialize_loan(h, policy_snapshot, totals, include_copy=True, include_student=False)
                     for h in history
                 ]
             })
@@ -659,6 +962,27 @@ class FastQueryView(APIView):
         # 4. Hiçbir şey bulunmadı
         return Response({"type": "not_found"})
 
+    def _classify(self, q):
+        """
+        Sorgunun barkod, ISBN veya öğrenci numarası olduğunu tek bir UNION sorgusuyla
+        (her kol benzersiz/indeksli alan üzerinde) belirler. (tür, pk) ya da (None, None) döner.
+        """
+        def branch(qs, kind):
+            return qs.annotate(kind=Value(kind, output_field=IntegerField())).values_list("kind", "pk")
+
+        candidates = (
+            branch(KitapNusha.objects.filter(barkod=q), self.KIND_COPY)
+            .union(
+                branch(Kitap.objects.filter(isbn=q), self.KIND_ISBN),
+                branch(Ogrenci.objects.filter(ogrenci_no=q), self.KIND_STUDENT),
+                all=True,
+            )
+        )
+        matches = sorted(candidates)
+        if not matches:
+            return None, None
+        return matches[0]
+
     def _isbn_copy_summary(self, kitap):
         copies_qs = (
             KitapNusha.objects
@@ -703,7 +1027,7 @@ class FastQueryView(APIView):
             "first_barkod": first_barcode,
         }
 
-    def _serialize_loan(self, loan, snapshot, include_student=False, include_copy=True):
+    def _serialize_loan(self, loan, snapshot, totals=None, include_student=False, include_copy=True):
         if loan is None:
             return None
 
@@ -720,18 +1044,9 @@ class FastQueryView(APIView):
             rate = daily_penalty_rate_for_role(snapshot, role)
             other_total = Decimal("0")
             if rate and rate > 0:
-                other_total = (
-                    OduncKaydi.objects
-                    .filter(
-                        ogrenci=loan.ogrenci,
-                        gecikme_cezasi__gt=0,
-                        gecikme_cezasi_odendi=False,
-                    )
-                    .exclude(pk=loan.pk)
-                    .aggregate(total=Sum("gecikme_cezasi"))
-                    .get("total")
-                    or Decimal("0")
-                )
+                if totals is None:
+                    totals = penalty_totals_by_student([loan.ogrenci_id])
+                other_total = totals.get(loan.ogrenci_id, EMPTY_PENALTY_TOTALS).other_than(loan)
             penalty = calculate_penalty(
                 snapshot,
                 role,
@@ -807,6 +1122,17 @@ class FastQueryView(APIView):
 
     
 
+ACTIVE_LOAN_STATES = ["oduncte", "gecikmis"]
+
+
+def student_active_loans(ogrenci_id):
+    return OduncKaydi.objects.filter(ogrenci_id=ogrenci_id, durum__in=ACTIVE_LOAN_STATES)
+
+
+def copy_active_loans(kitap_nusha_id):
+    return OduncKaydi.objects.filter(kitap_nusha_id=kitap_nusha_id, durum__in=ACTIVE_LOAN_STATES)
+
+
 class CheckoutView(APIView):
     """
     Bir öğrencinin belirli bir barkoda sahip kitabı ödünç almasını sağlar.
@@ -829,10 +1155,7 @@ class CheckoutView(APIView):
         if is_role_blocked(snapshot, ogrenci.rol):
             return Response({"error": "Bu rol için ödünç işlemi yapılamıyor."}, status=status.HTTP_400_BAD_REQUEST)
 
-        aktif_sayi = OduncKaydi.objects.filter(
-            ogrenci=ogrenci,
-            durum__in=["oduncte", "gecikmis"]
-        ).count()
+        aktif_sayi = student_active_loans(ogrenci.id).count()
 
         role_limit = max_items_for_role(ogrenci.rol, snapshot)
         if role_limit is not None and aktif_sayi >= role_limit:
@@ -849,10 +1172,7 @@ class CheckoutView(APIView):
         if nusha.durum == "oduncte":
             return Response({"error": "Bu nüsha zaten ödünçte"}, status=status.HTTP_400_BAD_REQUEST)
 
-        aktif_kayit_var = OduncKaydi.objects.filter(
-            kitap_nusha=nusha,
-            durum__in=["oduncte", "gecikmis"]
-        ).exists()
+        aktif_kayit_var = copy_active_loans(nusha.id).exists()
         if aktif_kayit_var:
             return Response({"error": "Bu nüsha aktif ödünç kaydına sahip"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -862,10 +1182,7 @@ class CheckoutView(APIView):
                 max_allowed = int(max_allowed)
             except (TypeError, ValueError):
                 max_allowed = None
-            if max_allowed and OduncKaydi.objects.filter(
-                ogrenci=ogrenci,
-                durum__in=["oduncte", "gecikmis"]
-            ).count() >= max_allowed:
+            if max_allowed and student_active_loans(ogrenci.id).count() >= max_allowed:
                 return Response({"error": "Öğrencinin aktif ödünç sayısı limitte"}, status=status.HTTP_400_BAD_REQUEST)
         else:
             max_allowed = role_limit
@@ -953,9 +1270,7 @@ class LoanPolicyView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        policy = LoanPolicy.get_solo()
-        serializer = LoanPolicySerializer(policy)
-        data = serializer.data
+        data = get_policy_payload()
         data["role_limits"] = []
         return Response(data)
 
@@ -1104,6 +1419,30 @@ class AuditLogView(APIView):
         return Response(AuditLogSerializer(log).data, status=status.HTTP_201_CREATED)
 
 
+class AuditLogBulkView(APIView):
+    """
+    Toplu denetim logu.
+    POST /api/logs/bulk/ {"entries": [{"client_id", "islem", "detay", "ip_adresi", "zaman", "kullanici"}, ...]}
+    Aynı `client_id` ile tekrar gönderilen kayıtlar yeniden yazılmaz. Yazar istek
+    sahibidir; `kullanici` yalnızca `istemci_kullanici` alanına bilgi olarak yazılır.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        entries = request.data.get("entries") if isinstance(request.data, dict) else request.data
+        if not isinstance(entries, list) or not entries:
+            return Response({"detail": "entries alanı boş olmayan bir liste olmalıdır."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > AUDIT_BULK_MAX:
+            return Response({"detail": f"Tek istekte en fazla {AUDIT_BULK_MAX} kayıt gönderilebilir."}, status=status.HTTP_400_BAD_REQUEST)
+        result = ingest_audit_entries(
+            entries,
+            user=request.user if request.user.is_authenticated else None,
+            default_ip=_client_ip_from_request(request),
+        )
+        return Response(result, status=status.HTTP_200_OK)
+
+
 class PenaltyPaymentView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -1151,108 +1490,143 @@ class PenaltyPaymentView(APIView):
 
 
 class UpdateOverdueLoansView(APIView):
+    """
+    POST /api/jobs/update-overdue/
+        Bugünkü gecikme taraması yapılmadıysa arka planda başlatır ve hemen döner
+        (202). Aynı anda gelen istekler süren taramaya katılır; bugün tarama
+        yapılmışsa son sonuç döner (200).
+    GET /api/jobs/update-overdue/?job_id=<id>
+        Çalıştırmanın durumu (job_id verilmezse son çalıştırma); istemci
+        `status` "running" olmaktan çıkana kadar yoklayabilir.
+    """
+
     permission_classes = [IsAuthenticated]
 
-    def post(self, request):
-        try:
-            result = update_overdue_loans()
-        except Exception as exc:
-            return Response({"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    DETAILS = {
+        "recent": "Gecikme kayıtları bugün zaten güncellendi.",
+        "running": "Gecikme güncellemesi sürüyor.",
+        "started": "Gecikme güncellemesi başlatıldı.",
+    }
 
-        if isinstance(result, dict) and "total_penalty" in result:
+    @staticmethod
+    def _format_result(result):
+        result = dict(result or {})
+        if "total_penalty" in result:
             try:
                 total_penalty = result.get("total_penalty")
                 if total_penalty is not None:
                     result["total_penalty"] = format(Decimal(total_penalty), ".2f")
             except Exception:
                 result["total_penalty"] = str(result.get("total_penalty"))
+        return result
 
+    def _payload(self, run):
+        if run is None:
+            return {"job_id": None, "status": None, "result": {}}
+        # Çalışan kayıt için son tamamlanan sonucu ver
+        last = run if run.status != "running" else last_job_run(OVERDUE_JOB)
+        return {
+            "job_id": run.pk,
+            "status": run.status,
+            "started_at": run.started_at,
+            "finished_at": run.finished_at,
+            "result": self._format_result(last.result if last else {}),
+            "error": run.error or None,
+        }
+
+    def get(self, request):
+        job_id = request.query_params.get("job_id")
+        qs = ScheduledJobRun.objects.filter(job=OVERDUE_JOB)
+        if job_id:
+            run = qs.filter(pk=job_id).first() if str(job_id).isdigit() else None
+            if run is None:
+                return Response({"detail": "Çalıştırma bulunamadı."}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            run = qs.order_by("-started_at").first()
+        return Response(self._payload(run))
+
+    def post(self, request):
+        # Günlük tarama zamanlayıcıya ait; burada yalnızca bugün henüz yapılmadıysa başlatılır
+        try:
+            run, state = request_overdue_run()
+        except Exception as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        payload = self._payload(run)
+        payload.update({"detail": self.DETAILS[state], "state": state})
         return Response(
-            {
-                "detail": "Gecikme kayıtları güncellendi.",
-                "result": result,
-            },
-            status=status.HTTP_200_OK,
+            payload,
+            status=status.HTTP_200_OK if state == "recent" else status.HTTP_202_ACCEPTED,
         )
 
 
 class BookHistoryView(APIView):
     """
     Belirli bir barkodun geçmişini ve aynı ISBN'e sahip TÜM nüshaların durumlarını döndürür.
-    GET /api/book-history/<barkod>/
+    GET /api/book-history/<barkod>/?history_limit=200&history_before=<cursor>
+
+    Geçmiş (odunc_tarihi, id) üzerinden keyset ile sayfalanır; devamı varsa
+    `history_next` alanı bir sonraki sayfanın cursor değerini taşır.
     """
+
+    HISTORY_DEFAULT_LIMIT = 200
+    HISTORY_MAX_LIMIT = 1000
+
     def get(self, request, barkod):
         try:
             # 1️⃣ Nüsha bilgisi
-            nusha = KitapNusha.objects.select_related("kitap").get(barkod=barkod)
+            nusha = KitapNusha.objects.select_related("kitap", "kitap__yazar", "kitap__kategori").get(barkod=barkod)
             kitap = nusha.kitap
 
-            # 2️⃣ Bu nüshanın geçmişi
-            history_qs = (
-                OduncKaydi.objects
-                .filter(kitap_nusha=nusha)
-                .select_related("ogrenci", "kitap_nusha__kitap")
-                .order_by("-odunc_tarihi")
+            # 2️⃣ Bu nüshanın geçmişi (keyset sayfalı, model nesnesi üretmeden)
+            limit = self._history_limit(request)
+            history_data, history_next = self._history_page(
+                nusha, limit, request.query_params.get("history_before")
             )
 
-            history_data = []
-            for rec in history_qs:
-                history_data.append({
-                    "ogrenci": {
-                        "ad": rec.ogrenci.ad,
-                        "soyad": rec.ogrenci.soyad,
-                    },
-                    "odunc_tarihi": rec.odunc_tarihi,
-                    "iade_tarihi": rec.iade_tarihi,
-                    "teslim_tarihi": rec.teslim_tarihi,
-                    "durum": rec.durum,
-                })
-
-            # 3️⃣ Aynı kitaba (ID bazlı) ait TÜM nüshalar (kendisi dahil)
+            # 3️⃣ Aynı kitaba (ID bazlı) ait TÜM nüshalar (kendisi dahil) — tek sorgu
+            latest_loan = (
+                OduncKaydi.objects
+                .filter(kitap_nusha=OuterRef("pk"))
+                .order_by("-odunc_tarihi", "-id")
+            )
             all_copies_qs = (
                 KitapNusha.objects
                 .filter(kitap_id=kitap.id)
+                .annotate(
+                    son_durum=Subquery(latest_loan.values("durum")[:1]),
+                    son_odunc=Subquery(latest_loan.values("odunc_tarihi")[:1]),
+                    son_iade=Subquery(latest_loan.values("iade_tarihi")[:1]),
+                    son_teslim=Subquery(latest_loan.values("teslim_tarihi")[:1]),
+                    son_ogrenci_ad=Subquery(latest_loan.values("ogrenci__ad")[:1]),
+                    son_ogrenci_soyad=Subquery(latest_loan.values("ogrenci__soyad")[:1]),
+                )
                 .order_by("raf_kodu")
+                .values(
+                    "barkod", "raf_kodu", "son_durum", "son_odunc", "son_iade",
+                    "son_teslim", "son_ogrenci_ad", "son_ogrenci_soyad",
+                )
             )
 
             all_copies = []
             for c in all_copies_qs:
-                # o nüshanın en son ödünç kaydı
-                last_loan = (
-                    OduncKaydi.objects
-                    .filter(kitap_nusha=c)
-                    .exclude(durum="iptal")
-                    .select_related("ogrenci")
-                    .order_by("-odunc_tarihi")
-                    .first()
-                )
-
-                latest_any = (
-                    OduncKaydi.objects
-                    .filter(kitap_nusha=c)
-                    .select_related("ogrenci")
-                    .order_by("-odunc_tarihi")
-                    .first()
-                )
-                if latest_any and latest_any.durum == "iptal":
-                    last_loan = None
-
-                if last_loan:
-                    durum = last_loan.durum
-                    son_islem = last_loan.teslim_tarihi or last_loan.iade_tarihi or last_loan.odunc_tarihi
-                    ogrenci_ad = f"{last_loan.ogrenci.ad} {last_loan.ogrenci.soyad}"
+                # En son kayıt iptal ise nüsha kütüphanede sayılır
+                if c["son_durum"] and c["son_durum"] != "iptal":
+                    durum = c["son_durum"]
+                    son_islem = c["son_teslim"] or c["son_iade"] or c["son_odunc"]
+                    ogrenci_ad = f"{c['son_ogrenci_ad']} {c['son_ogrenci_soyad']}"
                 else:
                     durum = "kütüphanede"
                     son_islem = None
                     ogrenci_ad = ""
 
                 all_copies.append({
-                    "barkod": c.barkod,
-                    "raf_kodu": c.raf_kodu,
+                    "barkod": c["barkod"],
+                    "raf_kodu": c["raf_kodu"],
                     "durum": durum,
                     "son_islem": son_islem,
                     "ogrenci": ogrenci_ad,
-                    "aktif": (c.barkod == barkod),  # 🔹 aktif nüsha
+                    "aktif": (c["barkod"] == barkod),  # 🔹 aktif nüsha
                 })
 
             # 🔹 aktif nüsha hep listenin başına gelsin
@@ -1265,6 +1639,7 @@ class BookHistoryView(APIView):
                     "raf_kodu": nusha.raf_kodu,
                 },
                 "history": history_data,
+                "history_next": history_next,
                 "all_copies": all_copies,
             })
 
@@ -1272,3 +1647,66 @@ class BookHistoryView(APIView):
             return Response({"error": "Nüsha bulunamadı"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _history_limit(self, request):
+        try:
+            limit = int(request.query_params.get("history_limit", self.HISTORY_DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            limit = self.HISTORY_DEFAULT_LIMIT
+        return max(0, min(limit, self.HISTORY_MAX_LIMIT))
+
+    @staticmethod
+    def history_queryset(kitap_nusha_id, before=None):
+        """Nüsha geçmişi, yeniden eskiye; `before` (odunc_tarihi, id) keyset sınırıdır."""
+        qs = OduncKaydi.objects.filter(kitap_nusha_id=kitap_nusha_id)
+        if before:
+            ts, pk = before
+            qs = qs.filter(Q(odunc_tarihi__lt=ts) | Q(odunc_tarihi=ts, id__lt=pk))
+        return qs.order_by("-odunc_tarihi", "-id").values(
+            "id", "odunc_tarihi", "iade_tarihi", "teslim_tarihi", "durum",
+            "ogrenci__ad", "ogrenci__soyad",
+        )
+
+    def _history_page(self, nusha, limit, cursor):
+        if limit == 0:
+            return [], None
+
+        rows = self.history_queryset(nusha.id, self._decode_cursor(cursor))[: limit + 1]
+
+        history_data = []
+        last = None
+        for rec in rows.iterator(chunk_size=limit + 1):
+            if len(history_data) == limit:
+                return history_data, self._encode_cursor(last)
+            history_data.append({
+                "ogrenci": {
+                    "ad": rec["ogrenci__ad"],
+                    "soyad": rec["ogrenci__soyad"],
+                },
+                "odunc_tarihi": rec["odunc_tarihi"],
+                "iade_tarihi": rec["iade_tarihi"],
+                "teslim_tarihi": rec["teslim_tarihi"],
+                "durum": rec["durum"],
+            })
+            last = rec
+        return history_data, None
+
+    @staticmethod
+    def _encode_cursor(rec):
+        # Mikrosaniye hassasiyetinde epoch + id: tam eşitlik karşılaştırması için kayıpsız
+        ts = rec["odunc_tarihi"]
+        micros = int(ts.timestamp()) * 1_000_000 + ts.microsecond
+        return f"{micros}.{rec['id']}"
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            micros_text, pk_text = str(cursor).split(".", 1)
+            micros, pk = int(micros_text), int(pk_text)
+        except (TypeError, ValueError):
+            return None
+        seconds, micro = divmod(micros, 1_000_000)
+        ts = datetime.fromtimestamp(seconds, tz=dt_timezone.utc).replace(microsecond=micro)
+        return ts, pk
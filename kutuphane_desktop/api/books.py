@@ -112,27 +112,26 @@ def list_copies_for_book(book_id):
     return []
 
 
-def get_next_barcode(prefix: str = "KIT", width: int = 6) -> str:
-    """Sunucudan mevcut barkodları çekip bir sonraki 'KIT00...' kodunu tahmin eder."""
+def peek_next_barcode(prefix: str = "KIT", width: int = 6) -> str:
+    """Sunucudaki sayaçtan sıradaki kodu gösterir; numara ayrılmaz (bilgi amaçlı)."""
     base = get_api_base_url().rstrip('/')
-    try:
-        resp = api_request("GET", f"{base}/nushalar/?prefix={prefix}")
-        if resp.status_code != 200:
-            raise RuntimeError(f"HTTP {resp.status_code}")
-        data = resp.json() or []
-        max_n = 0
-        for item in data if isinstance(data, list) else data.get('results', []):
-            code = (item or {}).get('barkod') or ''
-            if isinstance(code, str) and code.startswith(prefix):
-                tail = code[len(prefix):]
-                if tail.isdigit():
-                    n = int(tail)
-                    if n > max_n:
-                        max_n = n
-        return f"{prefix}{max_n+1:0{width}d}"
-    except Exception:
-        # Ağ hatasında güvenli varsayılan
-        return f"{prefix}{1:0{width}d}"
+    resp = api_request("GET", f"{base}/barcodes/next/", params={"prefix": prefix, "width": width})
+    if resp.status_code != 200:
+        raise RuntimeError(f"HTTP {resp.status_code}")
+    return str((resp.json() or {}).get("next") or "")
+
+
+def reserve_barcodes(count: int, prefix: str = "KIT", width: int = 6) -> list:
+    """Toplu nüsha ekleme için ardışık `count` adet barkod ayırır."""
+    base = get_api_base_url().rstrip('/')
+    resp = api_request(
+        "POST",
+        f"{base}/barcodes/next/",
+        json={"prefix": prefix, "count": count, "width": width},
+    )
+    if resp.status_code not in (200, 201):
+        raise RuntimeError(f"HTTP {resp.status_code}")
+    return list((resp.json() or {}).get("codes") or [])
 
 
 def create_copy(book_id, barkod, raf_kodu=None):
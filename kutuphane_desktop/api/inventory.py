@@ -78,6 +78,42 @@ def mark_item(session_id, payload):
     return _parse_response(resp)
 
 
+def mark_items_bulk(session_id, barcodes):
+    """Birden çok barkodu tek istekte işaretler; sunucu her barkod için sonuç döndürür."""
+    resp = api_request(
+        "POST",
+        _base(f"inventory-sessions/{session_id}/mark-bulk/"),
+        json={"barkodlar": list(barcodes)},
+    )
+    return _parse_response(resp)
+
+
+def get_reconciliation(session_id, params=None):
+    """Mutabakat özeti; `category` verilirse o kategorinin bir sayfası da gelir."""
+    resp = api_request(
+        "GET",
+        _base(f"inventory-sessions/{session_id}/reconciliation/"),
+        params=params or {},
+    )
+    return _parse_response(resp)
+
+
+def download_reconciliation_csv(session_id, path):
+    """Mutabakat CSV'sini parça parça diske yazar."""
+    resp = api_request(
+        "GET",
+        _base(f"inventory-sessions/{session_id}/reconciliation/csv/"),
+        stream=True,
+    )
+    if resp is None or not (200 <= resp.status_code < 300):
+        return False, None, _extract_error(resp)
+    with open(path, "wb") as handle:
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            if chunk:
+                handle.write(chunk)
+    return True, path, None
+
+
 def complete_session(session_id, status_value="completed"):
     resp = api_request(
         "POST",
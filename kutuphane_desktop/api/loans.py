@@ -49,6 +49,29 @@ def list_student_open_loans(student_id):
     return []
 
 
+def list_loan_rows(statuses=("oduncte", "gecikmis"), page_size=500):
+    """
+    Ödünç tablosu için düz satırları cursor sayfalamasıyla tümüyle çeker.
+    Etkin iade tarihi, gecikme ve tolerans bayrakları sunucudan hazır gelir.
+    """
+    params = {"durum": ",".join(statuses), "page_size": page_size}
+    url = _base_url("oduncler/rows/")
+    rows = []
+    while url:
+        resp = api_request("GET", url, params=params)
+        if resp.status_code != 200:
+            break
+        try:
+            data = resp.json() or {}
+        except ValueError:
+            break
+        rows.extend(data.get("results") or [])
+        # "next" bağlantısı tüm parametreleri zaten içerir
+        url = data.get("next")
+        params = None
+    return rows
+
+
 def update_loan_status(loan_id, durum, teslim_tarihi=None, extra_payload=None):
     payload = {"durum": durum}
     if teslim_tarihi is not None:
@@ -83,3 +106,20 @@ def extract_error(resp):
         if messages:
             return "\n".join(messages)
     return str(data)
+
+
+def start_overdue_update(notify_expired=True):
+    """Gecikme taramasını sunucuda başlatır; sunucu beklemeden iş kimliğiyle döner."""
+    return api_request("POST", _base_url("jobs/update-overdue/"), notify_expired=notify_expired)
+
+
+def get_overdue_update(job_id=None, notify_expired=True):
+    """Tarama durumu (`status`: running/ok/error) ve son sonuç."""
+    params = {"job_id": job_id} if job_id else None
+    resp = api_request("GET", _base_url("jobs/update-overdue/"), params=params, notify_expired=notify_expired)
+    if resp.status_code != 200:
+        return None
+    try:
+        return resp.json()
+    except ValueError:
+        return None
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 from typing import Optional
 
+from api import auth
 from core.config import get_api_base_url
 from core.utils import api_request
 
@@ -35,16 +36,54 @@ def send_log(islem: str, *, detay: Optional[str] = None, ip_adresi: Optional[str
     return api_request("POST", _endpoint(), json=payload)
 
 
+def send_logs_bulk(entries: list[dict]):
+    """
+    Birden çok kaydı tek istekte gönderir.
+
+    Her kayıt `client_id` (UUID metni), `islem` ve isteğe bağlı `detay`,
+    `ip_adresi`, `zaman` (ISO 8601), `kullanici` (kaydı oluşturan oturum) alanlarını taşır. Sunucu aynı `client_id`
+    değerini ikinci kez yazmadığı için başarısız partiler aynen yeniden
+    gönderilebilir.
+    """
+    if not auth.get_access_token():
+        return None  # oturum yok: kayıtlar kuyrukta bekler
+    base = get_api_base_url().rstrip("/")
+    return api_request(
+        "POST",
+        f"{base}/logs/bulk/",
+        json={"entries": entries},
+        timeout=10,
+        notify_expired=False,
+    )
+
+
 def safe_send_log(islem: str, *, detay: Optional[str] = None, ip_adresi: Optional[str] = None):
     """
-    Ağ hatalarında uygulamayı durdurmadan log gönder.
+    Logu arka plan göndericisine bırakır ve hemen döner.
+
+    Kayıt önce diske (spool) yazılır; sunucu kapalıysa bile kaybolmaz,
+    bağlantı geldiğinde partiler halinde gönderilir. Kayıt, o anki oturumun
+    kullanıcı adıyla işaretlenir; sonraki bir oturumda gönderilirse sunucu bu
+    adı ayrıca saklar (yazar yine gönderen oturumdur).
     """
+    if not islem:
+        return None
     try:
-        resp = send_log(islem, detay=detay, ip_adresi=ip_adresi)
-        status = getattr(resp, "status_code", None)
-        if status and status not in (200, 201):
-            print(f"[DBG] Log gönderimi başarısız ({status}): {islem}")
-        return resp
-    except Exception as exc:  # pragma: no cover - sadece ağ/JSON hatalarında tetiklenir
-        print(f"[DBG] Log gönderilemedi: {exc}")
+        from core.log_shipper import get_shipper
+
+        return get_shipper().enqueue(
+            islem, detay=detay, ip_adresi=ip_adresi, kullanici=auth.get_current_username()
+        )
+    except Exception as exc:  # pragma: no cover - kuyruk hatası masa işlemini durdurmasın
+        print(f"[DBG] Log kuyruğa alınamadı: {exc}")
         return None
+
+
+def flush_logs(timeout: float = 2.0) -> bool:
+    """Kuyruktaki logların gönderilmesini kısa süre bekler (ör. oturum kapatmadan önce)."""
+    try:
+        from core.log_shipper import get_shipper
+
+        return get_shipper().flush(timeout)
+    except Exception:  # pragma: no cover
+        return False
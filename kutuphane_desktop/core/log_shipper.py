@@ -0,0 +1,253 @@
+"""
+Denetim loglarını arka planda sunucuya gönderen kuyruk.
+
+Masa işlemleri (ödünç, iade, tahsilat) log için ağ beklemez: kayıt bellekteki
+kuyruğa ve diske (append-only spool dosyası) yazılır, ayrı bir thread kayıtları
+partiler halinde `/api/logs/bulk/` adresine gönderir. Sunucu her kaydı
+istemcide üretilen `client_id` ile tanıdığı için yanıtı kaybolan bir parti
+güvenle yeniden gönderilir.
+
+Spool satırları iki türdür:
+    {"op": "add", "entry": {...}}      kuyruğa eklenen kayıt
+    {"op": "ack", "ids": [...]}        sunucunun kabul ettiği (veya reddettiği) kayıtlar
+Program açılışında dosya okunur, onaylanmamış kayıtlar kuyruğa geri alınır ve
+dosya yalnızca bu kayıtlarla yeniden yazılır. Sunucu kaydın yazarı olarak
+gönderen oturumu kaydeder; her kayıt ayrıca onu oluşturan kullanıcının adını
+(`kullanici`) taşır ve sunucu bu adı bilgi amaçlı saklar.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+SPOOL_FILE = "log_spool.jsonl"
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 2.0
+MAX_BACKOFF = 60.0
+COMPACT_AFTER_BYTES = 1024 * 1024
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).astimezone().isoformat()
+
+
+class LogShipper:
+    def __init__(
+        self,
+        sender: Callable[[list], object],
+        spool_path: str = SPOOL_FILE,
+        *,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self._sender = sender
+        self._spool_path = spool_path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._spool_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._flush_requested = False
+        self._inflight = 0
+        self._backoff = 0.0
+
+    # ------------------------------------------------------------------
+    def start(self):
+        """Spool'u yeniden oynatır ve gönderici thread'i başlatır."""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            for entry in self._replay_spool():
+                self._queue.append(entry)
+            self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 3.0):
+        """Kuyruktakileri göndermeyi dener; gönderilemeyenler spool'da kalır."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def enqueue(
+        self,
+        islem: str,
+        *,
+        detay: Optional[str] = None,
+        ip_adresi: Optional[str] = None,
+        kullanici: Optional[str] = None,
+    ) -> dict:
+        """Kaydı kuyruğa alır ve hemen döner (ağ beklemez)."""
+        entry = {"client_id": str(uuid.uuid4()), "islem": islem, "zaman": _now_iso(), "kullanici": kullanici}
+        if detay is not None:
+            entry["detay"] = detay
+        if ip_adresi:
+            entry["ip_adresi"] = ip_adresi
+        self._append_spool({"op": "add", "entry": entry})
+        with self._cond:
+            self._queue.append(entry)
+            if len(self._queue) >= self._batch_size:
+                self._cond.notify_all()
+        return entry
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._queue) + self._inflight
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Kuyruk boşalana kadar (en fazla `timeout` sn) bekler."""
+        with self._cond:
+            self._backoff = 0.0
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._queue and not self._inflight, timeout)
+
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._backoff:
+                    # Hata sonrası bekleme: yalnızca kapanış veya açık flush isteği kısaltır
+                    self._cond.wait_for(lambda: self._stopping or self._flush_requested, self._backoff)
+                else:
+                    self._cond.wait_for(
+                        lambda: self._stopping or self._flush_requested or len(self._queue) >= self._batch_size,
+                        self._flush_interval,
+                    )
+                if not self._queue:
+                    self._flush_requested = False
+                    if self._stopping:
+                        return
+                    continue
+                batch = [self._queue.popleft() for _ in range(min(self._batch_size, len(self._queue)))]
+                self._inflight = len(batch)
+
+            done_ids = self._send(batch)
+
+            with self._cond:
+                self._inflight = 0
+                if done_ids is None:
+                    # Gönderilemedi: sıra korunarak başa dön, bekleme süresini artır
+                    self._queue.extendleft(reversed(batch))
+                    self._backoff = min(MAX_BACKOFF, (self._backoff or 1.0) * 2)
+                    self._flush_requested = False
+                    if self._stopping:
+                        self._cond.notify_all()
+                        return
+                else:
+                    self._backoff = 0.0
+                self._cond.notify_all()
+            if done_ids:
+                self._append_spool({"op": "ack", "ids": done_ids})
+                self._maybe_compact()
+
+    def _send(self, batch):
+        """Sunucunun işlediği client_id listesi; ağ/sunucu hatasında None."""
+        try:
+            resp = self._sender(batch)
+        except Exception as exc:  # pragma: no cover - yalnızca ağ hatalarında
+            print(f"[DBG] Log partisi gönderilemedi: {exc}")
+            return None
+        status = getattr(resp, "status_code", 0)
+        if status != 200:
+            print(f"[DBG] Log partisi gönderilemedi ({status}).")
+            return None
+        try:
+            data = resp.json()
+        except ValueError:
+            return None
+        # Reddedilenler tekrar gönderilse de kabul edilmeyecek: onları da düş
+        done = list(data.get("accepted") or [])
+        done.extend(str(row.get("client_id")) for row in data.get("rejected") or [] if row.get("client_id"))
+        for row in data.get("rejected") or []:
+            print(f"[DBG] Log kaydı reddedildi: {row}")
+        sent = {entry["client_id"] for entry in batch}
+        # 200 yanıtında sunucu partinin tamamını işlemiştir
+        return [client_id for client_id in done if client_id in sent] or list(sent)
+
+    # ------------------------------------------------------------------
+    def _append_spool(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._spool_lock:
+            try:
+                with open(self._spool_path, "a", encoding="utf-8") as handle:
+                    handle.write(line)
+                    handle.flush()
+            except OSError as exc:  # pragma: no cover - disk hatası log kaybı sayılır
+                print(f"[DBG] Log spool yazılamadı: {exc}")
+
+    def _read_pending(self) -> list:
+        pending: dict = {}
+        try:
+            with open(self._spool_path, "r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # yarım kalmış son satır
+                    if record.get("op") == "add" and record.get("entry", {}).get("client_id"):
+                        pending[record["entry"]["client_id"]] = record["entry"]
+                    elif record.get("op") == "ack":
+                        for client_id in record.get("ids") or []:
+                            pending.pop(client_id, None)
+        except FileNotFoundError:
+            return []
+        return list(pending.values())
+
+    def _rewrite_spool(self, entries: list):
+        tmp_path = f"{self._spool_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            for entry in entries:
+                handle.write(json.dumps({"op": "add", "entry": entry}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self._spool_path)
+
+    def _replay_spool(self) -> list:
+        with self._spool_lock:
+            entries = self._read_pending()
+            try:
+                self._rewrite_spool(entries)
+            except OSError as exc:  # pragma: no cover
+                print(f"[DBG] Log spool sıkıştırılamadı: {exc}")
+        return entries
+
+    def _maybe_compact(self):
+        with self._spool_lock:
+            try:
+                if os.path.getsize(self._spool_path) < COMPACT_AFTER_BYTES:
+                    return
+                self._rewrite_spool(self._read_pending())
+            except OSError:
+                pass
+
+
+_shipper: Optional[LogShipper] = None
+_shipper_lock = threading.Lock()
+
+
+def get_shipper() -> LogShipper:
+    """Uygulama genelindeki gönderici; ilk çağrıda spool'u oynatıp başlatılır."""
+    global _shipper
+    with _shipper_lock:
+        if _shipper is None:
+            from api.logs import send_logs_bulk
+
+            _shipper = LogShipper(send_logs_bulk)
+            _shipper.start()
+        return _shipper
+
+
+def shutdown(timeout: float = 3.0):
+    with _shipper_lock:
+        shipper = _shipper
+    if shipper is not None:
+        shipper.stop(timeout)
@@ -86,7 +86,10 @@ def api_request(method, url, **kwargs):
     - method: "GET", "POST", "PUT", "DELETE"
     - url: tam API endpoint'i
     - kwargs: data=..., json=..., params=... gibi requests argümanları
+    - notify_expired=False: oturum süresi dolduğunda arayüz uyarısı tetiklenmez
+      (arka plan thread'lerinden yapılan çağrılar için)
     """
+    notify_expired = kwargs.pop("notify_expired", True)
     token = auth.get_access_token()
     headers = kwargs.pop("headers", {})
     if token:
@@ -111,10 +114,12 @@ def api_request(method, url, **kwargs):
                 return _OfflineResponse(url, exc)
             if resp.status_code == 401:
                 setattr(resp, "error_message", "Oturum süresi doldu. Lütfen tekrar giriş yapın.")
-                _notify_session_expired()
+                if notify_expired:
+                    _notify_session_expired()
         else:
             setattr(resp, "error_message", "Oturum süresi doldu. Lütfen tekrar giriş yapın.")
-            _notify_session_expired()
+            if notify_expired:
+                _notify_session_expired()
 
     if not hasattr(resp, "error_message"):
         setattr(resp, "error_message", None)
@@ -7,6 +7,7 @@ from ui.login_window import LoginWindow
 from ui.main_window import MainWindow
 from api import auth
 from api.system import health_check
+from core import log_shipper
 
 LOCK_FILENAME = "kutuphane_desktop.lock"
 
@@ -41,6 +42,8 @@ def main():
             print("QSS yüklenemedi:", e)
 
         auth.load_tokens()
+        # Önceki oturumdan kalan (gönderilememiş) logları arka planda göndermeye başla
+        log_shipper.get_shipper()
 
         health = health_check()
         server_ok = health[0]
@@ -57,6 +60,7 @@ def main():
         window.show()
         exit_code = app.exec_()
     finally:
+        log_shipper.shutdown()
         lock.unlock()
     sys.exit(exit_code)
 
@@ -1486,11 +1486,13 @@ class CopiesManagerDialog(QDialog):
 
     # --- Helpers ---
     def _prepare_next_barcode(self):
+        # Alan boş kalır, barkodu kayıt sırasında sunucu ayırır; sıradaki kod yalnızca gösterilir
+        self.input_barcode.clear()
         try:
-            code = book_api.get_next_barcode(prefix="KIT", width=6)
-            self.input_barcode.setText(code)
+            code = book_api.peek_next_barcode(prefix="KIT", width=6)
         except Exception:
-            self.input_barcode.setText("")
+            code = ""
+        self.input_barcode.setPlaceholderText(f"Barkod (otomatik: {code})" if code else "Barkod (otomatik)")
         if getattr(self, "_last_shelf", ""):
             self.input_shelf.setText(self._last_shelf)
         else:
@@ -1629,9 +1631,16 @@ class InitialCopyWizard(QDialog):
 
         self.btn_create.setEnabled(False)
         self.btn_cancel.setEnabled(False)
+        # Ardışık barkodlar tek istekte ayrılır; ayrılamazsa her nüshaya sunucu atar
+        try:
+            codes = book_api.reserve_barcodes(len(shelves), prefix="KIT", width=6)
+        except Exception:
+            codes = []
+        if len(codes) != len(shelves):
+            codes = [""] * len(shelves)
         copies = []
-        for shelf in shelves:
-            resp = book_api.create_copy(self.book_id, "", shelf)
+        for shelf, code in zip(shelves, codes):
+            resp = book_api.create_copy(self.book_id, code, shelf)
             if resp.status_code not in (200, 201):
                 detail = book_api.extract_error(resp)
                 QMessageBox.warning(self, "Hata", f"Nüsha oluşturulamadı.\n\nDetay: {detail}")
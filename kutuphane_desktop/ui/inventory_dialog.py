@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import re
 from datetime import datetime
 
 from PyQt5.QtCore import Qt, QTimer
@@ -9,6 +10,7 @@ from PyQt5.QtWidgets import (
     QComboBox,
     QDialog,
     QDialogButtonBox,
+    QFileDialog,
     QFormLayout,
     QHBoxLayout,
     QLabel,
@@ -28,6 +30,16 @@ from PyQt5.QtWidgets import (
 
 from api import inventory as inventory_api
 
+BULK_MARK_CHUNK = 500
+ITEMS_PAGE_SIZE = 500
+RECONCILIATION_LABELS = [
+    ("missing", "Bulunamayan"),
+    ("seen_on_loan", "Görüldü ama ödünçte"),
+    ("seen_lost_damaged", "Görüldü ama kayıp/hasarlı"),
+    ("out_of_scope", "Sayım kapsamı dışındaki nüsha"),
+    ("unknown_barcode", "Tanımsız barkod"),
+]
+
 
 class InventoryDialog(QDialog):
     def __init__(self, parent=None):
@@ -39,6 +51,7 @@ class InventoryDialog(QDialog):
         self.current_items = []
         self.current_filter = "unseen"
         self.current_search = ""
+        self.next_cursor = None
 
         self._build_ui()
         self._search_timer = QTimer(self)
@@ -109,7 +122,7 @@ class InventoryDialog(QDialog):
         control_row.addWidget(self.combo_status)
 
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Ara (barkod, kitap, raf)")
+        self.search_input.setPlaceholderText("Ara (barkod veya raf kodu başı)")
         self.search_input.textChanged.connect(self._search_changed)
         control_row.addWidget(self.search_input, 1)
 
@@ -122,6 +135,9 @@ class InventoryDialog(QDialog):
         self.btn_delete = QPushButton("Sil")
         self.btn_delete.setObjectName("DialogNegativeButton")
         self.btn_delete.clicked.connect(self.delete_session)
+        self.btn_reconcile = QPushButton("Mutabakat")
+        self.btn_reconcile.clicked.connect(self.show_reconciliation)
+        control_row.addWidget(self.btn_reconcile)
         control_row.addWidget(self.btn_complete)
         control_row.addWidget(self.btn_cancel)
         control_row.addWidget(self.btn_delete)
@@ -137,6 +153,14 @@ class InventoryDialog(QDialog):
         self.table.cellDoubleClicked.connect(self._toggle_row_seen_state)
         detail_layout.addWidget(self.table, 1)
 
+        more_row = QHBoxLayout()
+        more_row.addStretch(1)
+        self.btn_more = QPushButton("Daha fazla yükle")
+        self.btn_more.clicked.connect(lambda: self.refresh_items(append=True))
+        self.btn_more.setVisible(False)
+        more_row.addWidget(self.btn_more)
+        detail_layout.addLayout(more_row)
+
         self.empty_label = QLabel("Bir sayım oturumu seçin veya oluşturun.")
         self.empty_label.setAlignment(Qt.AlignCenter)
         detail_layout.addWidget(self.empty_label, 1)
@@ -254,14 +278,17 @@ class InventoryDialog(QDialog):
         self.refresh_items()
 
     # ------------------------------------------------------------------
-    def refresh_items(self):
+    def refresh_items(self, append=False):
         session = self.current_session
         if not session:
             return
         if not session.get("id"):
             self._clear_current_session()
             return
-        params = {"status": self.current_filter, "limit": 500}
+        # Sunucu keyset sayfalıyor; toplam adet oturum sayaçlarından geldiği için istenmez
+        params = {"status": self.current_filter, "limit": ITEMS_PAGE_SIZE, "count": "none"}
+        if append and self.next_cursor:
+            params["cursor"] = self.next_cursor
         if self.current_search.strip():
             params["q"] = self.current_search.strip()
         ok, data, error = inventory_api.fetch_items(session.get("id"), params=params)
@@ -272,15 +299,21 @@ class InventoryDialog(QDialog):
             QMessageBox.warning(self, "Sayım", self._friendly_error(error) or "Liste yüklenemedi.")
             return
         results = []
+        next_cursor = None
         if isinstance(data, dict):
             results = data.get("results") or []
+            next_cursor = data.get("next")
             session_data = data.get("session")
             if session_data:
                 self.current_session = session_data
                 self._update_session_summary(session_data)
         elif isinstance(data, list):
             results = data
+        if append:
+            results = self.current_items + results
         self.current_items = results
+        self.next_cursor = next_cursor
+        self.btn_more.setVisible(bool(next_cursor))
         self._populate_table(results)
 
     # ------------------------------------------------------------------
@@ -328,6 +361,10 @@ class InventoryDialog(QDialog):
         code = self.scan_input.text().strip()
         if not code:
             return
+        codes = [part for part in re.split(r"[\s,;]+", code) if part]
+        if len(codes) > 1:
+            self._mark_many(codes)
+            return
         ok, data, error = inventory_api.mark_item(
             session.get("id"),
             {"barkod": code, "seen": True},
@@ -341,6 +378,35 @@ class InventoryDialog(QDialog):
         self.scan_input.clear()
         self._after_mark(data)
 
+    # ------------------------------------------------------------------
+    def _mark_many(self, codes):
+        """Yapıştırılan/toplu okutulan barkodları parça parça tek istekle gönderir."""
+        session_id = self.current_session.get("id")
+        unknown = []
+        for start in range(0, len(codes), BULK_MARK_CHUNK):
+            ok, data, error = inventory_api.mark_items_bulk(session_id, codes[start:start + BULK_MARK_CHUNK])
+            if not ok:
+                if self._is_missing_session_error(error):
+                    self._handle_missing_session()
+                    return
+                QMessageBox.warning(self, "Sayım", self._friendly_error(error) or "İşlem gerçekleştirilemedi.")
+                return
+            unknown.extend(
+                row.get("barkod") for row in (data or {}).get("results", []) if row.get("result") == "unknown"
+            )
+            session_data = (data or {}).get("session")
+            if session_data:
+                self.current_session = session_data
+                self._update_session_summary(session_data)
+        self.scan_input.clear()
+        if unknown:
+            QMessageBox.information(
+                self,
+                "Sayım",
+                "Bu sayımda bulunmayan barkodlar:\n" + "\n".join(unknown[:50]),
+            )
+        self.refresh_items()
+
     # ------------------------------------------------------------------
     def _toggle_row_seen_state(self, row, _column):
         if row < 0 or row >= len(self.current_items):
@@ -370,6 +436,34 @@ class InventoryDialog(QDialog):
                 self._update_session_summary(data)
         self.refresh_items()
 
+    # ------------------------------------------------------------------
+    def show_reconciliation(self):
+        session = self.current_session
+        if not session or not session.get("id"):
+            return
+        ok, data, error = inventory_api.get_reconciliation(session.get("id"))
+        if not ok:
+            QMessageBox.warning(self, "Sayım", self._friendly_error(error) or "Mutabakat alınamadı.")
+            return
+        summary = (data or {}).get("summary") or {}
+        lines = [f"{label}: {summary.get(key, 0)}" for key, label in RECONCILIATION_LABELS]
+        answer = QMessageBox.question(
+            self,
+            "Sayım Mutabakatı",
+            "\n".join(lines) + "\n\nAyrıntılı listeyi CSV olarak kaydetmek ister misiniz?",
+            QMessageBox.Yes | QMessageBox.No,
+        )
+        if answer != QMessageBox.Yes:
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Mutabakat CSV", f"sayim_{session.get('id')}_mutabakat.csv", "CSV (*.csv)"
+        )
+        if not path:
+            return
+        ok, _, error = inventory_api.download_reconciliation_csv(session.get("id"), path)
+        if not ok:
+            QMessageBox.warning(self, "Sayım", self._friendly_error(error) or "CSV indirilemedi.")
+
     # ------------------------------------------------------------------
     def open_create_dialog(self):
         dlg = InventorySessionCreateDialog(self)
@@ -451,6 +545,8 @@ class InventoryDialog(QDialog):
     def _clear_current_session(self):
         self.current_session = None
         self.current_items = []
+        self.next_cursor = None
+        self.btn_more.setVisible(False)
         self.detail_panel.setVisible(False)
         self.empty_label.setVisible(True)
         self.table.setRowCount(0)
@@ -15,7 +15,7 @@ from ui.inventory_dialog import InventoryDialog
 from ui.side_menu import SideMenu, SideMenuEntry
 from widgets.quick_result_panel import QuickResultPanel
 from widgets.book_table import BookTable, HEADERS
-import json, os, sys, subprocess, time
+import json, os, sys, subprocess, threading, time
 import sip
 from core.config import SETTINGS_FILE, get_api_base_url, load_settings, save_settings
 from core.utils import register_session_expired_handler
@@ -23,9 +23,13 @@ from PyQt5.QtPrintSupport import QPrinterInfo
 from core.utils import api_request, format_date, response_error_message
 from api import auth
 from api import logs as log_api
+from api import loans as loan_api
 from ui.settings_dialog import SettingsDialog
 from core.log_helpers import build_log_detail
 
+OVERDUE_POLL_INTERVAL = 5.0
+OVERDUE_POLL_TIMEOUT = 30 * 60
+
 
 _active_login_window = None
 
@@ -528,13 +532,25 @@ class MainWindow(QMainWindow):
 
         include_history=True ise hem ilgili nüshanın geçmişi hem tüm nüshalar gösterilir,
         False olduğunda yalnızca "Tüm Nüshalar" sekmesi sunulur."""
-        resp = api_request("GET", self._api_url(f"book-history/{barkod}/"))
+        url = self._api_url(f"book-history/{barkod}/")
+        params = {} if include_history else {"history_limit": 0}
+        resp = api_request("GET", url, params=params)
         if resp.status_code != 200:
             print("Kitap geçmişi alınamadı:", resp.status_code)
             return
 
         data = resp.json()
-        history = data.get("history", [])
+        history = list(data.get("history", []))
+
+        # Geçmiş sunucuda sayfalanır; kalan sayfaları cursor ile tamamla
+        next_cursor = data.get("history_next") if include_history else None
+        while next_cursor:
+            page_resp = api_request("GET", url, params={"history_before": next_cursor})
+            if page_resp.status_code != 200:
+                break
+            page = page_resp.json() or {}
+            history.extend(page.get("history", []))
+            next_cursor = page.get("history_next")
         all_copies = data.get("all_copies", [])
         book = data.get("book", {})
         copy = data.get("copy", {})
@@ -927,6 +943,8 @@ class MainWindow(QMainWindow):
                 extra=message,
             )
             log_api.safe_send_log(action, detay=detail or f"{display} çıkış yaptı.")
+            # Token silinmeden önce bekleyen loglar bu kullanıcı adına gitsin
+            log_api.flush_logs()
         except Exception:
             pass
         auth.logout()
@@ -965,14 +983,47 @@ class MainWindow(QMainWindow):
         QTimer.singleShot(0, self._run_startup_jobs)
 
     def _run_startup_jobs(self):
+        # Sunucu taramayı arka planda yürütür; giriş isteğin kendisini de beklemesin
+        threading.Thread(target=self._request_overdue_update, name="overdue-start", daemon=True).start()
+
+    @staticmethod
+    def _request_overdue_update():
         try:
-            resp = api_request("POST", self._api_url("jobs/update-overdue/"))
+            resp = loan_api.start_overdue_update(notify_expired=False)
         except Exception as exc:
             print("[DBG] Overdue job failed:", exc)
             return
         status = getattr(resp, "status_code", None)
-        if status != 200:
+        if status not in (200, 202):
             print("[DBG] Overdue job response:", status)
+            return
+        if status == 202:
+            try:
+                job_id = resp.json().get("job_id")
+            except ValueError:
+                job_id = None
+            if job_id:
+                MainWindow._wait_overdue_update(job_id)
+
+    @staticmethod
+    def _wait_overdue_update(job_id):
+        # Sunucu taramayı arka planda yürütür; bitişi bu thread'de yoklanır
+        deadline = time.monotonic() + OVERDUE_POLL_TIMEOUT
+        while time.monotonic() < deadline and auth.get_access_token():
+            time.sleep(OVERDUE_POLL_INTERVAL)
+            try:
+                data = loan_api.get_overdue_update(job_id, notify_expired=False)
+            except Exception as exc:
+                print("[DBG] Overdue job poll failed:", exc)
+                return
+            if not data or data.get("status") != "running":
+                break
+        else:
+            return
+        if data and data.get("status") == "error":
+            print("[DBG] Overdue job error:", data.get("error"))
+        elif data:
+            print("[DBG] Overdue job finished:", data.get("result"))
 
     def _menu_icon(self, filename, fallback):
         path = os.path.join("resources", "icons", filename)
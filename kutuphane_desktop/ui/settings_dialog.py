@@ -1148,6 +1148,11 @@ class NotificationSettingsWidget(QWidget):
         self.edit_email_password = QLineEdit()
         self.edit_email_password.setEchoMode(QLineEdit.Password)
         email_layout.addRow("Parola", self.edit_email_password)
+        self.spin_email_rate = QSpinBox()
+        self.spin_email_rate.setRange(0, 100000)
+        self.spin_email_rate.setSpecialValueText("Sınırsız")
+        self.spin_email_rate.setSuffix(" / dk")
+        email_layout.addRow("Gönderim hızı", self.spin_email_rate)
 
         email_schedule_layout = QHBoxLayout()
         self.chk_email_schedule = QCheckBox("Belirli saatte gönder")
@@ -1319,6 +1324,7 @@ class NotificationSettingsWidget(QWidget):
         self.chk_email_tls.setChecked(bool(data.get("email_use_tls", True)))
         self.edit_email_username.setText(data.get("email_username", ""))
         self.edit_email_password.setText(data.get("email_password", ""))
+        self.spin_email_rate.setValue(int(data.get("email_rate_per_minute", 0) or 0))
         self.chk_email_schedule.setChecked(bool(data.get("email_schedule_enabled", False)))
         email_hour = int(data.get("email_schedule_hour", 9) or 0)
         email_minute = int(data.get("email_schedule_minute", 0) or 0)
@@ -1373,6 +1379,7 @@ class NotificationSettingsWidget(QWidget):
             "email_use_tls": bool(self.chk_email_tls.isChecked()),
             "email_username": self.edit_email_username.text().strip(),
             "email_password": self.edit_email_password.text(),
+            "email_rate_per_minute": int(self.spin_email_rate.value()),
             "email_schedule_enabled": bool(self.chk_email_schedule.isChecked()),
             "email_schedule_hour": int(self.time_email_schedule.time().hour()),
             "email_schedule_minute": int(self.time_email_schedule.time().minute()),
@@ -1435,6 +1442,7 @@ class NotificationSettingsWidget(QWidget):
             self.chk_email_tls,
             self.edit_email_username,
             self.edit_email_password,
+            self.spin_email_rate,
         ):
             widget.setEnabled(enabled)
         self.chk_email_schedule.setEnabled(enabled)
@@ -1,4 +1,4 @@
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 from decimal import Decimal
 
 from PyQt5.QtWidgets import (
@@ -8,8 +8,9 @@ from PyQt5.QtCore import (
     Qt, QSortFilterProxyModel, QAbstractTableModel, QDate, QModelIndex, QPoint
 )
 from PyQt5.QtGui import QColor, QFont
-from core.config import SETTINGS_FILE, get_api_base_url, load_settings
-from core.utils import api_request, format_date
+from core.config import SETTINGS_FILE, get_api_base_url
+from core.utils import format_date
+from api import loans as loan_api
 import json, os
 
 
@@ -372,93 +373,16 @@ class BookTable(QWidget):
     def fetch_data(self, *, statuses=None):
         if not statuses:
             statuses = ("oduncte", "gecikmis")
-        def _load_status(status):
-            resp = api_request("GET", self._api_url(f"oduncler/?durum={status}"))
-            if resp.status_code != 200:
-                return []
-            try:
-                return resp.json() or []
-            except ValueError:
-                return []
-
-        loans = []
-        for status in statuses:
-            loans.extend(_load_status(status))
-
-        settings = load_settings() or {}
-        policy = settings.get("loans", {}) or {}
-        grace_days = int(policy.get("delay_grace_days") or 0)
-        shift_weekend = bool(policy.get("shift_weekend"))
-
-        def _parse_datetime(value):
-            if not value:
-                return None
-            text = str(value).strip()
-            if not text:
-                return None
-            candidate = text.replace("Z", "+00:00")
-            dt = None
-            try:
-                dt = datetime.fromisoformat(candidate)
-            except ValueError:
-                try:
-                    dt = datetime.strptime(text[:10], "%Y-%m-%d")
-                except ValueError:
-                    return None
-            if dt.tzinfo:
-                return dt.astimezone()
-            return dt
-
-        def _shift_weekend(dt):
-            if not dt:
-                return None
-            result = dt
-            while shift_weekend and result.weekday() >= 5:
-                result += timedelta(days=1)
-            return result
-
-        today = datetime.now().date()
+        loans = loan_api.list_loan_rows(statuses)
 
         data = []
         row_meta = []
         for loan in loans:
-            ogrenci = loan.get("ogrenci", {})
-            sinif = ogrenci.get("sinif", {}) or {}
-            nusha = loan.get("kitap_nusha", {})
-            kitap = nusha.get("kitap", {})
-            kategori = kitap.get("kategori", {}) or {}
-            yazar = kitap.get("yazar", {}) or {}
-
             odunc_tarihi = loan.get("odunc_tarihi")
             iade_tarihi = loan.get("iade_tarihi")
             teslim_tarihi = loan.get("teslim_tarihi")
             durum = (loan.get("durum") or "").lower()
 
-            due_dt = _parse_datetime(iade_tarihi)
-            effective_due = due_dt
-            if due_dt and grace_days:
-                effective_due = due_dt + timedelta(days=grace_days)
-            effective_due = _shift_weekend(effective_due)
-
-            grace_alert = False
-            if due_dt:
-                original_date = due_dt.date()
-                effective_date = effective_due.date() if effective_due else original_date
-                if original_date < today <= effective_date and durum != "gecikmis":
-                    grace_alert = True
-
-            is_overdue = False
-            if effective_due and effective_due.date() < today:
-                is_overdue = True
-            if durum == "gecikmis":
-                is_overdue = True
-
-            due_soon = False
-            if not is_overdue and not grace_alert and effective_due:
-                days_to = (effective_due.date() - today).days
-                if 0 <= days_to <= 3:
-                    due_soon = True
-
             penalty_val = loan.get("gecikme_cezasi")
             penalty_display = ""
             if penalty_val not in (None, ""):
@@ -468,16 +392,16 @@ class BookTable(QWidget):
                     penalty_display = str(penalty_val)
 
             row = [
-                ogrenci.get("ad", ""),
-                ogrenci.get("soyad", ""),
-                ogrenci.get("ogrenci_no", ""),
-                sinif.get("ad", ""),
-                kitap.get("baslik", ""),
-                yazar.get("ad_soyad", ""),
-                kategori.get("ad", ""),
-                kitap.get("isbn", ""),
-                nusha.get("barkod", ""),
-                nusha.get("raf_kodu", ""),
+                loan.get("ogrenci_ad") or "",
+                loan.get("ogrenci_soyad") or "",
+                loan.get("ogrenci_no") or "",
+                loan.get("sinif") or "",
+                loan.get("kitap_baslik") or "",
+                loan.get("yazar") or "",
+                loan.get("kategori") or "",
+                loan.get("isbn") or "",
+                loan.get("barkod") or "",
+                loan.get("raf_kodu") or "",
                 safe_date(odunc_tarihi),
                 safe_date(iade_tarihi),
                 safe_date(teslim_tarihi),
@@ -485,14 +409,15 @@ class BookTable(QWidget):
                 penalty_display,
             ]
             data.append(row)
+            # Tolerans / hafta sonu kuralları sunucuda hesaplanır
             row_meta.append(
                 {
                     "due_iso": iade_tarihi,
-                    "effective_due_iso": effective_due.isoformat() if effective_due else None,
+                    "effective_due_iso": loan.get("effective_iade_tarihi"),
                     "status": durum,
-                    "grace_alert": grace_alert,
-                    "is_overdue": is_overdue,
-                    "due_soon": due_soon,
+                    "grace_alert": bool(loan.get("grace_alert")),
+                    "is_overdue": bool(loan.get("is_overdue")),
+                    "due_soon": bool(loan.get("due_soon")),
                 }
             )
 